@@ -0,0 +1 @@
+default_app_config = 'item_order.apps.ItemOrderConfig'
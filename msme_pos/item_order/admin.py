@@ -1,5 +1,9 @@
 from django.contrib import admin
-from item_order.models import ItemOrder
+from item_order.models import (
+    ItemOrder,
+    DailySales
+)
 
 
 admin.site.register(ItemOrder)
+admin.site.register(DailySales)
@@ -0,0 +1,78 @@
+import datetime
+from collections import OrderedDict
+
+from django.db.models import (
+    F,
+    Sum,
+    Count,
+    DecimalField,
+    ExpressionWrapper
+)
+from django.db.models.functions import (
+    TruncHour,
+    TruncDay,
+    TruncMonth
+)
+
+
+# Django 1.11 can't truncate to weeks, so weeks are summed up from days
+TRUNCATIONS = OrderedDict([
+    ('hour', TruncHour),
+    ('day', TruncDay),
+    ('week', TruncDay),
+    ('month', TruncMonth),
+])
+
+
+def revenue_sum():
+    """ Sum of the orders' quantity times the price they were placed at """
+
+    return Sum(ExpressionWrapper(
+        F('quantity') * F('unit_price'),
+        output_field=DecimalField(max_digits=12, decimal_places=2)
+    ))
+
+
+def week_start(bucket):
+    return bucket - datetime.timedelta(days=bucket.weekday())
+
+
+def sales_buckets(item_orders, interval, by_menu_item=False):
+    """ Order count, quantity and revenue of item_orders per interval, and
+    per menu item if asked. The grouping happens in one SQL query, so the
+    cost is one row per bucket instead of one per order """
+
+    group_by = ['bucket', 'menu_item'] if by_menu_item else ['bucket']
+
+    rows = item_orders.annotate(
+        bucket=TRUNCATIONS[interval]('ordered_on')
+    ).values(*group_by).annotate(
+        order_count=Count('id'),
+        total_quantity=Sum('quantity'),
+        revenue=revenue_sum()
+    ).order_by(*group_by)
+
+    if interval == 'week':
+        for row in rows:
+            row['bucket'] = week_start(row['bucket'])
+
+    return merge_buckets(rows)
+
+
+def merge_buckets(*bucket_lists):
+    """ Sums buckets that share a start (and menu item) into one, sorted """
+
+    merged = OrderedDict()
+
+    for buckets in bucket_lists:
+        for bucket in buckets:
+            key = (bucket['bucket'], bucket.get('menu_item'))
+
+            if key in merged:
+                merged[key]['order_count'] += bucket['order_count']
+                merged[key]['total_quantity'] += bucket['total_quantity']
+                merged[key]['revenue'] += bucket['revenue']
+            else:
+                merged[key] = dict(bucket)
+
+    return [merged[key] for key in sorted(merged, key=lambda key: (key[0], key[1] or 0))]
@@ -3,3 +3,7 @@ from django.apps import AppConfig
 
 class ItemOrderConfig(AppConfig):
     name = 'item_order'
+
+    def ready(self):
+        # Connects the receivers that keep order rollups up to date
+        import item_order.signals
@@ -0,0 +1,513 @@
+"""
+Columnar archive of closed months of orders.
+
+Each archived month is a directory named YYYY-MM holding one NumPy array
+per column, the non-empty notes and a manifest:
+
+    id.npy              int64, ascending
+    menu_item_id.npy    int64
+    quantity.npy        int32
+    unit_price.npy      int64, in cents
+    ordered_on.npy      int64, microseconds since the epoch (UTC)
+    client_uuid.npy     16 bytes, empty for orders placed without one
+    notes.json.gz       {"<id>": "<additional_notes>"}
+    manifest.json       month, row count, first and last ordered_on
+
+Archiving moves the orders out of the ItemOrder table. They keep counting
+in the daily sales rollups and the menu item counters, and sales
+analytics read the arrays memory-mapped and merge them with what is still
+in the table. Everything else that reads orders from the table, such as
+the order lists and exports, no longer sees the archived months.
+"""
+
+import calendar
+import datetime
+import fcntl
+import gzip
+import itertools
+import json
+import os
+import shutil
+import uuid
+from decimal import Decimal
+from collections import (
+    defaultdict,
+    OrderedDict
+)
+
+import numpy
+
+from django.conf import settings
+from django.db import (
+    connection,
+    transaction
+)
+from django.utils import timezone
+
+from item_order.models import ItemOrder
+from item_order.analytics import (
+    merge_buckets,
+    week_start
+)
+from item_order import (
+    partitions,
+    rollups
+)
+
+
+COLUMNS = OrderedDict([
+    ('id', 'int64'),
+    ('menu_item_id', 'int64'),
+    ('quantity', 'int32'),
+    ('unit_price', 'int64'),
+    ('ordered_on', 'int64'),
+    ('client_uuid', 'S16'),
+])
+
+NOTES = 'notes.json.gz'
+MANIFEST = 'manifest.json'
+# Held by archive_month, so only one process writes a directory at a time
+LOCK_FILE = 'archive.lock'
+
+EPOCH = datetime.datetime(1970, 1, 1, tzinfo=timezone.utc)
+
+HOUR = datetime.timedelta(hours=1)
+DAY = datetime.timedelta(days=1)
+
+
+def default_directory():
+    return getattr(settings, 'ITEM_ORDER_COLUMNAR_ARCHIVE_DIR', None)
+
+
+def to_micros(moment):
+    delta = moment - EPOCH
+
+    return (delta.days * 86400 + delta.seconds) * 1000000 + delta.microseconds
+
+
+def from_micros(micros):
+    return EPOCH + datetime.timedelta(microseconds=int(micros))
+
+
+def month_range(month):
+    """ The UTC instants a month's archive covers, as [start, end) """
+
+    start = datetime.datetime(month.year, month.month, 1, tzinfo=timezone.utc)
+    days = calendar.monthrange(month.year, month.month)[1]
+
+    return start, start + datetime.timedelta(days=days)
+
+
+def month_path(directory, month):
+    return os.path.join(directory, '{:04d}-{:02d}'.format(month.year, month.month))
+
+
+def archived_months(directory=None):
+    """ The months with a complete archive, oldest first """
+
+    directory = directory or default_directory()
+
+    if not directory or not os.path.isdir(directory):
+        return []
+
+    months = []
+
+    for name in os.listdir(directory):
+        try:
+            month = datetime.datetime.strptime(name, '%Y-%m').date()
+        except ValueError:
+            # Such as a .partial directory being written
+            continue
+
+        if os.path.exists(os.path.join(directory, name, MANIFEST)):
+            months.append(month)
+
+    return sorted(months)
+
+
+def read_manifest(directory, month):
+    with open(os.path.join(month_path(directory, month), MANIFEST)) as manifest:
+        return json.load(manifest)
+
+
+def load_month(directory, month):
+    """ The month's columns, memory-mapped read-only """
+
+    path = month_path(directory, month)
+
+    return OrderedDict(
+        (name, numpy.load(os.path.join(path, name + '.npy'), mmap_mode='r'))
+        for name in COLUMNS
+    )
+
+
+def load_notes(directory, month):
+    with gzip.open(os.path.join(month_path(directory, month), NOTES), 'rt', encoding='utf-8') as notes:
+        return json.load(notes)
+
+
+def write_month(path, columns, notes):
+    """ Writes a month's files to path, which must not exist yet """
+
+    os.makedirs(path)
+
+    for name, dtype in COLUMNS.items():
+        numpy.save(os.path.join(path, name + '.npy'), numpy.asarray(columns[name], dtype=dtype))
+
+    with gzip.open(os.path.join(path, NOTES), 'wt', encoding='utf-8') as notes_file:
+        json.dump(notes, notes_file)
+
+    ordered_on = columns['ordered_on']
+
+    # Written last, a month only counts as archived once it has a manifest
+    with open(os.path.join(path, MANIFEST), 'w') as manifest:
+        json.dump(OrderedDict([
+            ('rows', len(columns['id'])),
+            ('first_ordered_on', from_micros(ordered_on.min()).isoformat()),
+            ('last_ordered_on', from_micros(ordered_on.max()).isoformat()),
+        ]), manifest)
+        manifest.flush()
+        os.fsync(manifest.fileno())
+
+
+def client_uuid_bytes(client_uuid):
+    if client_uuid is None:
+        return b''
+
+    return uuid.UUID(str(client_uuid)).bytes
+
+
+def archived_client_uuids(item_orders, directory=None):
+    """ The client_uuids of item_orders that are already in the archive of
+    their order's month, such as a replay that arrives after its month was
+    archived. Only the months the orders fall in are read """
+
+    directory = directory or default_directory()
+    months = set(archived_months(directory))
+
+    if not months:
+        return set()
+
+    by_month = defaultdict(list)
+
+    for item_order in item_orders:
+        if item_order.client_uuid is None:
+            continue
+
+        ordered_on = timezone.localtime(item_order.ordered_on, timezone.utc)
+        month = datetime.date(ordered_on.year, ordered_on.month, 1)
+
+        if month in months:
+            by_month[month].append(item_order.client_uuid)
+
+    found = set()
+
+    for month, client_uuids in by_month.items():
+        archived = load_month(directory, month)['client_uuid']
+        wanted = numpy.array([client_uuid_bytes(client_uuid) for client_uuid in client_uuids], dtype=COLUMNS['client_uuid'])
+
+        found.update(
+            client_uuid for client_uuid, is_archived in zip(client_uuids, numpy.isin(wanted, archived)) if is_archived
+        )
+
+    return found
+
+
+def read_orders(item_orders, chunk_size):
+    """ The columns and non-empty notes of item_orders, in id order. Rows
+    are fetched chunk_size at a time and packed into arrays as they come,
+    so the month is never held as Python objects """
+
+    rows = item_orders.order_by('id').values_list(
+        'id', 'menu_item_id', 'quantity', 'unit_price', 'ordered_on', 'client_uuid', 'additional_notes'
+    ).iterator()
+
+    chunks = OrderedDict((name, []) for name in COLUMNS)
+    notes = {}
+
+    while True:
+        chunk = list(itertools.islice(rows, chunk_size))
+
+        if not chunk:
+            break
+
+        ids, menu_item_ids, quantities, unit_prices, ordered_ons, client_uuids, notes_list = zip(*chunk)
+
+        chunks['id'].append(numpy.array(ids, dtype=COLUMNS['id']))
+        chunks['menu_item_id'].append(numpy.array(menu_item_ids, dtype=COLUMNS['menu_item_id']))
+        chunks['quantity'].append(numpy.array(quantities, dtype=COLUMNS['quantity']))
+        chunks['unit_price'].append(numpy.array(
+            [int(unit_price * 100) for unit_price in unit_prices], dtype=COLUMNS['unit_price']
+        ))
+        chunks['ordered_on'].append(numpy.array(
+            [to_micros(ordered_on) for ordered_on in ordered_ons], dtype=COLUMNS['ordered_on']
+        ))
+        chunks['client_uuid'].append(numpy.array(
+            [client_uuid_bytes(client_uuid) for client_uuid in client_uuids], dtype=COLUMNS['client_uuid']
+        ))
+        notes.update((str(id), note) for id, note in zip(ids, notes_list) if note)
+
+    columns = OrderedDict(
+        (name, numpy.concatenate(arrays) if arrays else numpy.array([], dtype=COLUMNS[name]))
+        for name, arrays in chunks.items()
+    )
+
+    return columns, notes
+
+
+def delete_orders(ids, chunk_size):
+    """ Deletes the orders with plain SQL, so no per-order signals take
+    them out of the rollups and counters """
+
+    table = connection.ops.quote_name(ItemOrder._meta.db_table)
+
+    with connection.cursor() as cursor:
+        for offset in range(0, len(ids), chunk_size):
+            chunk = [int(id) for id in ids[offset:offset + chunk_size]]
+            cursor.execute(
+                'DELETE FROM {} WHERE id IN ({})'.format(table, ', '.join(['%s'] * len(chunk))),
+                chunk
+            )
+
+
+def has_own_partition(month):
+    try:
+        partitions.check_partitioned()
+    except partitions.PartitioningUnavailable:
+        return False
+
+    return month in partitions.monthly_partitions()
+
+
+def swap_in(path):
+    """ Replaces the archive at path with the one written to path.partial """
+
+    partial_path = path + '.partial'
+    old_path = path + '.old'
+
+    if os.path.exists(path):
+        os.rename(path, old_path)
+
+    os.rename(partial_path, path)
+
+    if os.path.exists(old_path):
+        shutil.rmtree(old_path)
+
+
+def orders_remain(path, month, chunk_size):
+    """ Whether any order in the archive at path is still in the table """
+
+    start, end = month_range(month)
+    ids = numpy.load(os.path.join(path, 'id.npy'), mmap_mode='r')
+    item_orders = ItemOrder.objects.filter(ordered_on__gte=start, ordered_on__lt=end)
+
+    return any(
+        item_orders.filter(id__in=[int(id) for id in ids[offset:offset + chunk_size]]).exists()
+        for offset in range(0, len(ids), chunk_size)
+    )
+
+
+def recover_month(directory, month, chunk_size):
+    """ Finishes or undoes what an interrupted archive_month left of a
+    month. A complete .partial archive whose orders are all gone from the
+    table was committed but not swapped in. Anything else is discarded """
+
+    path = month_path(directory, month)
+    partial_path = path + '.partial'
+    old_path = path + '.old'
+
+    if os.path.exists(os.path.join(partial_path, MANIFEST)) and not orders_remain(partial_path, month, chunk_size):
+        swap_in(path)
+        return
+
+    if os.path.exists(partial_path):
+        shutil.rmtree(partial_path)
+
+    if os.path.exists(old_path):
+        if os.path.exists(path):
+            shutil.rmtree(old_path)
+        else:
+            os.rename(old_path, path)
+
+
+def archive_month(month, directory=None, chunk_size=500):
+    """ Moves the orders placed in a UTC month out of the table and into the
+    month's archive. Orders that arrive for an already archived month, such
+    as late offline replays, are added to its archive. On a partitioned
+    table a month with a partition of its own has it dropped, and other
+    months have their rows deleted by id. Either way no per-order signals
+    run. The new files replace the old ones once the transaction commits.
+    Returns how many orders were moved """
+
+    directory = directory or default_directory()
+    path = month_path(directory, month)
+    start, end = month_range(month)
+
+    if not os.path.isdir(directory):
+        os.makedirs(directory)
+
+    with open(os.path.join(directory, LOCK_FILE), 'a') as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+
+        try:
+            recover_month(directory, month, chunk_size)
+
+            with transaction.atomic():
+                item_orders = ItemOrder.objects.filter(ordered_on__gte=start, ordered_on__lt=end)
+                own_partition = has_own_partition(month)
+
+                if own_partition:
+                    # Dropped below, so no write may land in it meanwhile
+                    partitions.lock_partition(month)
+                else:
+                    item_orders = item_orders.select_for_update()
+
+                columns, notes = read_orders(item_orders, chunk_size)
+                moved_ids = columns['id']
+
+                if not len(moved_ids):
+                    return 0
+
+                menu_item_ids = numpy.unique(columns['menu_item_id'])
+
+                if month in archived_months(directory):
+                    existing = load_month(directory, month)
+                    order = numpy.argsort(numpy.concatenate([existing['id'], columns['id']]), kind='mergesort')
+                    columns = OrderedDict(
+                        (name, numpy.concatenate([existing[name], columns[name]])[order])
+                        for name in COLUMNS
+                    )
+                    notes = dict(load_notes(directory, month), **notes)
+
+                write_month(path + '.partial', columns, notes)
+
+                if own_partition:
+                    partitions.drop_partition(month)
+                else:
+                    delete_orders(moved_ids, chunk_size)
+
+                # Order lists of these menu items changed, so their validators must
+                for menu_item_id in menu_item_ids:
+                    rollups.touch_menu_item(int(menu_item_id))
+
+                # A rollback leaves the rows in the table and the old archive
+                # in place, and the .partial files for the next run to discard
+                transaction.on_commit(lambda: swap_in(path))
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    return len(moved_ids)
+
+
+def bucket_starts(interval, first, last):
+    """ The local starts of the hour, day or month buckets from the one
+    holding first through the one holding last, the way the database
+    truncates ordered_on in item_order.analytics """
+
+    tz = timezone.get_current_timezone()
+    first = timezone.localtime(first, tz).replace(tzinfo=None)
+    last = timezone.localtime(last, tz).replace(tzinfo=None)
+
+    if interval == 'hour':
+        bucket = first.replace(minute=0, second=0, microsecond=0)
+    elif interval == 'month':
+        bucket = first.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+    else:
+        bucket = first.replace(hour=0, minute=0, second=0, microsecond=0)
+
+    starts = []
+
+    while bucket <= last:
+        starts.append(timezone.make_aware(bucket, tz))
+
+        if interval == 'hour':
+            bucket += HOUR
+        elif interval == 'month':
+            bucket = (bucket + datetime.timedelta(days=32)).replace(day=1)
+        else:
+            bucket += DAY
+
+    return starts
+
+
+def sales_buckets(menu_items, interval, by_menu_item=False, start=None, end=None, directory=None):
+    """ Like item_order.analytics.sales_buckets for the archived orders of
+    menu_items placed in [start, end). The months are scanned as memory-
+    mapped arrays and summed with numpy.bincount, so nothing is read from
+    the database except the menu items' ids. Revenue is counted at the
+    prices the orders were placed at """
+
+    directory = directory or default_directory()
+    months = [
+        month for month in archived_months(directory)
+        if (start is None or month_range(month)[1] > start) and (end is None or month_range(month)[0] < end)
+    ]
+
+    if not months:
+        return []
+
+    menu_item_ids = numpy.array(sorted(menu_items.values_list('id', flat=True)), dtype='int64')
+
+    if not len(menu_item_ids):
+        return []
+
+    item_count = len(menu_item_ids)
+    buckets = []
+
+    for month in months:
+        columns = load_month(directory, month)
+        ordered_on = columns['ordered_on']
+
+        selected = numpy.isin(columns['menu_item_id'], menu_item_ids)
+
+        if start is not None:
+            selected &= ordered_on >= to_micros(start)
+
+        if end is not None:
+            selected &= ordered_on < to_micros(end)
+
+        if not selected.any():
+            continue
+
+        ordered_on = ordered_on[selected]
+        item_index = numpy.searchsorted(menu_item_ids, columns['menu_item_id'][selected])
+
+        starts = bucket_starts(
+            'day' if interval == 'week' else interval,
+            from_micros(ordered_on.min()),
+            from_micros(ordered_on.max())
+        )
+        bucket_index = numpy.searchsorted(
+            numpy.array([to_micros(bucket) for bucket in starts], dtype='int64'),
+            ordered_on,
+            side='right'
+        ) - 1
+
+        keys = bucket_index * item_count + item_index
+        size = len(starts) * item_count
+        order_counts = numpy.bincount(keys, minlength=size)
+        quantities = numpy.bincount(keys, weights=columns['quantity'][selected], minlength=size)
+        revenues = numpy.bincount(
+            keys,
+            weights=columns['quantity'][selected] * columns['unit_price'][selected],
+            minlength=size
+        )
+
+        for key in numpy.nonzero(order_counts)[0]:
+            index, item = divmod(int(key), item_count)
+            menu_item_id = int(menu_item_ids[item])
+
+            bucket = {
+                'bucket': week_start(starts[index]) if interval == 'week' else starts[index],
+                'order_count': int(order_counts[key]),
+                'total_quantity': int(quantities[key]),
+                # Summed in cents, which stay exact as floats up to 2 ** 53
+                'revenue': Decimal(int(round(revenues[key]))).scaleb(-2),
+            }
+
+            if by_menu_item:
+                bucket['menu_item'] = menu_item_id
+
+            buckets.append(bucket)
+
+    return merge_buckets(buckets)
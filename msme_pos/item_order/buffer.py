@@ -0,0 +1,259 @@
+import atexit
+import glob
+import json
+import logging
+import os
+import threading
+import uuid
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import (
+    connection,
+    close_old_connections,
+    DatabaseError,
+    InterfaceError,
+    OperationalError
+)
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from item_order.models import ItemOrder
+from item_order.ingest import insert_new_orders
+
+from msme_pos.processes import process_is_alive
+
+
+logger = logging.getLogger(__name__)
+
+
+class OrderWriteBuffer(object):
+    """ Accepts orders in memory and writes them to the database in batches
+    from a background thread, once batch_size orders are waiting or every
+    flush_interval seconds, so many requests share one commit.
+
+    Each order gets its client_uuid up front and is appended to a journal
+    file before it is accepted. A batch's journal segment is removed once
+    the batch is committed; segments left behind by a crashed process are
+    replayed on start. Replays are safe because inserts skip client_uuids
+    that are already stored """
+
+    def __init__(self, journal_dir, batch_size=200, flush_interval=0.5, fsync=True):
+        self.journal_dir = journal_dir
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.fsync = fsync
+
+        self.lock = threading.Lock()
+        self.flush_lock = threading.Lock()
+        self.wake_up = threading.Event()
+        self.stopping = False
+        self.thread = None
+
+        self.pending = []
+        self.pending_segments = []
+        self.segment_number = 0
+        self.segment = None
+
+    def start(self):
+        if not os.path.isdir(self.journal_dir):
+            os.makedirs(self.journal_dir)
+
+        self.replay_journal()
+
+        self.thread = threading.Thread(target=self.run, name='order-write-buffer')
+        self.thread.daemon = True
+        self.thread.start()
+
+        atexit.register(self.stop)
+
+    def stop(self):
+        self.stopping = True
+        self.wake_up.set()
+
+        if self.thread is not None:
+            self.thread.join()
+
+        self.flush()
+
+    def add(self, menu_item, quantity, additional_notes=None):
+        """ Accepts an order and returns it unsaved, with its client_uuid
+        and ordered_on set. Its id is only known once it is flushed """
+
+        item_order = ItemOrder(
+            client_uuid=uuid.uuid4(),
+            ordered_on=timezone.now(),
+            quantity=quantity,
+            additional_notes=additional_notes,
+            menu_item=menu_item,
+            unit_price=menu_item.price
+        )
+
+        line = json.dumps(journal_entry(item_order)) + '\n'
+
+        with self.lock:
+            if self.segment is None:
+                self.open_segment()
+
+            self.segment.write(line)
+            self.segment.flush()
+
+            if self.fsync:
+                os.fsync(self.segment.fileno())
+
+            self.pending.append(item_order)
+            full = len(self.pending) >= self.batch_size
+
+        if full:
+            self.wake_up.set()
+
+        return item_order
+
+    def run(self):
+        try:
+            while not self.stopping:
+                self.wake_up.wait(self.flush_interval)
+                self.wake_up.clear()
+
+                # This thread's connection, as a request's would be
+                close_old_connections()
+
+                try:
+                    self.flush()
+                except Exception:
+                    logger.exception('Could not flush buffered orders')
+        finally:
+            connection.close()
+
+    def flush(self):
+        """ Writes every pending order. If the database is unreachable the
+        batch goes back to the front of the queue and its journal is kept """
+
+        with self.flush_lock:
+            with self.lock:
+                batch, self.pending = self.pending, []
+
+                if self.segment is not None:
+                    self.segment.close()
+                    self.pending_segments.append(self.segment.name)
+                    self.segment = None
+
+                segments, self.pending_segments = self.pending_segments, []
+
+            if not batch and not segments:
+                return
+
+            try:
+                self.write(batch)
+            except Exception:
+                with self.lock:
+                    self.pending = batch + self.pending
+                    self.pending_segments = segments + self.pending_segments
+                raise
+
+            for path in segments:
+                os.remove(path)
+
+    def write(self, batch):
+        try:
+            insert_new_orders(batch)
+        except (DatabaseError, ValueError):
+            # Find the orders that can't be stored, such as ones for a menu
+            # item deleted in the meantime or with a value the column can't
+            # hold, and drop only those. Losing the connection isn't the
+            # order's fault, so that fails the flush and the batch is kept
+            for item_order in batch:
+                try:
+                    insert_new_orders([item_order])
+                except (OperationalError, InterfaceError):
+                    raise
+                except (DatabaseError, ValueError):
+                    logger.error('Dropped buffered order %s', item_order.client_uuid, exc_info=True)
+
+    def open_segment(self):
+        self.segment_number += 1
+
+        path = os.path.join(
+            self.journal_dir,
+            'orders-{}-{}.jsonl'.format(os.getpid(), self.segment_number)
+        )
+
+        self.segment = open(path, 'a')
+
+    def replay_journal(self):
+        """ Writes the orders journaled by processes that are gone. Each
+        segment is first claimed by renaming it to this process's pid, so
+        two processes starting together don't both replay it, and one that
+        crashes while replaying leaves it for the next """
+
+        for path in sorted(glob.glob(os.path.join(self.journal_dir, 'orders-*.jsonl'))):
+            name = os.path.basename(path)
+            pid = int(name.split('-')[1])
+
+            if pid != os.getpid() and process_is_alive(pid):
+                continue
+
+            claimed_path = path
+
+            if pid != os.getpid():
+                claimed_path = os.path.join(self.journal_dir, 'orders-{}-replay-{}'.format(os.getpid(), name))
+
+                try:
+                    os.rename(path, claimed_path)
+                except FileNotFoundError:
+                    # Another process claimed it first
+                    continue
+
+            with open(claimed_path) as segment:
+                batch = [
+                    journaled_order(json.loads(line))
+                    for line in segment if line.strip()
+                ]
+
+            self.write(batch)
+            os.remove(claimed_path)
+
+
+def journal_entry(item_order):
+    return {
+        'client_uuid': str(item_order.client_uuid),
+        'ordered_on': item_order.ordered_on.isoformat(),
+        'quantity': item_order.quantity,
+        'additional_notes': item_order.additional_notes,
+        'menu_item': item_order.menu_item_id,
+        'unit_price': str(item_order.unit_price),
+    }
+
+
+def journaled_order(entry):
+    return ItemOrder(
+        client_uuid=uuid.UUID(entry['client_uuid']),
+        ordered_on=parse_datetime(entry['ordered_on']),
+        quantity=entry['quantity'],
+        additional_notes=entry['additional_notes'],
+        menu_item_id=entry['menu_item'],
+        # Journaled before orders kept their price, so priced when inserted
+        unit_price=Decimal(entry['unit_price']) if 'unit_price' in entry else None
+    )
+
+
+buffer = None
+buffer_lock = threading.Lock()
+
+
+def get_buffer():
+    """ The process's write buffer, started on first use """
+
+    global buffer
+
+    with buffer_lock:
+        if buffer is None:
+            buffer = OrderWriteBuffer(
+                journal_dir=settings.ITEM_ORDER_WRITE_BEHIND_JOURNAL_DIR,
+                batch_size=settings.ITEM_ORDER_WRITE_BEHIND_BATCH_SIZE,
+                flush_interval=settings.ITEM_ORDER_WRITE_BEHIND_FLUSH_INTERVAL,
+                fsync=settings.ITEM_ORDER_WRITE_BEHIND_FSYNC
+            )
+            buffer.start()
+
+    return buffer
@@ -0,0 +1,70 @@
+import csv
+import json
+
+from django.core.serializers.json import DjangoJSONEncoder
+
+
+EXPORT_COLUMNS = ('id', 'menu_item', 'menu_item_name', 'quantity', 'price', 'ordered_on', 'additional_notes')
+
+# Rows are joined into chunks of this many before being handed to the server
+ROWS_PER_CHUNK = 500
+
+
+class Echo(object):
+    """ File-like object that hands back what csv.writer writes to it """
+
+    def write(self, value):
+        return value
+
+
+def export_values(item_orders):
+    """ Streams the export columns of item_orders from the database. On
+    PostgreSQL iterator() reads through a server-side cursor, so only one
+    batch of rows is held in memory at a time """
+
+    rows = item_orders.order_by('ordered_on', 'id').values_list(
+        'id', 'menu_item_id', 'menu_item__name', 'quantity', 'unit_price', 'ordered_on', 'additional_notes'
+    ).iterator()
+
+    for id, menu_item, menu_item_name, quantity, price, ordered_on, additional_notes in rows:
+        yield id, menu_item, menu_item_name, quantity, price, ordered_on.isoformat(), additional_notes
+
+
+def chunked(lines):
+    chunk = []
+
+    for line in lines:
+        chunk.append(line)
+
+        if len(chunk) == ROWS_PER_CHUNK:
+            yield ''.join(chunk)
+            chunk = []
+
+    if chunk:
+        yield ''.join(chunk)
+
+
+def stream_csv(item_orders):
+    writer = csv.writer(Echo())
+
+    def lines():
+        yield writer.writerow(EXPORT_COLUMNS)
+
+        for row in export_values(item_orders):
+            yield writer.writerow(row)
+
+    return chunked(lines())
+
+
+def stream_ndjson(item_orders):
+    def lines():
+        for row in export_values(item_orders):
+            yield json.dumps(dict(zip(EXPORT_COLUMNS, row)), cls=DjangoJSONEncoder) + '\n'
+
+    return chunked(lines())
+
+
+EXPORT_FORMATS = {
+    'csv': (stream_csv, 'text/csv'),
+    'ndjson': (stream_ndjson, 'application/x-ndjson'),
+}
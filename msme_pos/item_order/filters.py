@@ -0,0 +1,57 @@
+import datetime
+
+from django.utils import timezone
+
+from rest_framework.exceptions import ValidationError
+
+
+def parse_date(query_params, name):
+    """ Reads a YYYY-MM-DD query param """
+
+    value = query_params.get(name)
+
+    if not value:
+        return None
+
+    try:
+        return datetime.datetime.strptime(value, '%Y-%m-%d').date()
+    except ValueError:
+        raise ValidationError({name: ['Date has wrong format. Use YYYY-MM-DD.']})
+
+
+def start_of_day(day):
+    """ The first instant of a day in the current timezone """
+
+    return timezone.make_aware(datetime.datetime.combine(day, datetime.time.min))
+
+
+def date_range(query_params):
+    """ The [start, end) instants covered by the ?date=, ?from= and ?to=
+    days, both inclusive. Either is None when unbounded """
+
+    day = parse_date(query_params, 'date')
+    from_day = parse_date(query_params, 'from')
+    to_day = parse_date(query_params, 'to')
+
+    starts = [start_of_day(first_day) for first_day in (day, from_day) if first_day]
+    ends = [start_of_day(last_day + datetime.timedelta(days=1)) for last_day in (day, to_day) if last_day]
+
+    return max(starts) if starts else None, min(ends) if ends else None
+
+
+def filter_by_date_range(item_orders, query_params):
+    """ Keeps the orders placed on the ?date= day and between the ?from= and
+    ?to= days, both inclusive. Days become half-open [start, end) ranges of
+    timestamps so the database compares ordered_on directly and can range
+    scan the (menu_item, ordered_on) index, instead of casting every row
+    to a date the way ordered_on__date does """
+
+    start, end = date_range(query_params)
+
+    if start:
+        item_orders = item_orders.filter(ordered_on__gte=start)
+
+    if end:
+        item_orders = item_orders.filter(ordered_on__lt=end)
+
+    return item_orders
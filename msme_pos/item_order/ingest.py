@@ -0,0 +1,116 @@
+from django.db import (
+    transaction,
+    IntegrityError
+)
+
+from item_order.models import (
+    ClientUUID,
+    ItemOrder
+)
+from item_order.signals import orders_bulk_created
+from item_order import archive
+
+from menu_item.models import MenuItem
+
+
+MENU_ITEM_CACHE = ItemOrder._meta.get_field('menu_item').get_cache_name()
+
+
+def resolve_menu_items(user_profile, url_param_names):
+    """ Maps url_param_name to a UserProfile's menu items with a single
+    query. user_profile may be the profile or its id """
+
+    return {
+        menu_item.url_param_name: menu_item
+        for menu_item in MenuItem.objects.filter(
+            user_profile=user_profile,
+            url_param_name__in=set(url_param_names)
+        )
+    }
+
+
+def set_menu_item_fields(item_orders):
+    """ Copies each order's menu item's profile and price onto it, as
+    ItemOrder.save does. Menu items that weren't loaded with their orders
+    are looked up with one query """
+
+    unset = [
+        item_order for item_order in item_orders
+        if item_order.user_profile_id is None or item_order.unit_price is None
+    ]
+    unloaded = set(
+        item_order.menu_item_id for item_order in unset
+        if not hasattr(item_order, MENU_ITEM_CACHE)
+    )
+    menu_item_fields = {
+        id: (user_profile_id, price)
+        for id, user_profile_id, price in MenuItem.objects.filter(id__in=unloaded).values_list(
+            'id', 'user_profile_id', 'price'
+        )
+    } if unloaded else {}
+
+    for item_order in unset:
+        if hasattr(item_order, MENU_ITEM_CACHE):
+            user_profile_id, price = item_order.menu_item.user_profile_id, item_order.menu_item.price
+        else:
+            # Left unset for a deleted menu item, so the insert fails
+            user_profile_id, price = menu_item_fields.get(item_order.menu_item_id, (None, None))
+
+        if item_order.user_profile_id is None:
+            item_order.user_profile_id = user_profile_id
+
+        if item_order.unit_price is None:
+            item_order.unit_price = price
+
+
+def insert_orders(item_orders):
+    """ Inserts unsaved orders with one bulk write and counts them in the
+    rollups, all in one transaction """
+
+    set_menu_item_fields(item_orders)
+
+    with transaction.atomic():
+        created = ItemOrder.objects.bulk_create(item_orders)
+        orders_bulk_created.send(sender=ItemOrder, orders=created)
+
+    return created
+
+
+def insert_new_orders(item_orders, attempts=3):
+    """ Inserts the orders whose client_uuid isn't stored yet. Known uuids
+    are found with one lookup on ClientUUID, and the new ones are added to
+    it in the same transaction as the orders. If a concurrent replay
+    stores some of them first, even with another ordered_on, that insert
+    fails on ClientUUID's primary key and is retried without them. Orders
+    of archived months are also checked against the archive, which would
+    count them a second time. Returns the created orders and the skipped
+    duplicates """
+
+    for attempt in range(attempts):
+        seen = set(ClientUUID.objects.filter(
+            client_uuid__in=[item_order.client_uuid for item_order in item_orders]
+        ).values_list('client_uuid', flat=True))
+        seen |= archive.archived_client_uuids(
+            [item_order for item_order in item_orders if item_order.client_uuid not in seen]
+        )
+
+        new_orders = []
+        duplicates = []
+
+        for item_order in item_orders:
+            if item_order.client_uuid in seen:
+                duplicates.append(item_order)
+            else:
+                seen.add(item_order.client_uuid)
+                new_orders.append(item_order)
+
+        try:
+            with transaction.atomic():
+                ClientUUID.objects.bulk_create([
+                    ClientUUID(client_uuid=item_order.client_uuid) for item_order in new_orders
+                ])
+
+                return insert_orders(new_orders), duplicates
+        except IntegrityError:
+            if attempt == attempts - 1:
+                raise
@@ -0,0 +1,63 @@
+import datetime
+
+from django.conf import settings
+from django.core.management.base import (
+    BaseCommand,
+    CommandError
+)
+from django.utils import timezone
+
+from item_order.models import ItemOrder
+from item_order.partitions import (
+    add_months,
+    month_start
+)
+from item_order import archive
+
+
+class Command(BaseCommand):
+    help = (
+        'Moves the orders of closed months older than the given age out of the '
+        'table and into the columnar archive that reports read them from'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--older-than', type=int, default=getattr(settings, 'ITEM_ORDER_COLUMNAR_ARCHIVE_AFTER_MONTHS', 12),
+            help='Archive the months that ended at least this many months ago'
+        )
+        parser.add_argument('--month', help='Only archive this month (YYYY-MM)')
+        parser.add_argument('--archive-dir', default=archive.default_directory(), help='Where to write the archive')
+        parser.add_argument('--dry-run', action='store_true', help='Only list the months that would be archived')
+
+    def handle(self, *args, **options):
+        if not options['archive_dir']:
+            raise CommandError('Set ITEM_ORDER_COLUMNAR_ARCHIVE_DIR or pass --archive-dir')
+
+        this_month = month_start(timezone.now().date())
+
+        if options['month']:
+            try:
+                months = [datetime.datetime.strptime(options['month'], '%Y-%m').date()]
+            except ValueError:
+                raise CommandError('--month must be a month in the form YYYY-MM')
+
+            if months[0] >= this_month:
+                raise CommandError('Only closed months can be archived')
+        else:
+            oldest_kept = add_months(this_month, -max(options['older_than'], 0))
+
+            months = [
+                moment.date()
+                for moment in ItemOrder.objects.filter(
+                    ordered_on__lt=archive.month_range(oldest_kept)[0]
+                ).datetimes('ordered_on', 'month', tzinfo=timezone.utc)
+            ]
+
+        for month in months:
+            if options['dry_run']:
+                self.stdout.write('Would archive {:%Y-%m}'.format(month))
+                continue
+
+            moved = archive.archive_month(month, options['archive_dir'])
+            self.stdout.write('Archived {} orders of {:%Y-%m}'.format(moved, month))
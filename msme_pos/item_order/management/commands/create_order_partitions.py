@@ -0,0 +1,38 @@
+from django.core.management.base import (
+    BaseCommand,
+    CommandError
+)
+from django.utils import timezone
+
+from item_order.partitions import (
+    add_months,
+    check_partitioned,
+    create_partition,
+    month_start,
+    partition_name,
+    PartitioningUnavailable
+)
+
+
+class Command(BaseCommand):
+    help = 'Creates the monthly item order partitions from this month through the coming months'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--months-ahead', type=int, default=3,
+            help='Also create the partitions of this many months after the current one'
+        )
+
+    def handle(self, *args, **options):
+        try:
+            check_partitioned()
+        except PartitioningUnavailable as exc:
+            raise CommandError(str(exc))
+
+        this_month = month_start(timezone.now().date())
+
+        for months in range(options['months_ahead'] + 1):
+            month = add_months(this_month, months)
+
+            if create_partition(month):
+                self.stdout.write('Created {}'.format(partition_name(month)))
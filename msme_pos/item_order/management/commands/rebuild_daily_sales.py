@@ -0,0 +1,118 @@
+import datetime
+
+from django.core.management.base import (
+    BaseCommand,
+    CommandError
+)
+from django.db import (
+    connection,
+    transaction
+)
+from django.db.models import (
+    Sum,
+    Count
+)
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from item_order.models import (
+    ItemOrder,
+    DailySales
+)
+from item_order.filters import start_of_day
+from item_order.analytics import revenue_sum
+from item_order import archive
+
+from menu_item.models import MenuItem
+
+
+class Command(BaseCommand):
+    help = 'Recomputes the daily sales rollup from the raw item orders, archived ones included'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--since', help='Only rebuild days on or after this date (YYYY-MM-DD)')
+        parser.add_argument('--business', help='Only rebuild this full_business_name')
+
+    def handle(self, *args, **options):
+        item_orders = ItemOrder.objects.all()
+        daily_sales = DailySales.objects.all()
+        menu_items = MenuItem.objects.all()
+        since = None
+
+        if options['since']:
+            try:
+                since = datetime.datetime.strptime(options['since'], '%Y-%m-%d').date()
+            except ValueError:
+                raise CommandError('--since must be a date in the form YYYY-MM-DD')
+
+            item_orders = item_orders.annotate(day=TruncDate('ordered_on')).filter(day__gte=since)
+            daily_sales = daily_sales.filter(day__gte=since)
+
+        if options['business']:
+            item_orders = item_orders.filter(menu_item__user_profile__full_business_name=options['business'])
+            daily_sales = daily_sales.filter(user_profile__full_business_name=options['business'])
+            menu_items = menu_items.filter(user_profile__full_business_name=options['business'])
+
+        totals = item_orders.annotate(day=TruncDate('ordered_on')).values(
+            'menu_item', 'menu_item__user_profile', 'day'
+        ).annotate(
+            order_count=Count('id'),
+            total_quantity=Sum('quantity'),
+            revenue=revenue_sum()
+        ).order_by()
+
+        with transaction.atomic():
+            deleted, _ = daily_sales.delete()
+
+            rows = {
+                (total['menu_item'], total['day']): DailySales(
+                    user_profile_id=total['menu_item__user_profile'],
+                    menu_item_id=total['menu_item'],
+                    day=total['day'],
+                    order_count=total['order_count'],
+                    total_quantity=total['total_quantity'],
+                    revenue=total['revenue']
+                )
+                for total in totals.iterator()
+            }
+
+            self.add_archived_totals(rows, menu_items, since)
+            rows = [rows[key] for key in sorted(rows)]
+
+            # SQLite caps how many rows fit in one INSERT
+            fields = [field for field in DailySales._meta.concrete_fields if not field.primary_key]
+            batch_size = min(1000, connection.ops.bulk_batch_size(fields, rows) or 1)
+
+            created = DailySales.objects.bulk_create(rows, batch_size=batch_size)
+
+        self.stdout.write('Replaced {} rollup rows with {}'.format(deleted, len(created)))
+
+    def add_archived_totals(self, rows, menu_items, since):
+        """ Adds the orders in the columnar archive to rows """
+
+        buckets = archive.sales_buckets(
+            menu_items, 'day', by_menu_item=True, start=start_of_day(since) if since else None
+        )
+
+        if not buckets:
+            return
+
+        user_profile_ids = dict(menu_items.values_list('id', 'user_profile_id'))
+
+        for bucket in buckets:
+            day = timezone.localtime(bucket['bucket']).date()
+            row = rows.get((bucket['menu_item'], day))
+
+            if row is None:
+                rows[(bucket['menu_item'], day)] = DailySales(
+                    user_profile_id=user_profile_ids[bucket['menu_item']],
+                    menu_item_id=bucket['menu_item'],
+                    day=day,
+                    order_count=bucket['order_count'],
+                    total_quantity=bucket['total_quantity'],
+                    revenue=bucket['revenue']
+                )
+            else:
+                row.order_count += bucket['order_count']
+                row.total_quantity += bucket['total_quantity']
+                row.revenue += bucket['revenue']
@@ -0,0 +1,19 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.11.4 on 2026-10-18 06:49
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('item_order', '0003_dailysales'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='itemorder',
+            index=models.Index(fields=['ordered_on', 'id'], name='item_order_ordered_on_id_idx'),
+        ),
+    ]
@@ -0,0 +1,26 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.11.4 on 2026-10-18 06:53
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('item_order', '0005_itemorder_menu_item_ordered_on_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='itemorder',
+            name='client_uuid',
+            field=models.UUIDField(editable=False, null=True, unique=True),
+        ),
+        migrations.AlterField(
+            model_name='itemorder',
+            name='ordered_on',
+            field=models.DateTimeField(default=django.utils.timezone.now, editable=False),
+        ),
+    ]
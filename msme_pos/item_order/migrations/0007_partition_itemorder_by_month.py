@@ -0,0 +1,174 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+# Declarative partitions with primary keys and foreign keys need PostgreSQL
+# 11. Other databases keep the plain table
+MINIMUM_VERSION = 110000
+
+# Primary and unique keys of a partitioned table must include the partition
+# key, so they become (id, ordered_on) and (client_uuid, ordered_on). A
+# client_uuid on its own is kept unique by the ClientUUID table that
+# 0008_clientuuid adds, see item_order.ingest.insert_new_orders
+UNIQUE_TOGETHER = ('client_uuid', 'ordered_on')
+
+# The constraints and indexes are added afterwards by add_constraints, with
+# the names Django gives them, so later migrations can find them. Django
+# can't alter the (id, ordered_on) primary key, so changing the id field
+# needs a migration of its own
+PARTITION = """
+ALTER TABLE item_order_itemorder RENAME TO item_order_itemorder_unpartitioned;
+
+CREATE TABLE item_order_itemorder (
+    LIKE item_order_itemorder_unpartitioned INCLUDING DEFAULTS
+) PARTITION BY RANGE (ordered_on);
+
+ALTER SEQUENCE item_order_itemorder_id_seq OWNED BY item_order_itemorder.id;
+
+DO $$
+DECLARE
+    month date;
+    last_month date;
+BEGIN
+    SELECT date_trunc('month', coalesce(min(ordered_on), now()) AT TIME ZONE 'UTC')::date
+    INTO month
+    FROM item_order_itemorder_unpartitioned;
+
+    last_month := (date_trunc('month', now() AT TIME ZONE 'UTC') + interval '3 months')::date;
+
+    WHILE month <= last_month LOOP
+        EXECUTE format(
+            'CREATE TABLE %I PARTITION OF item_order_itemorder FOR VALUES FROM (%L) TO (%L)',
+            'item_order_itemorder_y' || to_char(month, 'YYYY') || 'm' || to_char(month, 'MM'),
+            month::text || ' 00:00:00+00',
+            (month + interval '1 month')::date::text || ' 00:00:00+00'
+        );
+
+        month := (month + interval '1 month')::date;
+    END LOOP;
+END
+$$;
+
+CREATE TABLE item_order_itemorder_default PARTITION OF item_order_itemorder DEFAULT;
+
+INSERT INTO item_order_itemorder SELECT * FROM item_order_itemorder_unpartitioned;
+
+DROP TABLE item_order_itemorder_unpartitioned;
+"""
+
+UNPARTITION = """
+ALTER TABLE item_order_itemorder RENAME TO item_order_itemorder_partitioned;
+
+CREATE TABLE item_order_itemorder (
+    LIKE item_order_itemorder_partitioned INCLUDING DEFAULTS
+);
+
+ALTER SEQUENCE item_order_itemorder_id_seq OWNED BY item_order_itemorder.id;
+
+INSERT INTO item_order_itemorder SELECT * FROM item_order_itemorder_partitioned;
+
+DROP TABLE item_order_itemorder_partitioned CASCADE;
+"""
+
+
+def partitioning_supported(schema_editor):
+    connection = schema_editor.connection
+
+    return connection.vendor == 'postgresql' and connection.pg_version >= MINIMUM_VERSION
+
+
+def unique_client_uuid_field(model, unique):
+    field = models.UUIDField(null=True, unique=unique, editable=False)
+    field.set_attributes_from_name('client_uuid')
+    field.model = model
+
+    return field
+
+
+def add_constraints(model, schema_editor, primary_key, unique_sql):
+    """ Adds the keys and indexes of the order table, named as Django names
+    them when it creates the table """
+
+    table = model._meta.db_table
+    quote_name = schema_editor.quote_name
+
+    schema_editor.execute('ALTER TABLE {} ADD CONSTRAINT {} PRIMARY KEY ({})'.format(
+        quote_name(table), quote_name(table + '_pkey'), ', '.join(quote_name(column) for column in primary_key)
+    ))
+    schema_editor.execute(unique_sql)
+
+    for field in model._meta.local_fields:
+        if field.remote_field and field.db_constraint:
+            schema_editor.execute(schema_editor._create_fk_sql(model, field, '_fk_%(to_table)s_%(to_column)s'))
+
+    # The menu_item foreign key's index and Meta.indexes
+    for sql in schema_editor._model_indexes_sql(model):
+        schema_editor.execute(sql)
+
+
+def partition(apps, schema_editor):
+    ItemOrder = apps.get_model('item_order', 'ItemOrder')
+    old_field = ItemOrder._meta.get_field('client_uuid')
+    new_field = unique_client_uuid_field(ItemOrder, unique=False)
+
+    if not partitioning_supported(schema_editor):
+        schema_editor.alter_field(ItemOrder, old_field, new_field)
+        schema_editor.alter_unique_together(ItemOrder, [], [UNIQUE_TOGETHER])
+        return
+
+    schema_editor.execute(PARTITION, params=None)
+    add_constraints(
+        ItemOrder, schema_editor,
+        primary_key=('id', 'ordered_on'),
+        unique_sql=schema_editor._create_unique_sql(ItemOrder, list(UNIQUE_TOGETHER))
+    )
+
+
+def unpartition(apps, schema_editor):
+    ItemOrder = apps.get_model('item_order', 'ItemOrder')
+    old_field = unique_client_uuid_field(ItemOrder, unique=False)
+    new_field = ItemOrder._meta.get_field('client_uuid')
+
+    if not partitioning_supported(schema_editor):
+        schema_editor.alter_unique_together(ItemOrder, [UNIQUE_TOGETHER], [])
+        schema_editor.alter_field(ItemOrder, old_field, new_field)
+        return
+
+    schema_editor.execute(UNPARTITION, params=None)
+    # As 0006_itemorder_client_uuid created it, inline with the column
+    add_constraints(
+        ItemOrder, schema_editor,
+        primary_key=('id',),
+        unique_sql='ALTER TABLE item_order_itemorder ADD CONSTRAINT item_order_itemorder_client_uuid_key UNIQUE (client_uuid)'
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('item_order', '0006_itemorder_client_uuid'),
+        ('menu_item', '0004_menuitem_version'),
+    ]
+
+    operations = [
+        # On PostgreSQL the new keys come with the partitioned table, so
+        # the database side is all done by partition()
+        migrations.SeparateDatabaseAndState(
+            database_operations=[
+                migrations.RunPython(partition, unpartition),
+            ],
+            state_operations=[
+                migrations.AlterField(
+                    model_name='itemorder',
+                    name='client_uuid',
+                    field=models.UUIDField(editable=False, null=True),
+                ),
+                migrations.AlterUniqueTogether(
+                    name='itemorder',
+                    unique_together=set([UNIQUE_TOGETHER]),
+                ),
+            ],
+        ),
+    ]
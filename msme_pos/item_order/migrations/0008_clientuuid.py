@@ -0,0 +1,28 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+def fill_client_uuids(apps, schema_editor):
+    schema_editor.execute(
+        'INSERT INTO item_order_clientuuid (client_uuid) '
+        'SELECT DISTINCT client_uuid FROM item_order_itemorder WHERE client_uuid IS NOT NULL'
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('item_order', '0007_partition_itemorder_by_month'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ClientUUID',
+            fields=[
+                ('client_uuid', models.UUIDField(primary_key=True, serialize=False)),
+            ],
+        ),
+        migrations.RunPython(fill_client_uuids, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,33 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def fill_user_profiles(apps, schema_editor):
+    schema_editor.execute(
+        'UPDATE item_order_itemorder SET user_profile_id = ('
+        'SELECT user_profile_id FROM menu_item_menuitem WHERE menu_item_menuitem.id = item_order_itemorder.menu_item_id'
+        ')'
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('user_profile', '0002_userprofile_search_document'),
+        ('item_order', '0008_clientuuid'),
+    ]
+
+    # Made required and indexed by 0010_itemorder_user_profile_index, in a
+    # transaction of its own, as PostgreSQL can't alter a table that has
+    # deferred foreign key checks pending from this one's update
+    operations = [
+        migrations.AddField(
+            model_name='itemorder',
+            name='user_profile',
+            field=models.ForeignKey(editable=False, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='item_orders', to='user_profile.UserProfile'),
+        ),
+        migrations.RunPython(fill_user_profiles, migrations.RunPython.noop),
+    ]
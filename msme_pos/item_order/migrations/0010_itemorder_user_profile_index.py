@@ -0,0 +1,24 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('item_order', '0009_itemorder_user_profile'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='itemorder',
+            name='user_profile',
+            field=models.ForeignKey(editable=False, on_delete=django.db.models.deletion.CASCADE, related_name='item_orders', to='user_profile.UserProfile'),
+        ),
+        migrations.AddIndex(
+            model_name='itemorder',
+            index=models.Index(fields=['user_profile', 'ordered_on', 'id'], name='item_order_profile_ordered_idx'),
+        ),
+    ]
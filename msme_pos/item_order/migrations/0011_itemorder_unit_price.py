@@ -0,0 +1,32 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+def fill_unit_prices(apps, schema_editor):
+    # The best guess for orders placed before prices were kept is the
+    # menu item's price now, which is what they have been counted at
+    schema_editor.execute(
+        'UPDATE item_order_itemorder SET unit_price = ('
+        'SELECT price FROM menu_item_menuitem WHERE menu_item_menuitem.id = item_order_itemorder.menu_item_id'
+        ')'
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('item_order', '0010_itemorder_user_profile_index'),
+    ]
+
+    # Made required by 0012_itemorder_unit_price_required, in a transaction
+    # of its own, like 0010_itemorder_user_profile_index
+    operations = [
+        migrations.AddField(
+            model_name='itemorder',
+            name='unit_price',
+            field=models.DecimalField(decimal_places=2, editable=False, max_digits=8, null=True),
+        ),
+        migrations.RunPython(fill_unit_prices, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,19 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('item_order', '0011_itemorder_unit_price'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='itemorder',
+            name='unit_price',
+            field=models.DecimalField(decimal_places=2, editable=False, max_digits=8),
+        ),
+    ]
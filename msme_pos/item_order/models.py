@@ -1,13 +1,107 @@
-from django.db import models
+from django.db import (
+    models,
+    transaction
+)
+from django.dispatch import Signal
+from django.utils import timezone
+
+
+# Sent with the orders a delete() is about to remove, so item_order.signals
+# can take them out of the rollups with one query. Orders cascaded from a
+# deleted menu item or profile don't send it: their rollups and counters
+# are deleted with them, and the orders are fast-deleted without signals
+orders_deleting = Signal(providing_args=['item_orders'])
+
+
+class ItemOrderQuerySet(models.QuerySet):
+    def delete(self):
+        with transaction.atomic():
+            orders_deleting.send(sender=ItemOrder, item_orders=self)
+
+            return super(ItemOrderQuerySet, self).delete()
 
 
 class ItemOrder(models.Model):
     """ ItemOrder model """
 
     quantity = models.IntegerField()
-    ordered_on = models.DateTimeField(auto_now_add=True)
+    # Set when the order is placed, or to the terminal's time for replayed orders
+    ordered_on = models.DateTimeField(default=timezone.now, editable=False)
     additional_notes = models.TextField(null=True)
     menu_item = models.ForeignKey('menu_item.MenuItem', related_name='item_orders', on_delete=models.CASCADE)
+    # The menu item's profile, copied so a business's order history is one
+    # range of the (user_profile, ordered_on, id) index instead of a join.
+    # Menu items never move to another profile, so it doesn't go stale
+    user_profile = models.ForeignKey(
+        'user_profile.UserProfile', related_name='item_orders', on_delete=models.CASCADE, editable=False
+    )
+    # Generated by the terminal so offline orders can be replayed safely.
+    # Unique on its own through ClientUUID, as the partitioned table can
+    # only enforce it together with ordered_on
+    client_uuid = models.UUIDField(null=True, editable=False)
+    # The menu item's price when the order was placed. The rollups, sales
+    # analytics and the archive count the order's revenue at it, so a later
+    # price change doesn't rewrite past sales
+    unit_price = models.DecimalField(max_digits=8, decimal_places=2, editable=False)
+
+    objects = ItemOrderQuerySet.as_manager()
+
+    class Meta:
+        unique_together = ('client_uuid', 'ordered_on')
+        indexes = [
+            # Archiving and other scans of every order by time
+            models.Index(fields=['ordered_on', 'id'], name='item_order_ordered_on_id_idx'),
+            # Keyset pagination of a business's order history, see item_order.pagination
+            models.Index(fields=['user_profile', 'ordered_on', 'id'], name='item_order_profile_ordered_idx'),
+            # Date range filters and each menu item's newest orders
+            models.Index(fields=['menu_item', 'ordered_on', 'id'], name='item_order_menu_ordered_idx'),
+        ]
+
+    def save(self, *args, **kwargs):
+        if self.user_profile_id is None:
+            self.user_profile_id = self.menu_item.user_profile_id
+
+        if self.unit_price is None:
+            self.unit_price = self.menu_item.price
+
+        super(ItemOrder, self).save(*args, **kwargs)
+
+    def delete(self, *args, **kwargs):
+        with transaction.atomic():
+            orders_deleting.send(sender=ItemOrder, item_orders=ItemOrder.objects.filter(pk=self.pk))
+
+            return super(ItemOrder, self).delete(*args, **kwargs)
 
     def __str__(self):
         return str(self.quantity) + ' orders of ' + self.menu_item.name + ' from ' + self.menu_item.user_profile.business_name
+
+
+class ClientUUID(models.Model):
+    """ Every client_uuid an order was stored with. item_order.ingest adds
+    them in the same transaction as the orders, and the primary key keeps
+    two replays of one order from both getting in. Kept when the order is
+    deleted or archived, so a late replay of it is still a duplicate """
+
+    client_uuid = models.UUIDField(primary_key=True)
+
+    def __str__(self):
+        return str(self.client_uuid)
+
+
+class DailySales(models.Model):
+    """ Running totals of a menu item's orders for one day. Kept up to date
+    by item_order.rollups as orders are created, updated and deleted """
+
+    user_profile = models.ForeignKey('user_profile.UserProfile', related_name='daily_sales', on_delete=models.CASCADE)
+    menu_item = models.ForeignKey('menu_item.MenuItem', related_name='daily_sales', on_delete=models.CASCADE)
+    day = models.DateField()
+    order_count = models.IntegerField(default=0)
+    total_quantity = models.IntegerField(default=0)
+    revenue = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+
+    class Meta:
+        unique_together = ('menu_item', 'day')
+        index_together = ('user_profile', 'day')
+
+    def __str__(self):
+        return str(self.total_quantity) + ' orders of ' + self.menu_item.name + ' on ' + str(self.day)
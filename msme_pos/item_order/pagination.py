@@ -0,0 +1,124 @@
+import base64
+from collections import OrderedDict
+
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+from django.utils.six.moves.urllib import parse as urlparse
+
+from rest_framework import pagination
+from rest_framework.exceptions import NotFound
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import replace_query_param
+
+
+class OrderCursorPagination(pagination.BasePagination):
+    """ Keyset pagination over (ordered_on, id), newest first. Every page is
+    an index range scan that starts where the last one ended, so deep pages
+    cost the same as the first one, unlike OFFSET pagination. For that the
+    queryset must only be filtered on columns that lead an index ending in
+    (ordered_on, id), such as ItemOrder's user_profile """
+
+    cursor_query_param = 'cursor'
+    page_size = api_settings.PAGE_SIZE
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+    invalid_cursor_message = 'Invalid cursor'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        self.base_url = request.build_absolute_uri()
+
+        cursor = self.decode_cursor(request)
+
+        if cursor is None:
+            reverse = False
+            queryset = queryset.order_by('-ordered_on', '-id')
+        else:
+            ordered_on, id, reverse = cursor
+
+            if reverse:
+                queryset = queryset.filter(
+                    Q(ordered_on__gt=ordered_on) | Q(ordered_on=ordered_on, id__gt=id)
+                ).order_by('ordered_on', 'id')
+            else:
+                queryset = queryset.filter(
+                    Q(ordered_on__lt=ordered_on) | Q(ordered_on=ordered_on, id__lt=id)
+                ).order_by('-ordered_on', '-id')
+
+        # One extra row tells us whether there is another page after this one
+        results = list(queryset[:self.page_size + 1])
+        has_more = len(results) > self.page_size
+        results = results[:self.page_size]
+
+        if reverse:
+            results.reverse()
+            has_next, has_previous = True, has_more
+        else:
+            has_next, has_previous = has_more, cursor is not None
+
+        self.next_cursor = (results[-1].ordered_on, results[-1].id, False) if has_next and results else None
+        self.previous_cursor = (results[0].ordered_on, results[0].id, True) if has_previous and results else None
+
+        return results
+
+    def get_page_size(self, request):
+        try:
+            page_size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+
+        if page_size <= 0:
+            return self.page_size
+
+        return min(page_size, self.max_page_size)
+
+    def get_next_link(self):
+        return self.encode_cursor(self.next_cursor)
+
+    def get_previous_link(self):
+        return self.encode_cursor(self.previous_cursor)
+
+    def get_paginated_response(self, data):
+        return Response(OrderedDict([
+            ('next', self.get_next_link()),
+            ('previous', self.get_previous_link()),
+            ('results', data)
+        ]))
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+
+        if encoded is None:
+            return None
+
+        try:
+            querystring = base64.urlsafe_b64decode(encoded.encode('ascii')).decode('ascii')
+            tokens = urlparse.parse_qs(querystring, keep_blank_values=True)
+
+            ordered_on = parse_datetime(tokens['o'][0])
+            id = int(tokens['i'][0])
+            reverse = tokens.get('r', ['0'])[0] == '1'
+        except (TypeError, ValueError, KeyError, UnicodeError):
+            raise NotFound(self.invalid_cursor_message)
+
+        if ordered_on is None:
+            raise NotFound(self.invalid_cursor_message)
+
+        return ordered_on, id, reverse
+
+    def encode_cursor(self, cursor):
+        if cursor is None:
+            return None
+
+        ordered_on, id, reverse = cursor
+        tokens = OrderedDict([('o', ordered_on.isoformat()), ('i', id)])
+
+        if reverse:
+            tokens['r'] = '1'
+
+        querystring = urlparse.urlencode(tokens, doseq=True)
+        encoded = base64.urlsafe_b64encode(querystring.encode('ascii')).decode('ascii')
+
+        return replace_query_param(self.base_url, self.cursor_query_param, encoded)
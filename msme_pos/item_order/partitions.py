@@ -0,0 +1,135 @@
+import datetime
+import re
+
+from django.db import (
+    connection,
+    transaction
+)
+
+from item_order.models import ItemOrder
+
+
+# See migration 0007_partition_itemorder_by_month
+MINIMUM_VERSION = 110000
+
+PARENT = ItemOrder._meta.db_table
+DEFAULT_PARTITION = PARENT + '_default'
+
+PARTITION_NAME = re.compile(r'^' + PARENT + r'_y(\d{4})m(\d{2})$')
+
+
+class PartitioningUnavailable(Exception):
+    pass
+
+
+def month_start(day):
+    return datetime.date(day.year, day.month, 1)
+
+
+def add_months(month, months):
+    """ The first day of the month `months` after (or before) `month` """
+
+    index = month.year * 12 + month.month - 1 + months
+
+    return datetime.date(index // 12, index % 12 + 1, 1)
+
+
+def partition_name(month):
+    return '{}_y{:04d}m{:02d}'.format(PARENT, month.year, month.month)
+
+
+def partition_month(name):
+    """ The month a partition holds, or None if name isn't a monthly partition """
+
+    match = PARTITION_NAME.match(name)
+
+    if match is None:
+        return None
+
+    return datetime.date(int(match.group(1)), int(match.group(2)), 1)
+
+
+def bound(month):
+    return '{} 00:00:00+00'.format(month.isoformat())
+
+
+def check_partitioned():
+    """ Raises PartitioningUnavailable unless orders are stored partitioned """
+
+    if connection.vendor != 'postgresql' or connection.pg_version < MINIMUM_VERSION:
+        raise PartitioningUnavailable('Order partitions need PostgreSQL 11 or later')
+
+    with connection.cursor() as cursor:
+        cursor.execute('SELECT relkind FROM pg_class WHERE relname = %s', [PARENT])
+        row = cursor.fetchone()
+
+    if row is None or row[0] != 'p':
+        raise PartitioningUnavailable('{} is not partitioned, run migrate first'.format(PARENT))
+
+
+def monthly_partitions():
+    """ The months that have an attached partition, oldest first """
+
+    with connection.cursor() as cursor:
+        cursor.execute(
+            """
+            SELECT child.relname
+            FROM pg_inherits
+            JOIN pg_class parent ON parent.oid = pg_inherits.inhparent
+            JOIN pg_class child ON child.oid = pg_inherits.inhrelid
+            WHERE parent.relname = %s
+            """,
+            [PARENT]
+        )
+
+        names = [row[0] for row in cursor.fetchall()]
+
+    return sorted(month for month in map(partition_month, names) if month is not None)
+
+
+def create_partition(month):
+    """ Adds the partition for a month. Orders of that month that landed in
+    the default partition are moved into it. The table only copies the
+    columns and defaults; attaching it gives it the parent's keys, foreign
+    keys and indexes. Returns False if it exists """
+
+    name = partition_name(month)
+
+    if month in monthly_partitions():
+        return False
+
+    start, end = bound(month), bound(add_months(month, 1))
+
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute('CREATE TABLE "{}" (LIKE "{}" INCLUDING DEFAULTS)'.format(name, PARENT))
+        cursor.execute(
+            'WITH moved AS (DELETE FROM "{}" WHERE ordered_on >= %s AND ordered_on < %s RETURNING *) '
+            'INSERT INTO "{}" SELECT * FROM moved'.format(DEFAULT_PARTITION, name),
+            [start, end]
+        )
+        cursor.execute(
+            'ALTER TABLE "{}" ATTACH PARTITION "{}" FOR VALUES FROM (%s) TO (%s)'.format(PARENT, name),
+            [start, end]
+        )
+
+    return True
+
+
+def lock_partition(month):
+    """ Blocks writes to a month's partition until the transaction ends """
+
+    with connection.cursor() as cursor:
+        cursor.execute('LOCK TABLE "{}" IN SHARE MODE'.format(partition_name(month)))
+
+
+def drop_partition(month):
+    """ Detaches a month's partition and drops it, in the caller's
+    transaction, so a rollback brings it back. Orders of that month that
+    arrive later go to the default partition. item_order.archive drops
+    the partitions of the months it archives """
+
+    name = partition_name(month)
+
+    with connection.cursor() as cursor:
+        cursor.execute('ALTER TABLE "{}" DETACH PARTITION "{}"'.format(PARENT, name))
+        cursor.execute('DROP TABLE "{}"'.format(name))
@@ -0,0 +1,147 @@
+from collections import defaultdict
+from decimal import Decimal
+
+from django.db import (
+    transaction,
+    IntegrityError
+)
+from django.db.models import (
+    F,
+    Sum,
+    Count
+)
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from item_order.models import DailySales
+from item_order.analytics import revenue_sum
+
+from menu_item.models import MenuItem
+
+
+def order_day(ordered_on):
+    """ The local day an order was placed on """
+
+    if timezone.is_aware(ordered_on):
+        ordered_on = timezone.localtime(ordered_on)
+
+    return ordered_on.date()
+
+
+def new_deltas():
+    """ Maps (user_profile_id, menu_item_id, day) to
+    [order_count, total_quantity, revenue] changes """
+
+    return defaultdict(lambda: [0, 0, Decimal(0)])
+
+
+def add_to_deltas(deltas, user_profile_id, menu_item_id, ordered_on, quantity, unit_price, sign=1):
+    delta = deltas[(user_profile_id, menu_item_id, order_day(ordered_on))]
+    delta[0] += sign
+    delta[1] += sign * quantity
+    delta[2] += sign * quantity * Decimal(unit_price)
+
+
+def record_orders(item_orders, sign=1):
+    """ Adds (or with sign=-1, removes) orders from the daily rollup """
+
+    deltas = new_deltas()
+
+    for item_order in item_orders:
+        add_to_deltas(
+            deltas, item_order.user_profile_id, item_order.menu_item_id,
+            item_order.ordered_on, item_order.quantity, item_order.unit_price, sign
+        )
+
+    apply_deltas(deltas)
+
+
+def subtract_orders(item_orders):
+    """ Removes the orders of a queryset about to be deleted from the daily
+    rollup, summed per menu item and day in the database rather than
+    loaded one by one """
+
+    deltas = new_deltas()
+    totals = item_orders.annotate(
+        day=TruncDate('ordered_on')
+    ).values('user_profile', 'menu_item', 'day').annotate(
+        order_count=Count('id'),
+        total_quantity=Sum('quantity'),
+        revenue=revenue_sum()
+    ).order_by()
+
+    for row in totals:
+        deltas[(row['user_profile'], row['menu_item'], row['day'])] = [
+            -row['order_count'], -row['total_quantity'], -row['revenue']
+        ]
+
+    apply_deltas(deltas)
+
+
+def apply_deltas(deltas):
+    """ Applies changes to the daily rollup and to the menu items' order
+    counters with F-expressions so concurrent writers don't overwrite each
+    other. Rollup rows are only created for positive changes, so deleting
+    orders never resurrects a removed rollup row """
+
+    with transaction.atomic():
+        update_menu_item_counters(deltas)
+
+        # Sorted so that concurrent batches lock rows in the same order
+        for key in sorted(deltas):
+            user_profile_id, menu_item_id, day = key
+            order_count, total_quantity, revenue = deltas[key]
+
+            if not (order_count or total_quantity or revenue):
+                continue
+
+            updated = update_rollup(menu_item_id, day, order_count, total_quantity, revenue)
+
+            if updated or order_count <= 0:
+                continue
+
+            try:
+                with transaction.atomic():
+                    DailySales.objects.create(
+                        user_profile_id=user_profile_id,
+                        menu_item_id=menu_item_id,
+                        day=day,
+                        order_count=order_count,
+                        total_quantity=total_quantity,
+                        revenue=revenue
+                    )
+            except IntegrityError:
+                # Another request created the row first
+                update_rollup(menu_item_id, day, order_count, total_quantity, revenue)
+
+
+def update_rollup(menu_item_id, day, order_count, total_quantity, revenue):
+    return DailySales.objects.filter(menu_item_id=menu_item_id, day=day).update(
+        order_count=F('order_count') + order_count,
+        total_quantity=F('total_quantity') + total_quantity,
+        revenue=F('revenue') + revenue
+    )
+
+
+def update_menu_item_counters(deltas):
+    counters = defaultdict(lambda: [0, 0])
+
+    for (user_profile_id, menu_item_id, day), (order_count, total_quantity, revenue) in deltas.items():
+        counters[menu_item_id][0] += order_count
+        counters[menu_item_id][1] += total_quantity
+
+    for menu_item_id in sorted(counters):
+        order_count, total_quantity = counters[menu_item_id]
+
+        MenuItem.objects.filter(id=menu_item_id).update(
+            order_count=F('order_count') + order_count,
+            total_quantity=F('total_quantity') + total_quantity,
+            version=F('version') + 1
+        )
+
+
+def touch_menu_item(menu_item_id):
+    """ Marks a menu item as changed when one of its orders changed in a
+    way the rollups don't count, such as its notes """
+
+    MenuItem.objects.filter(id=menu_item_id).update(version=F('version') + 1)
@@ -13,8 +13,23 @@ class ItemOrderSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = ItemOrder
-        fields = ('id', 'quantity', 'menu_item', 'ordered_on', 'additional_notes')
+        fields = ('id', 'client_uuid', 'quantity', 'menu_item', 'ordered_on', 'additional_notes')
         extra_kwargs = {
             'menu_item': {'read_only': True},
         }
 
+
+class ItemOrderRowSerializer(serializers.Serializer):
+    """ Validates one row of a bulk order request. `menu_item` is the
+    menu item's url_param_name, same as in the single order route """
+
+    menu_item = serializers.CharField(max_length=255)
+    quantity = serializers.IntegerField(min_value=1)
+    additional_notes = serializers.CharField(required=False, allow_null=True, allow_blank=True)
+
+
+class ItemOrderSyncRowSerializer(ItemOrderRowSerializer):
+    """ Validates one order replayed by an offline terminal """
+
+    client_uuid = serializers.UUIDField()
+    ordered_on = serializers.DateTimeField()
@@ -0,0 +1,86 @@
+from django.dispatch import (
+    Signal,
+    receiver
+)
+from django.db.models.signals import (
+    post_init,
+    pre_save,
+    post_save
+)
+
+from item_order.models import (
+    ItemOrder,
+    orders_deleting
+)
+from item_order import rollups
+
+
+# Sent by code paths that insert orders with bulk_create, which skips post_save
+orders_bulk_created = Signal(providing_args=['orders'])
+
+
+ROLLUP_FIELDS = ('user_profile_id', 'menu_item_id', 'ordered_on', 'quantity', 'unit_price')
+
+
+def snapshot(item_order):
+    """ Remembers the values the rollups currently count for an order. One
+    loaded without some of them, through only() or defer(), gets None
+    instead of a query per order, and load_snapshot reads them if it is
+    saved """
+
+    loaded = item_order.__dict__
+
+    if all(name in loaded for name in ROLLUP_FIELDS):
+        item_order._rollup_snapshot = tuple(loaded[name] for name in ROLLUP_FIELDS)
+    else:
+        item_order._rollup_snapshot = None
+
+
+def load_snapshot(item_order):
+    if item_order._rollup_snapshot is None and item_order.pk is not None:
+        item_order._rollup_snapshot = ItemOrder.objects.filter(pk=item_order.pk).values_list(
+            'user_profile', 'menu_item', 'ordered_on', 'quantity', 'unit_price'
+        ).first()
+
+
+@receiver(post_init, sender=ItemOrder)
+def remember_item_order(sender, instance, **kwargs):
+    snapshot(instance)
+
+
+@receiver(pre_save, sender=ItemOrder)
+def item_order_saving(sender, instance, raw=False, **kwargs):
+    if not raw and not instance._state.adding:
+        load_snapshot(instance)
+
+
+@receiver(post_save, sender=ItemOrder)
+def item_order_saved(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+
+    if created:
+        rollups.record_orders([instance])
+    else:
+        counted = instance._rollup_snapshot
+        current = tuple(getattr(instance, name) for name in ROLLUP_FIELDS)
+
+        if counted != current:
+            deltas = rollups.new_deltas()
+            rollups.add_to_deltas(deltas, *counted, sign=-1)
+            rollups.add_to_deltas(deltas, *current)
+            rollups.apply_deltas(deltas)
+        else:
+            rollups.touch_menu_item(instance.menu_item_id)
+
+    snapshot(instance)
+
+
+@receiver(orders_deleting, sender=ItemOrder)
+def item_orders_deleting(sender, item_orders, **kwargs):
+    rollups.subtract_orders(item_orders)
+
+
+@receiver(orders_bulk_created)
+def item_orders_bulk_created(sender, orders, **kwargs):
+    rollups.record_orders(orders)
@@ -3,12 +3,20 @@ from django.conf.urls import url, include
 from item_order.views import (
     ItemOrderListAPIView,
     ItemOrderCreateAPIView,
+    ItemOrderBulkCreateAPIView,
+    ItemOrderSyncAPIView,
+    ItemOrderExportAPIView,
+    ItemOrderAnalyticsAPIView,
     ItemOrderDetailAPIView
 )
 
 
 urlpatterns = [
     url(r'(?P<full_business_name>[\w\-]+)/orders/$', ItemOrderListAPIView.as_view(), name='item_order_list'),
+    url(r'(?P<full_business_name>[\w\-]+)/orders/bulk/$', ItemOrderBulkCreateAPIView.as_view(), name='item_order_bulk_create'),
+    url(r'(?P<full_business_name>[\w\-]+)/orders/sync/$', ItemOrderSyncAPIView.as_view(), name='item_order_sync'),
+    url(r'(?P<full_business_name>[\w\-]+)/orders/export/(?P<export_format>csv|ndjson)/$', ItemOrderExportAPIView.as_view(), name='item_order_export'),
+    url(r'(?P<full_business_name>[\w\-]+)/analytics/$', ItemOrderAnalyticsAPIView.as_view(), name='item_order_analytics'),
     url(r'(?P<full_business_name>[\w\-]+)/(?P<menu_item_name>[\w\-]+)/$', ItemOrderCreateAPIView.as_view(), name='item_order_create'),
     url(r'(?P<full_business_name>[\w\-]+)/(?P<menu_item_name>[\w\-]+)/(?P<item_order_pk>[\w\-]+)/$', ItemOrderDetailAPIView.as_view(), name='item_order_detail'),
 ]
@@ -11,72 +11,405 @@ from rest_framework.permissions import (
     IsAuthenticated,
 )
 
+from django.conf import settings
+from django.db import router
+from django.db.models import (
+    Max,
+    Sum,
+    Count
+)
+from django.http import StreamingHttpResponse
+from django.shortcuts import get_object_or_404
+from django.utils.decorators import method_decorator
+from django.views.decorators.http import condition
+
 from rest_framework.response import Response
-from rest_framework.authentication import TokenAuthentication
 
 from item_order.models import ItemOrder
-from item_order.serializers import ItemOrderSerializer
+from item_order.ingest import (
+    resolve_menu_items,
+    insert_orders,
+    insert_new_orders
+)
+from item_order.pagination import OrderCursorPagination
+from item_order.buffer import get_buffer
+from item_order.filters import (
+    date_range,
+    filter_by_date_range
+)
+from item_order.exports import EXPORT_FORMATS
+from item_order.analytics import (
+    TRUNCATIONS,
+    merge_buckets,
+    sales_buckets
+)
+from item_order import archive
+from item_order.serializers import (
+    ItemOrderSerializer,
+    ItemOrderRowSerializer,
+    ItemOrderSyncRowSerializer
+)
 
+from menu_item.models import MenuItem
+from menu_item.serializers import MenuItemSerializer
+
+from user_profile.authentication import CachedTokenAuthentication
 from user_profile.permissions import (
+    OwnBusiness,
     GetOwnOrders,
     GetAndUpdateOwnOrderItem,
     CreateOrderItem
 )
 
+from msme_pos.conditional import (
+    make_etag,
+    cached_validators
+)
+
+
+def order_list_validators(request):
+    """ Summary of the user's menu items that changes whenever any of
+    their orders does, since every order change bumps its item's version """
+
+    def load():
+        return MenuItem.objects.filter(user_profile_id=request.business.id).aggregate(
+            count=Count('id'),
+            last_id=Max('id'),
+            versions=Sum('version')
+        )
 
-class ItemOrderListAPIView(generics.RetrieveUpdateDestroyAPIView):
-    """ View for a UserProfile to see all their orders """
+    return cached_validators(request, load)
+
+
+def order_list_etag(request, full_business_name=None):
+    validators = order_list_validators(request)
+
+    return make_etag(request, validators['count'], validators['last_id'], validators['versions'])
+
+
+class ItemOrderListAPIView(generics.ListAPIView):
+    """ View for a UserProfile to see all their orders, newest first, a
+    page at a time. Follow the `next` link to walk back through history.
+    Takes ?date=, ?from= and ?to= days to narrow the list. Months moved to
+    item_order.archive are no longer listed.
+
+    The response is {"next": url, "previous": url, "results": [orders]}
+    rather than the bare list of every order it used to be, so clients
+    must read "results" and follow "next" for older orders """
 
     serializer_class = ItemOrderSerializer
     queryset = ItemOrder.objects.all()
-    lookup_field = 'full_business_name'
-    authentication_classes = (TokenAuthentication,)
-    permission_classes = (GetOwnOrders,)
+    pagination_class = OrderCursorPagination
+    authentication_classes = (CachedTokenAuthentication,)
+    permission_classes = (IsAuthenticated, OwnBusiness, GetOwnOrders,)
+
+    def get_queryset(self):
+        return filter_by_date_range(
+            ItemOrder.objects.filter(user_profile_id=self.request.business.id),
+            self.request.query_params
+        )
+
+    @method_decorator(condition(etag_func=order_list_etag))
+    def get(self, request, *args, **kwargs):
+        return self.list(request, *args, **kwargs)
+
+
 
-    def get(self, request, full_business_name):
-        all_orders = ItemOrder.objects.all().filter(menu_item__user_profile=request.user)
-        serialized_orders = ItemOrderSerializer(all_orders, many=True)
-        # print(serialized_orders)
-        return Response(serialized_orders.data)
+class ItemOrderExportAPIView(generics.GenericAPIView):
+    """ Streams a UserProfile's orders as CSV or NDJSON. Takes ?from= and
+    ?to= days and a ?menu_item= url_param_name to narrow the export.
+    Months moved to item_order.archive are left out """
+
+    queryset = ItemOrder.objects.all()
+    authentication_classes = (CachedTokenAuthentication,)
+    permission_classes = (IsAuthenticated, OwnBusiness,)
+
+    def get(self, request, full_business_name=None, export_format=None):
+        item_orders = filter_by_date_range(
+            ItemOrder.objects.filter(user_profile_id=request.business.id),
+            request.query_params
+        )
+
+        menu_item_name = request.query_params.get('menu_item')
+
+        if menu_item_name:
+            item_orders = item_orders.filter(menu_item__url_param_name=menu_item_name)
+
+        # The rows are read after the view returned, once the middleware
+        # reset the replica routing for this thread, so the database is
+        # chosen now
+        item_orders = item_orders.using(router.db_for_read(ItemOrder))
+
+        stream, content_type = EXPORT_FORMATS[export_format]
+
+        response = StreamingHttpResponse(stream(item_orders), content_type=content_type)
+        response['Content-Disposition'] = 'attachment; filename="{}-orders.{}"'.format(full_business_name, export_format)
+
+        return response
+
+
+class ItemOrderAnalyticsAPIView(generics.GenericAPIView):
+    """ Sales of a UserProfile per ?interval= (hour, day, week or month),
+    optionally split with ?group_by=menu_item and narrowed with ?from= and
+    ?to= days. Orders in the table are summed up by the database, archived
+    ones by item_order.archive """
+
+    queryset = ItemOrder.objects.all()
+    authentication_classes = (CachedTokenAuthentication,)
+    permission_classes = (IsAuthenticated, OwnBusiness,)
+
+    def get(self, request, full_business_name=None):
+        interval = request.query_params.get('interval', 'day')
+        group_by = request.query_params.get('group_by')
+
+        if interval not in TRUNCATIONS:
+            return Response(
+                {'interval': ['Must be one of: {}.'.format(', '.join(TRUNCATIONS))]},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        if group_by not in (None, 'menu_item'):
+            return Response({'group_by': ['Must be menu_item.']}, status=status.HTTP_400_BAD_REQUEST)
+
+        item_orders = filter_by_date_range(
+            ItemOrder.objects.filter(user_profile_id=request.business.id),
+            request.query_params
+        )
+
+        start, end = date_range(request.query_params)
+
+        # Closed months may have been moved to the columnar archive
+        buckets = merge_buckets(
+            sales_buckets(item_orders, interval, by_menu_item=group_by == 'menu_item'),
+            archive.sales_buckets(
+                MenuItem.objects.filter(user_profile_id=request.business.id),
+                interval,
+                by_menu_item=group_by == 'menu_item',
+                start=start,
+                end=end
+            )
+        )
 
+        return Response({
+            'interval': interval,
+            'buckets': [
+                dict(bucket, bucket=bucket['bucket'].isoformat(), revenue=str(bucket['revenue']))
+                for bucket in buckets
+            ]
+        })
 
 
 class ItemOrderCreateAPIView(generics.CreateAPIView):
     serializer_class = ItemOrderSerializer
     queryset = ItemOrder.objects.all()
-    authentication_classes = (TokenAuthentication,)
-    permission_classes = (CreateOrderItem,)
+    authentication_classes = (CachedTokenAuthentication,)
+    permission_classes = (OwnBusiness, CreateOrderItem,)
 
     def get(self, request, full_business_name=None, menu_item_name=None):
-        menu_item = MenuItem.objects.get(url_param_name=menu_item_name)
+        menu_item = get_object_or_404(MenuItem, url_param_name=menu_item_name, user_profile_id=request.business.id)
 
-        if request.user == menu_item.user_profile:
+        if menu_item.user_profile_id == request.user.id:
             serialized_menu_item = MenuItemSerializer(menu_item)
             return Response(serialized_menu_item.data)
         else:
             return Response(status=status.HTTP_403_FORBIDDEN)
 
     def post(self, request, full_business_name=None, menu_item_name=None, *args):
-        menu_item = MenuItem.objects.get(url_param_name=menu_item_name)
+        menu_item = get_object_or_404(MenuItem, url_param_name=menu_item_name, user_profile_id=request.business.id)
 
-        item_order = ItemOrder.objects.create(
-            quantity=request.data.get('quantity'),
-            additional_notes=request.data.get('additional_notes'),
-            menu_item=menu_item
-        )
+        # Validated before the order is accepted, as a buffered one can't
+        # be turned down once the client was told it will be written
+        serializer = ItemOrderSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+
+        if settings.ITEM_ORDER_WRITE_BEHIND:
+            """ Accepted now, written with the next batch. The order's
+            client_uuid identifies it until it has an id """
+
+            item_order = get_buffer().add(
+                menu_item=menu_item,
+                quantity=serializer.validated_data['quantity'],
+                additional_notes=serializer.validated_data.get('additional_notes')
+            )
+
+            return Response(ItemOrderSerializer(item_order).data, status=status.HTTP_202_ACCEPTED)
+
+        item_order = serializer.save(menu_item=menu_item)
 
         serialized_item_order = ItemOrderSerializer(item_order)
 
         return Response(serialized_item_order.data)
 
 
+class ItemOrderBulkCreateAPIView(generics.GenericAPIView):
+    """ Creates many orders of a UserProfile's menu items in one request """
+
+    serializer_class = ItemOrderRowSerializer
+    queryset = ItemOrder.objects.all()
+    authentication_classes = (CachedTokenAuthentication,)
+    permission_classes = (IsAuthenticated, OwnBusiness,)
+    max_rows = 500
+
+    def post(self, request, full_business_name=None, *args):
+        rows = request.data
+
+        if not isinstance(rows, list):
+            return Response(
+                {'detail': 'Expected a list of orders.'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        if len(rows) > self.max_rows:
+            return Response(
+                {'detail': 'A batch can have at most {} orders.'.format(self.max_rows)},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        results = [None] * len(rows)
+        valid_rows = []
+
+        for index, row in enumerate(rows):
+            row_serializer = ItemOrderRowSerializer(data=row)
+
+            if row_serializer.is_valid():
+                valid_rows.append((index, row_serializer.validated_data))
+            else:
+                results[index] = {'index': index, 'status': status.HTTP_400_BAD_REQUEST, 'errors': row_serializer.errors}
+
+        menu_items = resolve_menu_items(request.business.id, [data['menu_item'] for _, data in valid_rows])
+
+        new_orders = []
+
+        for index, data in valid_rows:
+            menu_item = menu_items.get(data['menu_item'])
+
+            if menu_item is None:
+                results[index] = {
+                    'index': index,
+                    'status': status.HTTP_400_BAD_REQUEST,
+                    'errors': {'menu_item': ['Menu item does not exist.']}
+                }
+                continue
+
+            new_orders.append((index, ItemOrder(
+                quantity=data['quantity'],
+                additional_notes=data.get('additional_notes'),
+                menu_item=menu_item
+            )))
+
+        insert_orders([item_order for _, item_order in new_orders])
+
+        for index, item_order in new_orders:
+            results[index] = {
+                'index': index,
+                'status': status.HTTP_201_CREATED,
+                'order': ItemOrderSerializer(item_order).data
+            }
+
+        if not new_orders:
+            response_status = status.HTTP_400_BAD_REQUEST
+        elif len(new_orders) < len(rows):
+            response_status = status.HTTP_207_MULTI_STATUS
+        else:
+            response_status = status.HTTP_201_CREATED
+
+        return Response({
+            'created': len(new_orders),
+            'failed': len(rows) - len(new_orders),
+            'results': results
+        }, status=response_status)
+
+
+class ItemOrderSyncAPIView(generics.GenericAPIView):
+    """ Replays orders a terminal queued while offline. Each order carries
+    a client_uuid and the time it was placed on the terminal; orders whose
+    uuid is already stored are reported as duplicates and skipped, so a
+    batch can safely be sent again after a failed request """
+
+    serializer_class = ItemOrderSyncRowSerializer
+    queryset = ItemOrder.objects.all()
+    authentication_classes = (CachedTokenAuthentication,)
+    permission_classes = (IsAuthenticated, OwnBusiness,)
+    max_rows = 1000
+
+    def post(self, request, full_business_name=None, *args):
+        rows = request.data
+
+        if not isinstance(rows, list):
+            return Response(
+                {'detail': 'Expected a list of orders.'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        if len(rows) > self.max_rows:
+            return Response(
+                {'detail': 'A batch can have at most {} orders.'.format(self.max_rows)},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        results = []
+        valid_rows = []
+
+        for row in rows:
+            row_serializer = ItemOrderSyncRowSerializer(data=row)
+
+            if row_serializer.is_valid():
+                valid_rows.append(row_serializer.validated_data)
+            else:
+                results.append({
+                    'client_uuid': row.get('client_uuid') if isinstance(row, dict) else None,
+                    'status': 'rejected',
+                    'errors': row_serializer.errors
+                })
+
+        menu_items = resolve_menu_items(request.business.id, [data['menu_item'] for data in valid_rows])
+        new_orders = []
+
+        for data in valid_rows:
+            menu_item = menu_items.get(data['menu_item'])
+
+            if menu_item is None:
+                results.append({
+                    'client_uuid': str(data['client_uuid']),
+                    'status': 'rejected',
+                    'errors': {'menu_item': ['Menu item does not exist.']}
+                })
+                continue
+
+            new_orders.append(ItemOrder(
+                client_uuid=data['client_uuid'],
+                ordered_on=data['ordered_on'],
+                quantity=data['quantity'],
+                additional_notes=data.get('additional_notes'),
+                menu_item=menu_item
+            ))
+
+        created_orders, duplicates = insert_new_orders(new_orders)
+
+        for item_order in created_orders:
+            results.append({'client_uuid': str(item_order.client_uuid), 'status': 'created', 'id': item_order.id})
+
+        for item_order in duplicates:
+            results.append({'client_uuid': str(item_order.client_uuid), 'status': 'duplicate'})
+
+        return Response({
+            'created': len(created_orders),
+            'duplicates': len(duplicates),
+            'rejected': len(rows) - len(created_orders) - len(duplicates),
+            'results': results
+        })
+
+
 class ItemOrderDetailAPIView(generics.RetrieveUpdateDestroyAPIView):
     """ Serializer for UserProfile objects"""
     
     serializer_class = ItemOrderSerializer
     queryset = ItemOrder.objects.all()
-    authentication_classes = (TokenAuthentication,)
-    permission_classes = (GetAndUpdateOwnOrderItem,)
+    authentication_classes = (CachedTokenAuthentication,)
+    permission_classes = (OwnBusiness, GetAndUpdateOwnOrderItem,)
     lookup_field = 'pk'
     lookup_url_kwarg = 'item_order_pk'
 
+
+    def get_queryset(self):
+        return ItemOrder.objects.filter(user_profile_id=self.request.business.id)
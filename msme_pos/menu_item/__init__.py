@@ -0,0 +1 @@
+default_app_config = 'menu_item.apps.MenuItemConfig'
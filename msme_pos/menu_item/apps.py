@@ -3,3 +3,7 @@ from django.apps import AppConfig
 
 class MenuItemConfig(AppConfig):
     name = 'menu_item'
+
+    def ready(self):
+        # Connects the receivers that keep the autocomplete indexes current
+        import menu_item.signals
@@ -0,0 +1,167 @@
+import bisect
+import re
+import threading
+
+from django.conf import settings
+
+from menu_item.models import MenuItem
+
+from msme_pos.cache import LRUCache
+
+
+WORD_START = re.compile(r'(?:^|(?<=[\s\-]))\S')
+
+
+def normalize(text):
+    return ' '.join(text.lower().split())
+
+
+def word_starts(name):
+    """ Offsets of the words in a normalized name, so 'cof' finds 'iced coffee' """
+
+    return [match.start() for match in WORD_START.finditer(name)]
+
+
+class PrefixIndex(object):
+    """ One UserProfile's menu items as a sorted array of (name from a word
+    start on, offset, id) keys. A prefix lookup is a binary search to the
+    first key starting with it, then a walk while keys still match.
+    Matches at the start of a name come before matches at a later word """
+
+    def __init__(self, user_profile_id, menu_items):
+        self.user_profile_id = user_profile_id
+        self.lock = threading.Lock()
+        self.keys = []
+        self.items = {}
+
+        for menu_item in menu_items:
+            self.add(menu_item)
+
+    def __contains__(self, menu_item_id):
+        return menu_item_id in self.items
+
+    def add(self, menu_item):
+        name = normalize(menu_item.name)
+
+        self.items[menu_item.id] = {
+            'id': menu_item.id,
+            'name': menu_item.name,
+            'url_param_name': menu_item.url_param_name,
+            'price': str(menu_item.price),
+        }
+
+        for offset in word_starts(name):
+            bisect.insort(self.keys, (name[offset:], offset, menu_item.id))
+
+    def discard(self, menu_item_id):
+        if self.items.pop(menu_item_id, None) is None:
+            return
+
+        self.keys = [key for key in self.keys if key[2] != menu_item_id]
+
+    def update(self, menu_item):
+        with self.lock:
+            self.discard(menu_item.id)
+            self.add(menu_item)
+
+    def remove(self, menu_item_id):
+        with self.lock:
+            self.discard(menu_item_id)
+
+    def lookup(self, prefix, limit=10):
+        prefix = normalize(prefix)
+
+        with self.lock:
+            matches = {}
+            index = bisect.bisect_left(self.keys, (prefix,))
+
+            while index < len(self.keys) and self.keys[index][0].startswith(prefix):
+                key, offset, menu_item_id = self.keys[index]
+                matches[menu_item_id] = min(offset, matches.get(menu_item_id, offset))
+                index += 1
+
+            ranked = sorted(matches, key=lambda menu_item_id: (
+                matches[menu_item_id] > 0, self.items[menu_item_id]['name'].lower(), menu_item_id
+            ))
+
+            return [dict(self.items[menu_item_id]) for menu_item_id in ranked[:limit]]
+
+
+indexes = LRUCache(
+    max_size=getattr(settings, 'AUTOCOMPLETE_INDEX_MAX_SIZE', 1024),
+    ttl=getattr(settings, 'AUTOCOMPLETE_INDEX_TTL', 300)
+)
+build_lock = threading.Lock()
+
+# The profiles whose index is being built, and whether a menu item of
+# theirs changed since the build read them. A build that missed a change
+# is handed to its caller but not kept
+pending_builds = {}
+pending_lock = threading.Lock()
+
+
+def get_index(user_profile_id):
+    """ The profile's index, built with one query the first time it is asked
+    for and after AUTOCOMPLETE_INDEX_TTL seconds, so other processes'
+    changes show up. This process's changes are applied as they happen by
+    menu_item.signals """
+
+    index = indexes.get(user_profile_id)
+
+    if index is not None:
+        return index
+
+    with build_lock:
+        index = indexes.get(user_profile_id)
+
+        if index is None:
+            with pending_lock:
+                pending_builds[user_profile_id] = False
+
+            try:
+                index = PrefixIndex(
+                    user_profile_id,
+                    MenuItem.objects.filter(user_profile_id=user_profile_id).only(
+                        'id', 'name', 'url_param_name', 'price'
+                    )
+                )
+            finally:
+                with pending_lock:
+                    changed = pending_builds.pop(user_profile_id)
+
+                    if index is not None and not changed:
+                        indexes.set(user_profile_id, index)
+
+    return index
+
+
+def mark_changed(user_profile_id=None):
+    """ Marks the pending build of user_profile_id as stale, or every
+    pending build if it is None """
+
+    with pending_lock:
+        for pending_user_profile_id in pending_builds:
+            if user_profile_id is None or pending_user_profile_id == user_profile_id:
+                pending_builds[pending_user_profile_id] = True
+
+
+def menu_item_saved(menu_item):
+    # The item may have moved from any profile being built
+    mark_changed()
+
+    # A menu item moved to another profile leaves its old one
+    indexes.pop_where(lambda index: index.user_profile_id != menu_item.user_profile_id and menu_item.id in index)
+
+    index = indexes.get(menu_item.user_profile_id)
+
+    if index is not None:
+        index.update(menu_item)
+
+
+def menu_item_deleted(menu_item):
+    mark_changed(menu_item.user_profile_id)
+
+    index = indexes.get(menu_item.user_profile_id)
+
+    if index is not None:
+        index.remove(menu_item.id)
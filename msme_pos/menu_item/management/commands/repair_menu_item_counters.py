@@ -0,0 +1,62 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import (
+    F,
+    Sum,
+    Count
+)
+
+from menu_item.models import MenuItem
+from item_order.models import ItemOrder
+from item_order import archive
+
+
+class Command(BaseCommand):
+    help = "Recounts every menu item's order_count and total_quantity from its orders, archived ones included"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--business', help='Only repair this full_business_name')
+
+    def handle(self, *args, **options):
+        menu_items = MenuItem.objects.all()
+
+        if options['business']:
+            menu_items = menu_items.filter(user_profile__full_business_name=options['business'])
+
+        repaired = 0
+
+        with transaction.atomic():
+            # Locked before counting, so an order written meanwhile, which
+            # updates its menu item's counters in the same transaction,
+            # either is counted below or waits and is added on top
+            counters = list(menu_items.select_for_update().order_by('id').values_list(
+                'id', 'order_count', 'total_quantity'
+            ))
+
+            totals = {
+                total['menu_item']: (total['order_count'], total['total_quantity'])
+                for total in ItemOrder.objects.filter(menu_item__in=menu_items).values('menu_item').annotate(
+                    order_count=Count('id'),
+                    total_quantity=Sum('quantity')
+                ).order_by()
+            }
+
+            for bucket in archive.sales_buckets(menu_items, 'month', by_menu_item=True):
+                order_count, total_quantity = totals.get(bucket['menu_item'], (0, 0))
+                totals[bucket['menu_item']] = (
+                    order_count + bucket['order_count'],
+                    total_quantity + bucket['total_quantity']
+                )
+
+            for menu_item_id, order_count, total_quantity in counters:
+                counts = totals.get(menu_item_id, (0, 0))
+
+                if (order_count, total_quantity) != counts:
+                    MenuItem.objects.filter(id=menu_item_id).update(
+                        order_count=counts[0],
+                        total_quantity=counts[1],
+                        version=F('version') + 1
+                    )
+                    repaired += 1
+
+        self.stdout.write('Repaired the counters of {} menu items'.format(repaired))
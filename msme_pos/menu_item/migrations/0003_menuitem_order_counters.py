@@ -0,0 +1,44 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.11.4 on 2026-10-18 06:48
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+from django.db.models import Count, Sum
+
+
+def count_existing_orders(apps, schema_editor):
+    MenuItem = apps.get_model('menu_item', 'MenuItem')
+    ItemOrder = apps.get_model('item_order', 'ItemOrder')
+
+    totals = ItemOrder.objects.values('menu_item').annotate(
+        order_count=Count('id'),
+        total_quantity=Sum('quantity')
+    ).order_by()
+
+    for total in totals:
+        MenuItem.objects.filter(id=total['menu_item']).update(
+            order_count=total['order_count'],
+            total_quantity=total['total_quantity']
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('menu_item', '0002_menuitem_user_profile'),
+        ('item_order', '0002_itemorder_menu_item'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='menuitem',
+            name='order_count',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='menuitem',
+            name='total_quantity',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.RunPython(count_existing_orders, migrations.RunPython.noop),
+    ]
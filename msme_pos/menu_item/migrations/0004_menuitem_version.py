@@ -0,0 +1,20 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.11.4 on 2026-10-18 06:50
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('menu_item', '0003_menuitem_order_counters'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='menuitem',
+            name='version',
+            field=models.PositiveIntegerField(default=0),
+        ),
+    ]
@@ -1,4 +1,5 @@
 from django.db import models
+from django.db.models import F
 
 
 class MenuItem(models.Model):
@@ -11,10 +12,38 @@ class MenuItem(models.Model):
     added_on = models.DateTimeField(auto_now_add=True)
     user_profile = models.ForeignKey('user_profile.UserProfile', related_name='menu_items', on_delete=models.CASCADE)
 
+    # Totals of this item's orders, kept up to date by item_order.rollups
+    order_count = models.IntegerField(default=0)
+    total_quantity = models.IntegerField(default=0)
+
+    # Bumped whenever the item or one of its orders changes, in the same
+    # UPDATE as the change. The ETag of the item and its business's orders
+    version = models.PositiveIntegerField(default=0)
+
+    # Only ever changed with update() or F-expressions, so saving an
+    # instance loaded earlier must not write its stale copy back
+    counter_fields = ('order_count', 'total_quantity', 'version')
+
     def save(self, *args, **kwargs):
         self.url_param_name = self.name.replace(' ', '-').lower()
+        updating = not self._state.adding and not kwargs.get('force_insert')
+
+        if updating:
+            if not kwargs.get('update_fields'):
+                kwargs['update_fields'] = [
+                    field.name for field in self._meta.concrete_fields
+                    if not field.primary_key and field.name not in self.counter_fields
+                ]
+
+            self.version = F('version') + 1
+            kwargs['update_fields'] = list(kwargs['update_fields']) + ['version']
+
         super(MenuItem, self).save(*args, **kwargs)
 
+        if updating:
+            # Loaded again if it is read, as only the database knows it now
+            del self.version
+
     def __str__(self):
         
         return self.name
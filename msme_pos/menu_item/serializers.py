@@ -1,9 +1,39 @@
+from collections import defaultdict
+
+from django.db.models.expressions import RawSQL
+
 from rest_framework import (
     serializers,
     pagination
 )
+from rest_framework.exceptions import NotFound
 
 from menu_item.models import MenuItem
+from item_order.models import ItemOrder
+from item_order.serializers import ItemOrderSerializer
+from item_order.filters import filter_by_date_range
+
+
+def item_orders_window(request):
+    """ Offset and limit of the page of item orders asked for by a request,
+    or None if the page isn't a positive number, such as 'last' """
+
+    paginator = pagination.PageNumberPagination()
+    page_size = paginator.get_page_size(request)
+
+    try:
+        page_number = int(request.query_params.get(paginator.page_query_param, 1))
+    except ValueError:
+        return None
+
+    if page_number < 1:
+        return None
+
+    return (page_number - 1) * page_size, page_size
+
+
+# Newest first, the order the (menu_item, ordered_on) index is read in
+ORDER_POSITION = 'ROW_NUMBER() OVER (PARTITION BY menu_item_id ORDER BY ordered_on DESC, id DESC)'
 
 
 class MenuItemSerializer(serializers.ModelSerializer):
@@ -13,33 +43,87 @@ class MenuItemSerializer(serializers.ModelSerializer):
 
     class Meta: 
         model = MenuItem
-        fields = ('id', 'name', 'url_param_name', 'description', 'price', 'added_on', 'user_profile', 'item_orders')
+        fields = (
+            'id', 'name', 'url_param_name', 'description', 'price', 'added_on', 'user_profile',
+            'order_count', 'total_quantity', 'item_orders'
+        )
         extra_kwargs = {
             'url_param_name': {'read_only': True},
-            'user_profile': {'read_only': True}
+            'user_profile': {'read_only': True},
+            'order_count': {'read_only': True},
+            'total_quantity': {'read_only': True}
         }
 
+    @staticmethod
+    def attach_item_orders(menu_items, request):
+        """ Fetches the page of orders each of menu_items shows with one
+        query, so that serializing many menu items costs one query instead
+        of one per item. ROW_NUMBER() numbers each menu item's orders along
+        its (menu_item, ordered_on) index, and the page is a range of those
+        numbers, rather than a subquery run again for every order """
+
+        menu_items = list(menu_items)
+        window = item_orders_window(request)
+        pages = defaultdict(list)
+
+        if window is None:
+            # Left to each menu item's own paginator, which knows 'last'
+            # and turns anything else down the way it always has
+            return menu_items
+
+        offset, limit = window
+
+        if menu_items:
+            ranked = filter_by_date_range(
+                ItemOrder.objects.filter(menu_item__in=[menu_item.id for menu_item in menu_items]),
+                request.query_params
+            ).annotate(
+                order_position=RawSQL(ORDER_POSITION, [])
+            )
+            sql, params = ranked.query.sql_with_params()
+
+            item_orders = ItemOrder.objects.raw(
+                'SELECT * FROM ({}) ranked WHERE order_position > %s AND order_position <= %s '
+                'ORDER BY menu_item_id, order_position'.format(sql),
+                params + (offset, offset + limit)
+            )
+
+            for item_order in item_orders:
+                pages[item_order.menu_item_id].append(item_order)
+
+        for menu_item in menu_items:
+            if offset and not pages[menu_item.id]:
+                # Past the end of this item's orders, which its own
+                # paginator answers with a 404 too
+                raise NotFound('Invalid page.')
+
+            menu_item.page_of_item_orders = pages[menu_item.id]
+
+        return menu_items
+
     def paginated_item_orders(self, menu_item):
         request = self.context.get('request')
-        item_orders = ItemOrder.objects.filter(menu_item=menu_item).order_by('-ordered_on')
         
         if request:     
             """ In Get ItemOrderDetail view """
 
-            date_query = request.query_params.get('date')
+            if hasattr(menu_item, 'page_of_item_orders'):
+                """ Orders were already fetched with attach_item_orders """
 
-            if date_query:
-                datetime_date_query = pytz.utc.localize(datetime.datetime.strptime(date_query, '%Y-%m-%d'))
-                item_orders = item_orders.filter(ordered_on__date=datetime_date_query)
-            
-            paginator = pagination.PageNumberPagination()
-            page = paginator.paginate_queryset(item_orders, self.context['request'])
-            serializer = ItemOrderSerializer(page, many=True, context={'request': self.context['request']})
+                page = menu_item.page_of_item_orders
+            else:
+                item_orders = ItemOrder.objects.filter(menu_item=menu_item).order_by('-ordered_on', '-id')
+                item_orders = filter_by_date_range(item_orders, request.query_params)
+
+                paginator = pagination.PageNumberPagination()
+                page = paginator.paginate_queryset(item_orders, request)
+
+            serializer = ItemOrderSerializer(page, many=True, context={'request': request})
             
             return serializer.data
         else: 
             """ In Create ItemOrderDetail view so just return 
             number of orders """
 
-            return len(item_orders)
+            return menu_item.order_count
         
@@ -0,0 +1,28 @@
+import copy
+
+from django.db import transaction
+from django.db.models.signals import (
+    post_save,
+    post_delete
+)
+from django.dispatch import receiver
+
+from menu_item.models import MenuItem
+from menu_item import autocomplete
+
+
+# The autocomplete indexes only take a change once it is committed, so a
+# rolled back one never shows up in them. They get a copy of the menu item
+# as it was saved or deleted, since deleting clears its id
+
+@receiver(post_save, sender=MenuItem)
+def menu_item_saved(sender, instance, raw=False, **kwargs):
+    if not raw:
+        menu_item = copy.copy(instance)
+        transaction.on_commit(lambda: autocomplete.menu_item_saved(menu_item))
+
+
+@receiver(post_delete, sender=MenuItem)
+def menu_item_deleted(sender, instance, **kwargs):
+    menu_item = copy.copy(instance)
+    transaction.on_commit(lambda: autocomplete.menu_item_deleted(menu_item))
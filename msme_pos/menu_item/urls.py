@@ -3,6 +3,7 @@ from django.conf.urls import url, include
 from menu_item.views import (
     MenuItemListAPIView,
     MenuItemCreateAPIView,
+    MenuItemAutocompleteAPIView,
     MenuItemDetailAPIView
 )
 
@@ -10,5 +11,7 @@ from menu_item.views import (
 urlpatterns = [
     # Routes for MenuItem 
     url(r'(?P<full_business_name>[\w\-]+)/create/$', MenuItemCreateAPIView.as_view(), name='menu_items_create'),
+    # Before the detail route, which would take `autocomplete` for a menu item
+    url(r'(?P<full_business_name>[\w\-]+)/autocomplete/$', MenuItemAutocompleteAPIView.as_view(), name='menu_items_autocomplete'),
     url(r'(?P<full_business_name>[\w\-]+)/(?P<menu_item_name>[\w\-]+)/$', MenuItemDetailAPIView.as_view(), name='menu_items_detail')
 ]
@@ -1,3 +1,6 @@
+from django.utils.decorators import method_decorator
+from django.views.decorators.http import condition
+
 from rest_framework import (
     viewsets,
     filters,
@@ -12,33 +15,71 @@ from rest_framework.permissions import (
 )
 
 from rest_framework.response import Response
-from rest_framework.authentication import TokenAuthentication
 
 from menu_item.models import MenuItem
 from menu_item.serializers import MenuItemSerializer
+from menu_item.autocomplete import get_index
+
+from user_profile.authentication import CachedTokenAuthentication
+from user_profile.permissions import (
+    OwnBusiness,
+    GetAndUpdateOwnMenuItem
+)
+
+from msme_pos.conditional import (
+    make_etag,
+    cached_validators
+)
+
 
-from user_profile.permissions import GetAndUpdateOwnMenuItem
+def menu_item_validators(request, menu_item_name):
+    """ (id, version) of the URL's business's menu item, or None """
+
+    def load():
+        return MenuItem.objects.filter(
+            url_param_name=menu_item_name,
+            user_profile_id=request.business.id
+        ).values_list('id', 'version').first()
+
+    return cached_validators(request, load)
+
+
+def menu_item_etag(request, full_business_name=None, menu_item_name=None):
+    validators = menu_item_validators(request, menu_item_name)
+
+    return make_etag(request, *validators) if validators else None
 
 
 class MenuItemListAPIView(generics.ListAPIView):
     serializer_class = MenuItemSerializer
     queryset = MenuItem.objects.all()
-    authentication_classes = (TokenAuthentication,)
+    authentication_classes = (CachedTokenAuthentication,)
     permission_classes = (IsAdminUser,)
 
+    def get_queryset(self):
+        return MenuItem.objects.order_by('id')
+
+    def paginate_queryset(self, queryset):
+        page = super(MenuItemListAPIView, self).paginate_queryset(queryset)
+
+        if page is not None:
+            MenuItemSerializer.attach_item_orders(page, self.request)
+
+        return page
+
 
 class MenuItemCreateAPIView(generics.CreateAPIView):
     serializer_class = MenuItemSerializer
     queryset = MenuItem.objects.all()
-    authentication_classes = (TokenAuthentication,)
-    permission_classes = (IsAuthenticated,)
+    authentication_classes = (CachedTokenAuthentication,)
+    permission_classes = (IsAuthenticated, OwnBusiness,)
 
     def post(self, request, *args, **kwargs):
         new_menu_item = MenuItem.objects.create(
             name=request.data.get('name'),
             description=request.data.get('description'),
             price=request.data.get('price'),
-            user_profile=request.user
+            user_profile_id=request.business.id
         )
 
         serialized_menu_item = MenuItemSerializer(new_menu_item)
@@ -46,6 +87,26 @@ class MenuItemCreateAPIView(generics.CreateAPIView):
         return Response(serialized_menu_item.data)
 
 
+class MenuItemAutocompleteAPIView(generics.GenericAPIView):
+    """ Up to ?limit= of the business's menu items with a word starting with
+    ?q=, names starting with it first. Answered from the in-process index
+    in menu_item.autocomplete, so a keystroke costs no query """
+
+    queryset = MenuItem.objects.all()
+    authentication_classes = (CachedTokenAuthentication,)
+    permission_classes = (IsAuthenticated, OwnBusiness,)
+
+    def get(self, request, full_business_name=None):
+        try:
+            limit = min(int(request.query_params.get('limit', 10)), 50)
+        except ValueError:
+            return Response({'limit': ['A valid integer is required.']}, status=status.HTTP_400_BAD_REQUEST)
+
+        results = get_index(request.business.id).lookup(request.query_params.get('q', ''), max(limit, 0))
+
+        return Response({'results': results})
+
+
 class MenuItemDetailAPIView(generics.RetrieveUpdateDestroyAPIView):
     """ Handles getting, updating, and deleting UserProfile's MenuItem """
 
@@ -53,8 +114,15 @@ class MenuItemDetailAPIView(generics.RetrieveUpdateDestroyAPIView):
     queryset = MenuItem.objects.all()
     lookup_field = 'url_param_name'
     lookup_url_kwarg = 'menu_item_name'
-    authentication_classes = (TokenAuthentication,)
-    permission_classes = (IsAuthenticated, GetAndUpdateOwnMenuItem,)
+    authentication_classes = (CachedTokenAuthentication,)
+    permission_classes = (IsAuthenticated, OwnBusiness, GetAndUpdateOwnMenuItem,)
+
+    def get_queryset(self):
+        return MenuItem.objects.filter(user_profile_id=self.request.business.id)
+
+    @method_decorator(condition(etag_func=menu_item_etag))
+    def get(self, request, *args, **kwargs):
+        return self.retrieve(request, *args, **kwargs)
 
     def put(self, request, *args, **kwargs):
         return self.update(request, *args, **kwargs)
@@ -0,0 +1,18 @@
+"""
+ASGI config for msme_pos project.
+
+It exposes the ASGI callable as a module-level variable named ``application``.
+Run it with an ASGI server, for example ``uvicorn msme_pos.asgi:application``.
+"""
+
+import os
+
+import django
+
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "msme_pos.settings")
+
+django.setup()
+
+from msme_pos.async_handlers import ASGIApplication  # noqa: E402
+
+application = ASGIApplication()
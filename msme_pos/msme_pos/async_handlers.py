@@ -0,0 +1,203 @@
+import logging
+import sys
+from io import BytesIO
+
+from asgiref.sync import sync_to_async
+from asgiref.wsgi import WsgiToAsgi
+
+from django.core import signals
+from django.core.handlers.wsgi import (
+    WSGIHandler,
+    get_script_name
+)
+from django.http import HttpResponseBadRequest
+from django.urls import (
+    resolve,
+    set_script_prefix,
+    Resolver404
+)
+
+
+logger = logging.getLogger('django.request')
+
+# Read endpoints terminals poll, served by ASGIApplication.handle.
+# Everything else goes through the WSGI app
+ASYNC_VIEWS = (
+    'item_orders:item_order_list',
+    'menu_items:menu_items_autocomplete',
+    'menu_items:menu_items_detail',
+    'profiles:profiles_detail',
+)
+
+
+class ASGIApplication(object):
+    """ Serves GETs of the ASYNC_VIEWS with the event loop doing the I/O:
+    holding the connection, reading the request and sending the response
+    to a slow terminal only cost a coroutine, and a thread is only taken
+    while Django handles the request. Other requests are handed to the
+    WSGI application.
+
+    The views themselves are the usual synchronous DRF views, not async
+    ones. They run on the thread pool through the same handler as WSGI
+    requests, so every middleware in MIDDLEWARE_CLASSES applies to them """
+
+    def __init__(self):
+        self.handler = WSGIHandler()
+        self.wsgi_application = WsgiToAsgi(closing(self.handler))
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            return await self.lifespan(receive, send)
+
+        if scope['type'] == 'http' and scope['method'] in ('GET', 'HEAD'):
+            try:
+                resolver_match = resolve(scope['path'])
+            except Resolver404:
+                resolver_match = None
+
+            if resolver_match is not None and resolver_match.view_name in ASYNC_VIEWS:
+                return await self.handle(scope, receive, send)
+
+        return await self.wsgi_application(scope, receive, send)
+
+    async def lifespan(self, receive, send):
+        while True:
+            message = await receive()
+
+            if message['type'] == 'lifespan.startup':
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    async def handle(self, scope, receive, send):
+        body = await read_body(receive)
+
+        if body is None:
+            # The client went away
+            return
+
+        response, content = await sync_to_async(self.get_response)(build_environ(scope, body))
+
+        headers = [
+            (name.encode('latin1'), value.encode('latin1'))
+            for name, value in response.items()
+        ]
+
+        for cookie in response.cookies.values():
+            headers.append((b'Set-Cookie', cookie.output(header='').strip().encode('latin1')))
+
+        await send({'type': 'http.response.start', 'status': response.status_code, 'headers': headers})
+        await send({
+            'type': 'http.response.body',
+            'body': content if scope['method'] != 'HEAD' else b''
+        })
+
+    def get_response(self, environ):
+        """ Handles a request the way WSGIHandler.__call__ does, through the
+        middleware and the view, and returns the response with its body.
+        Called on the thread pool """
+
+        set_script_prefix(get_script_name(environ))
+        signals.request_started.send(sender=self.handler.__class__, environ=environ)
+
+        try:
+            request = self.handler.request_class(environ)
+        except UnicodeDecodeError:
+            logger.warning('Bad Request (UnicodeDecodeError)', exc_info=sys.exc_info(), extra={'status_code': 400})
+            response = HttpResponseBadRequest()
+        else:
+            response = self.handler.get_response(request)
+
+        try:
+            content = b''.join(response) if response.streaming else response.content
+        finally:
+            # Sends request_finished, which closes this thread's connections
+            response.close()
+
+        return response, content
+
+
+def closing(wsgi_application):
+    """ Calls close() on the WSGI application's responses once they are
+    sent, which asgiref's WsgiToAsgi leaves out. Django sends
+    request_finished from there, and that closes the thread's database
+    connections """
+
+    def application(environ, start_response):
+        response = wsgi_application(environ, start_response)
+
+        try:
+            for chunk in response:
+                yield chunk
+        finally:
+            if hasattr(response, 'close'):
+                response.close()
+
+    return application
+
+
+async def read_body(receive):
+    body = []
+
+    while True:
+        message = await receive()
+
+        if message['type'] == 'http.disconnect':
+            return None
+
+        body.append(message.get('body', b''))
+
+        if not message.get('more_body', False):
+            return b''.join(body)
+
+
+def build_environ(scope, body):
+    """ The WSGI environ of an ASGI http scope, so Django can build its
+    usual request from it """
+
+    server = scope.get('server') or ('localhost', 80)
+
+    environ = {
+        'REQUEST_METHOD': scope['method'],
+        'SCRIPT_NAME': scope.get('root_path', ''),
+        # WSGI passes the path as UTF-8 bytes decoded as latin-1
+        'PATH_INFO': scope['path'].encode('utf-8').decode('latin1'),
+        'QUERY_STRING': scope.get('query_string', b'').decode('latin1'),
+        'SERVER_NAME': server[0],
+        'SERVER_PORT': str(server[1]),
+        'SERVER_PROTOCOL': 'HTTP/{}'.format(scope.get('http_version', '1.1')),
+        'wsgi.version': (1, 0),
+        'wsgi.url_scheme': scope.get('scheme', 'http'),
+        'wsgi.input': BytesIO(body),
+        'wsgi.errors': sys.stderr,
+        'wsgi.multithread': True,
+        'wsgi.multiprocess': True,
+        'wsgi.run_once': False,
+    }
+
+    if scope.get('client'):
+        environ['REMOTE_ADDR'] = scope['client'][0]
+
+    for name, value in scope.get('headers', []):
+        name = name.decode('latin1')
+
+        if name == 'content-length':
+            key = 'CONTENT_LENGTH'
+        elif name == 'content-type':
+            key = 'CONTENT_TYPE'
+        else:
+            key = 'HTTP_' + name.upper().replace('-', '_')
+
+        value = value.decode('latin1')
+
+        if key in environ:
+            value = environ[key] + ',' + value
+
+        environ[key] = value
+
+    # The body was read in full, so its length is known even when it was
+    # sent chunked
+    environ['CONTENT_LENGTH'] = str(len(body))
+
+    return environ
@@ -0,0 +1,88 @@
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.exceptions import ImproperlyConfigured
+
+
+class LRUCache(object):
+    """ Thread-safe in-process cache holding at most max_size entries.
+    The least recently used entry is evicted first, and entries older
+    than ttl seconds are treated as missing """
+
+    def __init__(self, max_size, ttl=None):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self.lock:
+            entry = self.entries.get(key)
+
+            if entry is None:
+                return default
+
+            value, expires_at = entry
+
+            if expires_at is not None and expires_at <= time.monotonic():
+                del self.entries[key]
+                return default
+
+            self.entries.move_to_end(key)
+
+            return value
+
+    def set(self, key, value):
+        expires_at = time.monotonic() + self.ttl if self.ttl is not None else None
+
+        with self.lock:
+            self.entries[key] = (value, expires_at)
+            self.entries.move_to_end(key)
+
+            while len(self.entries) > self.max_size:
+                self.entries.popitem(last=False)
+
+    def pop(self, key, default=None):
+        with self.lock:
+            entry = self.entries.pop(key, None)
+
+        return default if entry is None else entry[0]
+
+    def pop_where(self, predicate):
+        """ Drops every entry whose value matches predicate """
+
+        with self.lock:
+            keys = [key for key, (value, _) in self.entries.items() if predicate(value)]
+
+            for key in keys:
+                del self.entries[key]
+
+        return len(keys)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+    def __len__(self):
+        return len(self.entries)
+
+
+def shared_cache(setting, default='default'):
+    """ The Django cache a setting names, which every worker process must
+    share. A LocMemCache only holds what its own process stored in it, so
+    it is refused """
+
+    alias = getattr(settings, setting, default)
+    cache = caches[alias]
+
+    if isinstance(cache, LocMemCache):
+        raise ImproperlyConfigured(
+            "{} names the '{}' cache, a LocMemCache that other worker processes "
+            "can't see. Use a shared cache such as DatabaseCache or memcached".format(setting, alias)
+        )
+
+    return cache
@@ -0,0 +1,26 @@
+import hashlib
+
+
+def make_etag(request, *validators):
+    """ ETag for a response built from a resource's validators. The full
+    path is part of it since query params such as ?page= or ?date= change
+    the response body """
+
+    digest = hashlib.md5(request.get_full_path().encode('utf-8'))
+
+    for validator in validators:
+        digest.update(b'|')
+        digest.update(str(validator).encode('utf-8'))
+
+    return digest.hexdigest()
+
+
+def cached_validators(request, load):
+    """ Loads a request's validators once per request. They only make ETags,
+    never Last-Modified, whose one-second resolution would let two changes
+    within a second share a date """
+
+    if not hasattr(request, 'conditional_validators'):
+        request.conditional_validators = load()
+
+    return request.conditional_validators
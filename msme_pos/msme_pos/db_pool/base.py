@@ -0,0 +1,101 @@
+"""
+PostgreSQL backend that reuses connections from a per-process pool.
+
+Use it as the ENGINE of a DATABASES entry and tune the pool with its POOL
+key, for example:
+
+    'ENGINE': 'msme_pos.db_pool',
+    'POOL': {'MAX_SIZE': 10, 'MAX_LIFETIME': 1800, 'HEALTH_CHECK': True, 'TIMEOUT': 10},
+
+Leave CONN_MAX_AGE at 0: Django then "closes" the connection at the end of
+every request, which hands it back to the pool. The pools' idle connections
+are closed when the process exits and before the test database is dropped.
+
+It also lists partitioned tables, such as item_order_itemorder once
+migrated, to Django, which would otherwise leave them out of flush and the
+test database's truncation between tests.
+"""
+
+from django.db.backends.postgresql.base import (
+    Database,
+    DatabaseWrapper as PostgresDatabaseWrapper
+)
+from django.db.backends.base.introspection import TableInfo
+from django.db.backends.postgresql.creation import DatabaseCreation as PostgresDatabaseCreation
+from django.db.backends.postgresql.introspection import DatabaseIntrospection as PostgresDatabaseIntrospection
+
+from msme_pos.db_pool.pool import (
+    close_pools,
+    get_pool,
+    PoolTimeout
+)
+
+
+class DatabaseCreation(PostgresDatabaseCreation):
+    def _destroy_test_db(self, test_database_name, verbosity):
+        # DROP DATABASE fails while the pools hold connections to it
+        close_pools(database=test_database_name)
+
+        super(DatabaseCreation, self)._destroy_test_db(test_database_name, verbosity)
+
+
+class DatabaseIntrospection(PostgresDatabaseIntrospection):
+    def get_table_list(self, cursor):
+        # As Django's, with relkind 'p' for partitioned tables
+        cursor.execute("""
+            SELECT c.relname, c.relkind
+            FROM pg_catalog.pg_class c
+            LEFT JOIN pg_catalog.pg_namespace n ON n.oid = c.relnamespace
+            WHERE c.relkind IN ('r', 'v', 'p')
+                AND n.nspname NOT IN ('pg_catalog', 'pg_toast')
+                AND pg_catalog.pg_table_is_visible(c.oid)""")
+
+        return [
+            TableInfo(row[0], 'v' if row[1] == 'v' else 't')
+            for row in cursor.fetchall()
+            if row[0] not in self.ignored_tables
+        ]
+
+
+class DatabaseWrapper(PostgresDatabaseWrapper):
+    creation_class = DatabaseCreation
+    introspection_class = DatabaseIntrospection
+    pool = None
+
+    def get_new_connection(self, conn_params):
+        self.pool = get_pool(
+            self.alias,
+            conn_params,
+            lambda: PostgresDatabaseWrapper.get_new_connection(self, conn_params),
+            self.settings_dict.get('POOL', {})
+        )
+
+        try:
+            connection = self.pool.checkout()
+        except PoolTimeout as exc:
+            # Raised as a driver error so Django turns it into its own
+            # OperationalError
+            raise Database.OperationalError(str(exc))
+
+        options = self.settings_dict['OPTIONS']
+        self.isolation_level = options.get('isolation_level', connection.isolation_level)
+
+        return connection
+
+    def _close(self):
+        if self.connection is None:
+            return
+
+        connection = self.connection
+        # Errors such as an IntegrityError leave the connection usable once
+        # it is rolled back. One that lost the server fails the rollback or
+        # is closed, and the pool throws it away
+        reusable = True
+
+        try:
+            if connection.get_transaction_status() != Database.extensions.TRANSACTION_STATUS_IDLE:
+                connection.rollback()
+        except Database.Error:
+            reusable = False
+
+        self.pool.checkin(connection, reusable=reusable)
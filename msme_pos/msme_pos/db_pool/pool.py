@@ -0,0 +1,263 @@
+import atexit
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+
+
+logger = logging.getLogger(__name__)
+
+
+class PoolTimeout(Exception):
+    pass
+
+
+class PooledConnection(object):
+    """ A raw DB-API connection and when it was opened """
+
+    def __init__(self, connection):
+        self.connection = connection
+        self.created = time.monotonic()
+
+
+class ConnectionPool(object):
+    """ Keeps up to max_size open connections per process and hands them
+    to the threads that need one, so requests don't each pay for a new
+    connection. Connections older than max_lifetime seconds are replaced,
+    and with health_check an idle connection runs `SELECT 1` before it is
+    handed out. Threads wait up to timeout seconds for a free connection
+    when all of them are in use """
+
+    def __init__(self, factory, max_size=10, max_lifetime=1800, health_check=True, timeout=10, database=''):
+        self.factory = factory
+        # Only used to label the stats
+        self.database = database
+        self.max_size = max_size
+        self.max_lifetime = max_lifetime
+        self.health_check = health_check
+        self.timeout = timeout
+
+        self.condition = threading.Condition()
+        self.idle = []
+        # Connections handed out, by id() of the raw connection
+        self.in_use = {}
+        # Connections being opened or checked
+        self.pending = 0
+
+        self.counts = OrderedDict([
+            ('checkouts', 0),
+            ('created', 0),
+            ('discarded', 0),
+            ('health_check_failures', 0),
+            ('waits', 0),
+            ('timeouts', 0),
+        ])
+
+    def size(self):
+        return len(self.idle) + len(self.in_use) + self.pending
+
+    def checkout(self):
+        deadline = time.monotonic() + self.timeout
+
+        while True:
+            pooled = self.reserve(deadline)
+
+            if pooled is None:
+                return self.open()
+
+            # Checked outside the lock, so a slow check doesn't hold up
+            # the other threads
+            usable = self.is_usable(pooled)
+
+            with self.condition:
+                self.pending -= 1
+
+                if usable:
+                    return self.hand_out(pooled)
+
+                self.discard(pooled)
+                self.condition.notify()
+
+    def reserve(self, deadline):
+        """ Takes an idle connection, or returns None when there is room to
+        open a new one. Either way it counts towards max_size until it is
+        handed out """
+
+        with self.condition:
+            while True:
+                if self.idle:
+                    self.pending += 1
+                    return self.idle.pop()
+
+                if self.size() < self.max_size:
+                    self.pending += 1
+                    return None
+
+                remaining = deadline - time.monotonic()
+
+                if remaining <= 0:
+                    self.counts['timeouts'] += 1
+                    raise PoolTimeout('No database connection was free within {} seconds'.format(self.timeout))
+
+                self.counts['waits'] += 1
+                self.condition.wait(remaining)
+
+    def open(self):
+        try:
+            connection = self.factory()
+        except Exception:
+            with self.condition:
+                self.pending -= 1
+                self.condition.notify()
+            raise
+
+        with self.condition:
+            self.pending -= 1
+            self.counts['created'] += 1
+
+            return self.hand_out(PooledConnection(connection))
+
+    def hand_out(self, pooled):
+        self.counts['checkouts'] += 1
+        self.in_use[id(pooled.connection)] = pooled
+
+        return pooled.connection
+
+    def checkin(self, connection, reusable=True):
+        """ Takes a connection back. A connection that isn't reusable, such as
+        one that saw a network error, is closed instead """
+
+        with self.condition:
+            pooled = self.in_use.pop(id(connection), None)
+
+            if pooled is None:
+                # Not ours, for example handed out before a fork
+                close(connection)
+                return
+
+            if reusable and not self.expired(pooled) and not is_closed(connection):
+                self.idle.append(pooled)
+            else:
+                self.discard(pooled)
+
+            self.condition.notify()
+
+    def expired(self, pooled):
+        return self.max_lifetime is not None and time.monotonic() - pooled.created > self.max_lifetime
+
+    def is_usable(self, pooled):
+        if self.expired(pooled) or is_closed(pooled.connection):
+            return False
+
+        if not self.health_check:
+            return True
+
+        try:
+            cursor = pooled.connection.cursor()
+
+            try:
+                cursor.execute('SELECT 1')
+            finally:
+                cursor.close()
+
+            # Leave the connection as it was if it isn't in autocommit
+            pooled.connection.rollback()
+        except Exception:
+            with self.condition:
+                self.counts['health_check_failures'] += 1
+
+            return False
+
+        return True
+
+    def discard(self, pooled):
+        self.counts['discarded'] += 1
+        close(pooled.connection)
+
+    def close_all(self):
+        with self.condition:
+            while self.idle:
+                self.discard(self.idle.pop())
+
+    def stats(self):
+        with self.condition:
+            stats = OrderedDict([
+                ('max_size', self.max_size),
+                ('size', self.size()),
+                ('idle', len(self.idle)),
+                ('in_use', len(self.in_use)),
+            ])
+            stats.update(self.counts)
+
+        return stats
+
+
+def is_closed(connection):
+    return bool(getattr(connection, 'closed', False))
+
+
+def close(connection):
+    try:
+        connection.close()
+    except Exception:
+        logger.debug('Could not close a pooled connection', exc_info=True)
+
+
+pools = {}
+pools_lock = threading.Lock()
+
+
+def get_pool(alias, conn_params, factory, options):
+    """ This process's pool for a database alias and connection parameters.
+    Changing the parameters, as the test runner does when it switches to
+    the test database, gets a new pool. A forked worker starts with empty
+    pools of its own """
+
+    key = (os.getpid(), alias, tuple(sorted((name, str(value)) for name, value in conn_params.items())))
+
+    with pools_lock:
+        if key not in pools:
+            pools[key] = ConnectionPool(
+                factory,
+                max_size=options.get('MAX_SIZE', 10),
+                max_lifetime=options.get('MAX_LIFETIME', 1800),
+                health_check=options.get('HEALTH_CHECK', True),
+                timeout=options.get('TIMEOUT', 10),
+                database=conn_params.get('database', '')
+            )
+
+        return pools[key]
+
+
+def close_pools(database=None):
+    """ Closes the idle connections of this process's pools, or of its pools
+    for one database name. Connections other threads are using are left
+    to them """
+
+    pid = os.getpid()
+
+    with pools_lock:
+        selected = [
+            pool for (pool_pid, alias, params), pool in pools.items()
+            if pool_pid == pid and database in (None, pool.database)
+        ]
+
+    for pool in selected:
+        pool.close_all()
+
+
+atexit.register(close_pools)
+
+
+def all_stats():
+    """ Stats of this process's pools, as (alias, database name, stats) """
+
+    pid = os.getpid()
+
+    with pools_lock:
+        return [
+            (alias, pool.database, pool.stats())
+            for (pool_pid, alias, params), pool in sorted(pools.items(), key=lambda item: item[0][:2])
+            if pool_pid == pid
+        ]
@@ -0,0 +1,132 @@
+import hashlib
+import random
+import threading
+import time
+
+from django.conf import settings
+from django.db import (
+    connections,
+    DEFAULT_DB_ALIAS
+)
+
+from msme_pos.cache import (
+    LRUCache,
+    shared_cache
+)
+
+
+# Apps whose reads may be served by a replica
+REPLICATED_APPS = ('user_profile', 'menu_item', 'item_order')
+
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+PIN_COOKIE = 'primary_pinned'
+
+# Sent by clients that don't keep cookies on their reads after a write, so
+# their pin is looked up in REPLICA_PIN_CACHE
+PIN_MARKER = 'HTTP_X_REPLICA_PIN'
+
+# Whether the request being handled on this thread may read from a replica
+state = threading.local()
+
+# When the pins this process set by token run out, so a client that reads
+# from the worker it wrote through needs no REPLICA_PIN_CACHE lookup
+local_pins = LRUCache(max_size=10000)
+
+
+def replicas():
+    return getattr(settings, 'DATABASE_REPLICAS', [])
+
+
+def pin_seconds():
+    return getattr(settings, 'REPLICA_PIN_SECONDS', 5)
+
+
+def pin_cache():
+    """ A pin set by the worker that handled the write must be seen by the
+    one handling the next read, so REPLICA_PIN_CACHE has to be shared """
+
+    return shared_cache('REPLICA_PIN_CACHE')
+
+
+def pin_cache_key(request):
+    authorization = request.META.get('HTTP_AUTHORIZATION')
+
+    if not authorization:
+        return None
+
+    return 'replica-pin:' + hashlib.sha256(authorization.encode('utf-8')).hexdigest()
+
+
+def is_pinned(request):
+    """ Whether the client wrote recently enough that a replica might not
+    have its write yet. The signed cookie and this process's own pins are
+    checked first, and REPLICA_PIN_CACHE only for a request with the
+    X-Replica-Pin marker, so other reads cost no lookup """
+
+    if request.get_signed_cookie(PIN_COOKIE, default=None, salt=PIN_COOKIE, max_age=pin_seconds()) is not None:
+        return True
+
+    # Terminals that don't keep cookies are recognised by their token
+    cache_key = pin_cache_key(request)
+
+    if cache_key is None:
+        return False
+
+    if local_pins.get(cache_key, 0) > time.time():
+        return True
+
+    return PIN_MARKER in request.META and pin_cache().get(cache_key) is not None
+
+
+def start_request(request):
+    state.use_replica = bool(replicas()) and request.method in SAFE_METHODS and not is_pinned(request)
+
+
+def finish_request(request, response):
+    state.use_replica = False
+
+    if request.method in SAFE_METHODS or not replicas():
+        return response
+
+    # Send this client's reads to the primary until the replicas caught up
+    seconds = pin_seconds()
+    response.set_signed_cookie(PIN_COOKIE, '1', salt=PIN_COOKIE, max_age=seconds, httponly=True)
+
+    cache_key = pin_cache_key(request)
+
+    if cache_key is not None:
+        local_pins.set(cache_key, time.time() + seconds)
+        pin_cache().set(cache_key, True, seconds)
+
+    return response
+
+
+class PrimaryReplicaRouter(object):
+    """ Sends reads of the replicated apps to one of DATABASE_REPLICAS while
+    handling a GET from a client that hasn't written in the last
+    REPLICA_PIN_SECONDS. Everything else uses the primary: writes, reads
+    inside a transaction, and work outside of requests such as management
+    commands """
+
+    def db_for_read(self, model, **hints):
+        if model._meta.app_label not in REPLICATED_APPS or not getattr(state, 'use_replica', False):
+            return DEFAULT_DB_ALIAS
+
+        # A transaction must see its own writes
+        if connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return DEFAULT_DB_ALIAS
+
+        return random.choice(replicas())
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replicas hold the same rows as the primary
+        databases = [DEFAULT_DB_ALIAS] + list(replicas())
+
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+
+        return None
@@ -0,0 +1,409 @@
+import fcntl
+import glob
+import json
+import mmap
+import os
+import struct
+import threading
+from collections import (
+    defaultdict,
+    OrderedDict
+)
+
+from django.conf import settings
+from django.utils.crypto import constant_time_compare
+from django.http import (
+    HttpResponse,
+    HttpResponseForbidden
+)
+
+from msme_pos.db_pool.pool import all_stats as db_pool_stats
+from msme_pos.processes import process_is_alive
+
+
+# Upper bounds of the latency histogram's buckets, in seconds
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+METRICS = OrderedDict([
+    ('msme_pos_http_requests_total', ('counter', 'Requests handled, by view, method and status code')),
+    ('msme_pos_http_errors_total', ('counter', 'Requests that ended in a server error, by view')),
+    ('msme_pos_http_request_duration_seconds', ('histogram', 'Time taken to handle a request, by view')),
+])
+
+# Every worker's database connection pools, see msme_pos.db_pool
+DB_POOL_METRICS = OrderedDict([
+    ('max_size', ('gauge', 'Most connections the pool may open')),
+    ('size', ('gauge', 'Open connections')),
+    ('idle', ('gauge', 'Open connections waiting to be used')),
+    ('in_use', ('gauge', 'Connections handed out')),
+    ('checkouts', ('counter', 'Connections handed out since the process started')),
+    ('created', ('counter', 'Connections opened')),
+    ('discarded', ('counter', 'Connections closed for being too old, broken or failing their health check')),
+    ('health_check_failures', ('counter', 'Idle connections that failed their health check')),
+    ('waits', ('counter', 'Times a thread waited for a free connection')),
+    ('timeouts', ('counter', 'Times a thread gave up waiting for a free connection')),
+])
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+# Counters of workers that exited are added to this file, so totals don't
+# go backwards. Their gauges are dropped
+MERGED_FILE = 'merged.db'
+LOCK_FILE = 'merge.lock'
+
+
+class MmapedValues(object):
+    """ Floats keyed by strings, kept in a memory mapped file that only this
+    process writes. The file holds the number of bytes in use followed by
+    entries of (key length, key, padding, value). Readers only look at the
+    used bytes, and an entry is written before the used count covers it,
+    so other processes can read the file at any time """
+
+    initial_size = 1024 * 1024
+
+    def __init__(self, path):
+        self.path = path
+        self.lock = threading.Lock()
+        self.positions = {}
+
+        self.file = open(path, 'a+b')
+
+        if os.fstat(self.file.fileno()).st_size == 0:
+            self.file.truncate(self.initial_size)
+
+        self.capacity = os.fstat(self.file.fileno()).st_size
+        self.map = mmap.mmap(self.file.fileno(), self.capacity)
+
+        self.used = struct.unpack_from('i', self.map, 0)[0]
+
+        if self.used == 0:
+            self.used = 8
+            struct.pack_into('i', self.map, 0, self.used)
+
+        for key, value, position in read_entries(self.map, self.used):
+            self.positions[key] = position
+
+    def inc(self, key, amount=1):
+        with self.lock:
+            position = self.positions.get(key)
+
+            if position is None:
+                position = self.add_entry(key)
+
+            value = struct.unpack_from('d', self.map, position)[0]
+            struct.pack_into('d', self.map, position, value + amount)
+
+    def set(self, key, value):
+        with self.lock:
+            position = self.positions.get(key)
+
+            if position is None:
+                position = self.add_entry(key)
+
+            struct.pack_into('d', self.map, position, value)
+
+    def add_entry(self, key):
+        encoded = key.encode('utf-8')
+        # Pads the key so the value that follows is 8-byte aligned
+        padded = encoded + b' ' * (8 - (len(encoded) + 4) % 8)
+        entry = struct.pack('i{}sd'.format(len(padded)), len(encoded), padded, 0.0)
+
+        while self.used + len(entry) > self.capacity:
+            self.capacity *= 2
+            self.file.truncate(self.capacity)
+            self.map.close()
+            self.map = mmap.mmap(self.file.fileno(), self.capacity)
+
+        self.map[self.used:self.used + len(entry)] = entry
+        self.used += len(entry)
+        struct.pack_into('i', self.map, 0, self.used)
+
+        position = self.used - 8
+        self.positions[key] = position
+
+        return position
+
+    def items(self):
+        with self.lock:
+            return [(key, value) for key, value, position in read_entries(self.map, self.used)]
+
+    def close(self):
+        with self.lock:
+            self.map.close()
+            self.file.close()
+
+
+class MemoryValues(object):
+    """ The same interface kept in a dict, for when METRICS_DIR isn't set
+    and there is a single process to report on """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.values = defaultdict(float)
+
+    def inc(self, key, amount=1):
+        with self.lock:
+            self.values[key] += amount
+
+    def set(self, key, value):
+        with self.lock:
+            self.values[key] = value
+
+    def items(self):
+        with self.lock:
+            return list(self.values.items())
+
+
+def read_entries(data, used):
+    position = 8
+
+    while position < used:
+        length = struct.unpack_from('i', data, position)[0]
+        key = bytes(data[position + 4:position + 4 + length]).decode('utf-8')
+        position += 4 + length + (8 - (length + 4) % 8)
+
+        yield key, struct.unpack_from('d', data, position)[0], position
+
+        position += 8
+
+
+def read_file(path):
+    try:
+        with open(path, 'rb') as metrics_file:
+            data = metrics_file.read()
+    except FileNotFoundError:
+        return []
+
+    if len(data) < 8:
+        return []
+
+    return [(key, value) for key, value, position in read_entries(data, struct.unpack_from('i', data, 0)[0])]
+
+
+class Registry(object):
+    """ Records this process's request metrics. With a directory, every
+    worker writes its own file in it and scraping adds the files up """
+
+    def __init__(self, directory=None):
+        self.directory = directory
+        self.pid = os.getpid()
+
+        if directory is None:
+            self.values = MemoryValues()
+        else:
+            if not os.path.isdir(directory):
+                os.makedirs(directory)
+
+            self.values = MmapedValues(os.path.join(directory, 'metrics-{}.db'.format(os.getpid())))
+
+    def inc(self, name, labels, amount=1):
+        self.values.inc(json.dumps([name, labels], sort_keys=True), amount)
+
+    def set(self, name, labels, value):
+        self.values.set(json.dumps([name, labels], sort_keys=True), value)
+
+    def observe_request(self, view, method, status_code, duration):
+        self.inc('msme_pos_http_requests_total', {'view': view, 'method': method, 'status': str(status_code)})
+
+        if status_code >= 500:
+            self.inc('msme_pos_http_errors_total', {'view': view})
+
+        # Buckets are stored on their own and made cumulative when scraped
+        le = next((str(bound) for bound in LATENCY_BUCKETS if duration <= bound), '+Inf')
+
+        self.inc('msme_pos_http_request_duration_seconds_bucket', {'view': view, 'le': le})
+        self.inc('msme_pos_http_request_duration_seconds_sum', {'view': view}, duration)
+        self.inc('msme_pos_http_request_duration_seconds_count', {'view': view})
+
+        self.record_db_pools()
+
+    def record_db_pools(self):
+        """ Copies this process's pool stats into its values, where the
+        scrape adds them up with the other workers' """
+
+        for alias, database, stats in db_pool_stats():
+            for stat in DB_POOL_METRICS:
+                self.set(db_pool_metric_name(stat), {'alias': alias, 'database': database}, stats[stat])
+
+    def collect(self):
+        """ Sums each (name, labels) over every process """
+
+        if self.directory is None:
+            items = self.values.items()
+        else:
+            # Held while reading too, so a file isn't counted both on its
+            # own and merged
+            with open(os.path.join(self.directory, LOCK_FILE), 'a') as lock_file:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+
+                try:
+                    self.merge_exited_processes()
+
+                    items = read_file(os.path.join(self.directory, MERGED_FILE))
+
+                    for path in sorted(glob.glob(os.path.join(self.directory, 'metrics-*.db'))):
+                        items.extend(read_file(path))
+                finally:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+        totals = defaultdict(float)
+
+        for key, value in items:
+            name, labels = json.loads(key)
+            totals[(name, tuple(sorted(labels.items())))] += value
+
+        return totals
+
+    def merge_exited_processes(self):
+        """ Adds the counters in the files of workers that exited to the
+        merged file and removes their files, the way prometheus_client's
+        multiprocess mode does. Must hold the merge lock """
+
+        exited = [
+            path for path in glob.glob(os.path.join(self.directory, 'metrics-*.db'))
+            if not process_is_alive(file_pid(path))
+        ]
+
+        if not exited:
+            return
+
+        merged = MmapedValues(os.path.join(self.directory, MERGED_FILE))
+
+        try:
+            for path in exited:
+                for key, value in read_file(path):
+                    if json.loads(key)[0] not in DB_POOL_GAUGES:
+                        merged.inc(key, value)
+
+                merged.map.flush()
+                os.remove(path)
+        finally:
+            merged.close()
+
+    def exposition(self):
+        """ The metrics in Prometheus' text format """
+
+        self.record_db_pools()
+        totals = self.collect()
+        lines = []
+
+        for name, (kind, description) in METRICS.items():
+            lines.append('# HELP {} {}'.format(name, description))
+            lines.append('# TYPE {} {}'.format(name, kind))
+
+            if kind == 'histogram':
+                lines.extend(histogram_samples(name, totals))
+            else:
+                for (sample_name, labels), value in sorted(totals.items()):
+                    if sample_name == name:
+                        lines.append(sample(name, labels, value))
+
+        lines.extend(db_pool_samples(totals))
+
+        return '\n'.join(lines) + '\n'
+
+
+def histogram_samples(name, totals):
+    views = sorted(set(
+        dict(labels)['view'] for (sample_name, labels) in totals if sample_name == name + '_count'
+    ))
+
+    for view in views:
+        cumulative = 0
+
+        for bound in [str(bound) for bound in LATENCY_BUCKETS] + ['+Inf']:
+            cumulative += totals.get((name + '_bucket', (('le', bound), ('view', view))), 0)
+            yield sample(name + '_bucket', (('view', view), ('le', bound)), cumulative)
+
+        yield sample(name + '_sum', (('view', view),), totals[(name + '_sum', (('view', view),))])
+        yield sample(name + '_count', (('view', view),), totals[(name + '_count', (('view', view),))])
+
+
+def db_pool_metric_name(stat):
+    return 'msme_pos_db_pool_' + stat + ('_total' if DB_POOL_METRICS[stat][0] == 'counter' else '')
+
+
+DB_POOL_GAUGES = set(
+    db_pool_metric_name(stat) for stat, (kind, description) in DB_POOL_METRICS.items() if kind == 'gauge'
+)
+
+
+def file_pid(path):
+    return int(os.path.basename(path)[len('metrics-'):-len('.db')])
+
+
+def db_pool_samples(totals):
+    """ Every worker's pools added up, by alias and database """
+
+    for stat, (kind, description) in DB_POOL_METRICS.items():
+        name = db_pool_metric_name(stat)
+        samples = [
+            (labels, value) for (sample_name, labels), value in sorted(totals.items())
+            if sample_name == name
+        ]
+
+        if not samples:
+            continue
+
+        yield '# HELP {} {}'.format(name, description)
+        yield '# TYPE {} {}'.format(name, kind)
+
+        for labels, value in samples:
+            yield sample(name, labels, value)
+
+
+def sample(name, labels, value):
+    if value == int(value):
+        value = int(value)
+
+    return '{}{{{}}} {}'.format(name, ','.join(
+        '{}="{}"'.format(label, escape(label_value)) for label, label_value in labels
+    ), value)
+
+
+def escape(value):
+    return value.replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+registry = None
+registry_lock = threading.Lock()
+
+
+def get_registry():
+    """ This process's registry. A forked worker gets its own file """
+
+    global registry
+
+    directory = getattr(settings, 'METRICS_DIR', None)
+
+    with registry_lock:
+        if registry is None or registry.pid != os.getpid() or registry.directory != directory:
+            registry = Registry(directory)
+
+    return registry
+
+
+def metrics_allowed(request):
+    """ Staff users, and scrapers that send METRICS_TOKEN as a bearer token.
+    A non-empty METRICS_ALLOWED_IPS only accepts the token from those
+    addresses """
+
+    user = getattr(request, 'user', None)
+
+    if user is not None and user.is_active and user.is_staff:
+        return True
+
+    token = getattr(settings, 'METRICS_TOKEN', None)
+    allowed_ips = getattr(settings, 'METRICS_ALLOWED_IPS', ())
+
+    if not token or (allowed_ips and request.META.get('REMOTE_ADDR') not in allowed_ips):
+        return False
+
+    return constant_time_compare(request.META.get('HTTP_AUTHORIZATION', ''), 'Bearer ' + token)
+
+
+def metrics_view(request):
+    if not metrics_allowed(request):
+        return HttpResponseForbidden()
+
+    return HttpResponse(get_registry().exposition(), content_type=CONTENT_TYPE)
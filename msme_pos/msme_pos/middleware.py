@@ -0,0 +1,260 @@
+import hashlib
+import json
+import logging
+import random
+import time
+
+from django.conf import settings
+from django.http import HttpResponse
+from django.utils.deprecation import MiddlewareMixin
+
+from msme_pos import db_routers
+from msme_pos.cache import shared_cache
+from msme_pos.metrics import get_registry
+from msme_pos.timing import (
+    start_timing,
+    stop_timing,
+    instrument_connections
+)
+
+
+timing_logger = logging.getLogger('msme_pos.timing')
+
+
+def json_response(data, status):
+    return HttpResponse(json.dumps(data), status=status, content_type='application/json')
+
+
+class IdempotencyKeyMiddleware(MiddlewareMixin):
+    """ Remembers the response to a write request sent with an
+    Idempotency-Key header and hands it back, status, headers and body,
+    without running the view again when a retry arrives with the same key.
+    Keys are scoped to the Authorization header, or for anonymous callers
+    such as a signup to their address, and expire after IDEMPOTENCY_KEY_TTL
+    seconds.
+
+    Only successful responses are kept. A 4xx, such as a bad token or an
+    invalid body the client then fixes, and a 5xx leave the key free for
+    the retry to run for real. IDEMPOTENCY_CACHE must be shared by every
+    worker, since a retry may reach another one """
+
+    methods = ('POST', 'PUT', 'PATCH', 'DELETE')
+
+    # How long a request may hold its key before a retry can take over
+    in_progress_timeout = 60
+
+    def __init__(self, get_response=None):
+        super(IdempotencyKeyMiddleware, self).__init__(get_response)
+        self.cache = shared_cache('IDEMPOTENCY_CACHE')
+        self.ttl = getattr(settings, 'IDEMPOTENCY_KEY_TTL', 60 * 60 * 24)
+
+    def process_request(self, request):
+        key = request.META.get('HTTP_IDEMPOTENCY_KEY')
+
+        if not key or request.method not in self.methods:
+            return None
+
+        scope = request.META.get('HTTP_AUTHORIZATION')
+
+        if not scope:
+            # Kept apart from every Authorization value, so an anonymous
+            # key never replays a response meant for a signed in caller
+            scope = 'anonymous:' + request.META.get('REMOTE_ADDR', '')
+
+        cache_key = 'idempotency:' + hashlib.sha256(
+            (scope + '\n' + key).encode('utf-8')
+        ).hexdigest()
+
+        fingerprint = hashlib.sha256(
+            request.method.encode('utf-8') + b'\n' + request.get_full_path().encode('utf-8') + b'\n' + request.body
+        ).hexdigest()
+
+        # A stored entry without a status marks a request still running
+        claim = (fingerprint, None, None, None, None)
+
+        if not self.cache.add(cache_key, claim, self.in_progress_timeout):
+            stored = self.cache.get(cache_key)
+
+            if stored is not None:
+                return self.replay(stored, fingerprint)
+
+            # The entry expired between add() and get(), so take the key
+            self.cache.set(cache_key, claim, self.in_progress_timeout)
+
+        request.idempotency_cache_key = cache_key
+        request.idempotency_fingerprint = fingerprint
+
+        return None
+
+    def process_response(self, request, response):
+        cache_key = getattr(request, 'idempotency_cache_key', None)
+
+        if cache_key is None:
+            return response
+
+        if response.status_code >= 400 or response.streaming:
+            # Let the client retry for real
+            self.cache.delete(cache_key)
+        else:
+            self.cache.set(cache_key, (
+                request.idempotency_fingerprint,
+                response.status_code,
+                list(response.items()),
+                response.cookies.output(header='', sep='\n'),
+                response.content
+            ), self.ttl)
+
+        return response
+
+    def replay(self, stored, fingerprint):
+        stored_fingerprint, status, headers, cookies, content = stored
+
+        if stored_fingerprint != fingerprint:
+            return json_response(
+                {'detail': 'This Idempotency-Key was already used for a different request.'},
+                status=422
+            )
+
+        if status is None:
+            return json_response(
+                {'detail': 'A request with this Idempotency-Key is still being processed.'},
+                status=409
+            )
+
+        response = HttpResponse(content, status=status)
+
+        for header, value in headers:
+            response[header] = value
+
+        response.cookies.load(cookies)
+        response['Idempotent-Replayed'] = 'true'
+
+        return response
+
+
+class RequestTimingMiddleware(MiddlewareMixin):
+    """ Measures how long each request spent in the database, in the view
+    and rendering the response, and how many queries it ran. The numbers
+    go out in Server-Timing and X-Query-Count headers, and a sample of
+    REQUEST_TIMING_LOG_SAMPLE_RATE requests is logged to msme_pos.timing.
+
+    Should be first in MIDDLEWARE_CLASSES so that it times everything. Queries
+    run while a streaming response is consumed aren't counted """
+
+    def __init__(self, get_response=None):
+        super(RequestTimingMiddleware, self).__init__(get_response)
+        self.headers = getattr(settings, 'REQUEST_TIMING_HEADERS', True)
+        self.log_sample_rate = getattr(settings, 'REQUEST_TIMING_LOG_SAMPLE_RATE', 0)
+
+    def process_request(self, request):
+        instrument_connections()
+        request.timing = start_timing()
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        request.timing.view_started = time.perf_counter()
+
+    def process_template_response(self, request, response):
+        # DRF's responses are rendered after this, so the view is done
+        request.timing.view_finished = time.perf_counter()
+
+        return response
+
+    def process_response(self, request, response):
+        timing = getattr(request, 'timing', None)
+
+        if timing is None:
+            return response
+
+        stop_timing()
+
+        if timing.view_started is not None and timing.view_finished is None:
+            # Not a template response, so there was nothing left to render
+            timing.view_finished = timing.finished
+
+        if self.headers:
+            metrics = [('db', timing.db_time, '{} queries'.format(timing.query_count))]
+
+            if timing.view_time is not None:
+                metrics.append(('view', timing.view_time, None))
+                metrics.append(('render', timing.render_time, None))
+
+            metrics.append(('total', timing.total_time, None))
+
+            response['Server-Timing'] = ', '.join(
+                server_timing_metric(name, duration, description)
+                for name, duration, description in metrics
+            )
+            response['X-Query-Count'] = str(timing.query_count)
+
+        if self.log_sample_rate and random.random() < self.log_sample_rate:
+            timing_logger.info(
+                '%s %s %s queries=%d db=%.1fms view=%.1fms render=%.1fms total=%.1fms',
+                request.method, request.path, response.status_code, timing.query_count,
+                timing.db_time * 1000, (timing.view_time or 0) * 1000,
+                (timing.render_time or 0) * 1000, timing.total_time * 1000
+            )
+
+        return response
+
+
+def server_timing_metric(name, duration, description=None):
+    metric = '{};dur={:.1f}'.format(name, duration * 1000)
+
+    if description:
+        metric += ';desc="{}"'.format(description)
+
+    return metric
+
+
+class MetricsMiddleware(MiddlewareMixin):
+    """ Counts requests and errors and records their latency in the metrics
+    registry, labelled with the URL name the request resolved to, such as
+    item_orders:item_order_create """
+
+    def process_request(self, request):
+        request.metrics_started = time.perf_counter()
+
+    def process_exception(self, request, exception):
+        # An unhandled exception skips process_response
+        self.observe(request, 500)
+
+    def process_response(self, request, response):
+        self.observe(request, response.status_code)
+
+        return response
+
+    def observe(self, request, status_code):
+        started = getattr(request, 'metrics_started', None)
+
+        if started is None:
+            return
+
+        request.metrics_started = None
+
+        resolver_match = getattr(request, 'resolver_match', None)
+        view = resolver_match.view_name if resolver_match is not None else 'unresolved'
+
+        get_registry().observe_request(view, request.method, status_code, time.perf_counter() - started)
+
+
+class ReplicaPinningMiddleware(MiddlewareMixin):
+    """ Lets PrimaryReplicaRouter send this request's reads to a replica
+    when it is a GET, and after a write keeps the client's reads on the
+    primary for REPLICA_PIN_SECONDS so it sees what it just wrote. With
+    DATABASE_REPLICAS set, a REPLICA_PIN_CACHE that isn't shared between
+    workers is refused on startup """
+
+    def __init__(self, get_response=None):
+        super(ReplicaPinningMiddleware, self).__init__(get_response)
+
+        if db_routers.replicas():
+            db_routers.pin_cache()
+
+    def process_request(self, request):
+        db_routers.start_request(request)
+
+    def process_exception(self, request, exception):
+        db_routers.state.use_replica = False
+
+    def process_response(self, request, response):
+        return db_routers.finish_request(request, response)
@@ -0,0 +1,12 @@
+import os
+
+
+def process_is_alive(pid):
+    """ Whether a process with this pid is running on this machine """
+
+    try:
+        os.kill(pid, 0)
+    except OSError:
+        return False
+
+    return True
@@ -50,7 +50,34 @@ REST_FRAMEWORK = {
     'PAGE_SIZE': 10
 }
 
+# Resolved auth tokens kept in memory by CachedTokenAuthentication
+TOKEN_CACHE_MAX_SIZE = 1024
+TOKEN_CACHE_TTL = 60
+
+# full_business_name in URLs resolved to (id, is_active) and kept in memory
+BUSINESS_CACHE_MAX_SIZE = 4096
+BUSINESS_CACHE_TTL = 300
+
+# Without PostgreSQL, profile searches use an in-memory index that is
+# rebuilt after this many seconds to pick up other processes' changes
+PROFILE_SEARCH_INDEX_TTL = 300
+
+# Menu item autocomplete indexes kept in memory, one per UserProfile
+AUTOCOMPLETE_INDEX_MAX_SIZE = 1024
+AUTOCOMPLETE_INDEX_TTL = 300
+
+# Logins check passwords on this many threads per process. Up to
+# PASSWORD_HASH_MAX_QUEUE more wait their turn, and past that, or after
+# waiting PASSWORD_HASH_TIMEOUT seconds, login answers 503 with Retry-After
+PASSWORD_HASH_WORKERS = 2
+PASSWORD_HASH_MAX_QUEUE = 16
+PASSWORD_HASH_TIMEOUT = 10
+PASSWORD_HASH_RETRY_AFTER = 1
+
 MIDDLEWARE_CLASSES = [
+    'msme_pos.middleware.MetricsMiddleware',
+    'msme_pos.middleware.RequestTimingMiddleware',
+    'msme_pos.middleware.ReplicaPinningMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -59,6 +86,7 @@ MIDDLEWARE_CLASSES = [
     'django.contrib.auth.middleware.SessionAuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'msme_pos.middleware.IdempotencyKeyMiddleware',
 ]
 
 ROOT_URLCONF = 'msme_pos.urls'
@@ -87,15 +115,105 @@ WSGI_APPLICATION = 'msme_pos.wsgi.application'
 
 DATABASES = {
     'default': {
-        'ENGINE': 'django.db.backends.postgresql_psycopg2',
+        # The PostgreSQL backend with connections reused from a pool of up
+        # to POOL['MAX_SIZE'] per worker process, see msme_pos.db_pool
+        'ENGINE': 'msme_pos.db_pool',
         'NAME': 'msme_pos_db',
         'USER': 'postgres',
         'PASSWORD': 'postgres',
         'HOST': 'localhost',
-        'PORT': ''
+        'PORT': '',
+        'POOL': {
+            'MAX_SIZE': 10,
+            # Seconds before a connection is replaced
+            'MAX_LIFETIME': 1800,
+            # Run `SELECT 1` on idle connections before handing them out
+            'HEALTH_CHECK': True,
+            # Seconds to wait for a free connection
+            'TIMEOUT': 10,
+        },
     }
 }
 
+# Aliases in DATABASES that replicate `default`. GET requests read from them,
+# unless the client wrote in the last REPLICA_PIN_SECONDS. The pin is kept in
+# a signed cookie and, for clients that don't keep cookies, in
+# REPLICA_PIN_CACHE under their Authorization header. Every worker must share
+# that cache. It is only read for requests with an X-Replica-Pin header,
+# which such clients send on their reads after a write
+DATABASE_REPLICAS = []
+REPLICA_PIN_SECONDS = 5
+REPLICA_PIN_CACHE = 'replica_pins'
+
+DATABASE_ROUTERS = ['msme_pos.db_routers.PrimaryReplicaRouter']
+
+# Caches
+# https://docs.djangoproject.com/en/1.11/topics/cache/
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    # Responses stored for Idempotency-Key retries, which every worker must
+    # see. Create its table with `manage.py createcachetable`, or point it
+    # at memcached
+    'idempotency': {
+        'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+        'LOCATION': 'idempotency_cache',
+        'OPTIONS': {
+            'MAX_ENTRIES': 100000,
+        },
+    },
+    # Clients kept on the primary after a write, see REPLICA_PIN_CACHE.
+    # Created by createcachetable too, memcached suits it better
+    'replica_pins': {
+        'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+        'LOCATION': 'replica_pin_cache',
+        'OPTIONS': {
+            'MAX_ENTRIES': 100000,
+        },
+    },
+}
+
+IDEMPOTENCY_CACHE = 'idempotency'
+IDEMPOTENCY_KEY_TTL = 60 * 60 * 24
+
+# Send Server-Timing and X-Query-Count headers with every response, and
+# log the timings of this fraction of requests to the msme_pos.timing logger
+REQUEST_TIMING_HEADERS = True
+REQUEST_TIMING_LOG_SAMPLE_RATE = 0
+
+# Every worker process writes its request metrics to its own file in this
+# directory, and /metrics adds them up. The files of workers that exited
+# are merged into one. With None each process only reports its own metrics
+METRICS_DIR = os.path.join(BASE_DIR, 'metrics')
+
+# /metrics answers staff users, and scrapers that send
+# `Authorization: Bearer <METRICS_TOKEN>`. Without a token only staff can
+# scrape. If METRICS_ALLOWED_IPS isn't empty, the token is only accepted
+# from those addresses
+METRICS_TOKEN = None
+METRICS_ALLOWED_IPS = []
+
+# Buffer single order creation in memory and write orders in batches from
+# a background thread. Accepted orders are journaled to
+# ITEM_ORDER_WRITE_BEHIND_JOURNAL_DIR until they are committed
+ITEM_ORDER_WRITE_BEHIND = False
+ITEM_ORDER_WRITE_BEHIND_BATCH_SIZE = 200
+ITEM_ORDER_WRITE_BEHIND_FLUSH_INTERVAL = 0.5
+ITEM_ORDER_WRITE_BEHIND_FSYNC = True
+ITEM_ORDER_WRITE_BEHIND_JOURNAL_DIR = os.path.join(BASE_DIR, 'order_journal')
+
+# archive_cold_orders moves the orders of months older than
+# ITEM_ORDER_COLUMNAR_ARCHIVE_AFTER_MONTHS to NumPy arrays in
+# ITEM_ORDER_COLUMNAR_ARCHIVE_DIR. Sales analytics, the daily sales and the
+# menu item counters still include them, but order lists and exports only
+# cover the months left in the table. With PostgreSQL 11 or later orders
+# are stored in monthly partitions, see item_order.partitions, and an
+# archived month's partition is dropped
+ITEM_ORDER_COLUMNAR_ARCHIVE_AFTER_MONTHS = 12
+ITEM_ORDER_COLUMNAR_ARCHIVE_DIR = os.path.join(BASE_DIR, 'order_columns')
+
 # Password validation
 # https://docs.djangoproject.com/en/1.9/ref/settings/#auth-password-validators
 
@@ -0,0 +1,118 @@
+import threading
+import time
+
+from django.db import connections
+
+
+# The Timing of the request being handled on this thread, if any
+current = threading.local()
+
+
+class Timing(object):
+    """ What one request spent its time on, in seconds """
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.view_started = None
+        self.view_finished = None
+        self.finished = None
+        self.query_count = 0
+        self.db_time = 0.0
+
+    def elapsed(self, start, end):
+        if start is None or end is None:
+            return None
+
+        return end - start
+
+    @property
+    def view_time(self):
+        return self.elapsed(self.view_started, self.view_finished)
+
+    @property
+    def render_time(self):
+        return self.elapsed(self.view_finished, self.finished)
+
+    @property
+    def total_time(self):
+        return self.elapsed(self.started, self.finished)
+
+
+def start_timing():
+    current.timing = Timing()
+
+    return current.timing
+
+
+def stop_timing():
+    timing = getattr(current, 'timing', None)
+    current.timing = None
+
+    if timing is not None:
+        timing.finished = time.perf_counter()
+
+    return timing
+
+
+class TimedCursor(object):
+    """ Wraps a connection's cursor and adds every statement it runs to the
+    current request's Timing. Unlike connection.queries this works with
+    DEBUG=False and doesn't keep the SQL around """
+
+    def __init__(self, cursor):
+        self.cursor = cursor
+
+    def __getattr__(self, attr):
+        return getattr(self.cursor, attr)
+
+    def __iter__(self):
+        return iter(self.cursor)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, type, value, traceback):
+        return self.cursor.__exit__(type, value, traceback)
+
+    def timed(self, method, *args):
+        timing = getattr(current, 'timing', None)
+
+        if timing is None:
+            return method(*args)
+
+        started = time.perf_counter()
+
+        try:
+            return method(*args)
+        finally:
+            timing.query_count += 1
+            timing.db_time += time.perf_counter() - started
+
+    def callproc(self, procname, params=None):
+        return self.timed(self.cursor.callproc, procname, params)
+
+    def execute(self, sql, params=None):
+        return self.timed(self.cursor.execute, sql, params)
+
+    def executemany(self, sql, param_list):
+        return self.timed(self.cursor.executemany, sql, param_list)
+
+
+def instrument(connection):
+    """ Makes connection hand out TimedCursors. Connections are per thread,
+    so this runs for every thread's connection the first time it is seen """
+
+    if getattr(connection, 'timed_cursors', False):
+        return
+
+    make_cursor = connection.make_cursor
+    make_debug_cursor = connection.make_debug_cursor
+
+    connection.make_cursor = lambda cursor: TimedCursor(make_cursor(cursor))
+    connection.make_debug_cursor = lambda cursor: TimedCursor(make_debug_cursor(cursor))
+    connection.timed_cursors = True
+
+
+def instrument_connections():
+    for alias in connections:
+        instrument(connections[alias])
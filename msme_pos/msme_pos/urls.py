@@ -1,10 +1,13 @@
 from django.conf.urls import url, include
 from django.contrib import admin
 
+from msme_pos.metrics import metrics_view
+
 
 urlpatterns = [
     url(r'^admin/', admin.site.urls),
-    url(r'^api/profiles', include('user_profile.urls', namespace='profiles')),
+    url(r'^metrics$', metrics_view, name='metrics'),
+    url(r'^api/profiles/', include('user_profile.urls', namespace='profiles')),
     url(r'^api/menu_items', include('menu_item.urls', namespace='menu_items')),
     url(r'^api/item_orders', include('item_order.urls', namespace='item_orders'))
 ]
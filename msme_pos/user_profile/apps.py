@@ -3,3 +3,8 @@ from django.apps import AppConfig
 
 class ApiConfig(AppConfig):
     name = 'user_profile'
+
+    def ready(self):
+        # Connects the receivers that invalidate cached tokens and keep the
+        # profile search index current
+        import user_profile.signals
@@ -0,0 +1,41 @@
+import copy
+
+from django.conf import settings
+
+from rest_framework.authentication import TokenAuthentication
+
+from msme_pos.cache import LRUCache
+
+
+token_cache = LRUCache(
+    max_size=getattr(settings, 'TOKEN_CACHE_MAX_SIZE', 1024),
+    ttl=getattr(settings, 'TOKEN_CACHE_TTL', 60)
+)
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """ TokenAuthentication that keeps resolved tokens in memory, so a
+    terminal polling with the same token doesn't hit the database on every
+    request. user_profile.signals drops entries when a token is deleted or
+    its UserProfile changes; other worker processes find out when the
+    entry's TOKEN_CACHE_TTL runs out """
+
+    def authenticate_credentials(self, key):
+        cached = token_cache.get(key)
+
+        if cached is None:
+            cached = super(CachedTokenAuthentication, self).authenticate_credentials(key)
+            token_cache.set(key, cached)
+
+        user, token = cached
+
+        # Each request gets its own copy so views can't change the cached user
+        return copy.copy(user), token
+
+
+def forget_token(key):
+    token_cache.pop(key)
+
+
+def forget_user(user_id):
+    token_cache.pop_where(lambda cached: cached[0].pk == user_id)
@@ -0,0 +1,141 @@
+import logging
+import threading
+from concurrent.futures import (
+    ThreadPoolExecutor,
+    TimeoutError
+)
+
+from django.conf import settings
+from django.contrib.auth.hashers import (
+    check_password,
+    get_hasher,
+    identify_hasher,
+    is_password_usable,
+    make_password
+)
+from django.db import connections
+
+from rest_framework import status
+from rest_framework.exceptions import APIException
+
+from user_profile.models import UserProfile
+
+
+logger = logging.getLogger(__name__)
+
+
+class PasswordHashingOverloaded(APIException):
+    status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    default_detail = 'Too many logins at once, try again shortly.'
+    default_code = 'password_hashing_overloaded'
+
+    def __init__(self, wait):
+        super(PasswordHashingOverloaded, self).__init__()
+        # DRF's exception handler turns this into a Retry-After header
+        self.wait = wait
+
+
+class PasswordHashPool(object):
+    """ Runs password hashing on a fixed number of threads, so a burst of
+    logins can only keep that many CPUs busy and order traffic on the same
+    workers keeps going. At most max_queue hashes wait for a thread; past
+    that logins are turned away with a 503 and Retry-After instead of
+    piling up. PBKDF2 releases the GIL, so waiting request threads don't
+    hold up the hashing """
+
+    def __init__(self, workers=2, max_queue=16, timeout=10, retry_after=1):
+        self.executor = ThreadPoolExecutor(max_workers=workers)
+        self.slots = threading.BoundedSemaphore(workers + max_queue)
+        self.timeout = timeout
+        self.retry_after = retry_after
+
+    def submit(self, function, *args):
+        if not self.slots.acquire(blocking=False):
+            raise PasswordHashingOverloaded(self.retry_after)
+
+        try:
+            future = self.executor.submit(function, *args)
+        except Exception:
+            self.slots.release()
+            raise
+
+        future.add_done_callback(lambda future: self.slots.release())
+
+        return future
+
+    def run(self, function, *args):
+        try:
+            return self.submit(function, *args).result(self.timeout)
+        except TimeoutError:
+            raise PasswordHashingOverloaded(self.retry_after)
+
+    def authenticate(self, email, password):
+        """ Works like ModelBackend.authenticate, with the hashing done on
+        the pool. Returns the active UserProfile with that email and
+        password, or None """
+
+        try:
+            user = UserProfile._default_manager.get_by_natural_key(email)
+        except UserProfile.DoesNotExist:
+            # Hash anyway so unknown emails take as long as wrong passwords
+            self.run(make_password, password)
+            return None
+
+        encoded = user.password
+
+        if not self.run(check_password, password, encoded) or not user.is_active:
+            return None
+
+        if must_update(encoded):
+            try:
+                self.submit(rehash, user.pk, password, encoded)
+            except PasswordHashingOverloaded:
+                # The next login will try again
+                pass
+
+        return user
+
+
+def must_update(encoded):
+    """ Whether a password hash was made with another hasher or other
+    parameters than PASSWORD_HASHERS now asks for """
+
+    if not is_password_usable(encoded):
+        return False
+
+    preferred = get_hasher('default')
+
+    return identify_hasher(encoded).algorithm != preferred.algorithm or preferred.must_update(encoded)
+
+
+def rehash(user_id, password, encoded):
+    """ Replaces a stale hash, unless the password changed in the meantime """
+
+    try:
+        UserProfile.objects.filter(pk=user_id, password=encoded).update(password=make_password(password))
+    except Exception:
+        logger.exception('Could not rehash the password of user %s', user_id)
+    finally:
+        # Pool threads are long lived, don't leave their connections open
+        connections.close_all()
+
+
+pool = None
+pool_lock = threading.Lock()
+
+
+def get_pool():
+    """ This process's pool, created on first use """
+
+    global pool
+
+    with pool_lock:
+        if pool is None:
+            pool = PasswordHashPool(
+                workers=getattr(settings, 'PASSWORD_HASH_WORKERS', 2),
+                max_queue=getattr(settings, 'PASSWORD_HASH_MAX_QUEUE', 16),
+                timeout=getattr(settings, 'PASSWORD_HASH_TIMEOUT', 10),
+                retry_after=getattr(settings, 'PASSWORD_HASH_RETRY_AFTER', 1)
+            )
+
+    return pool
@@ -0,0 +1,313 @@
+import datetime
+import json
+import threading
+import time
+from collections import (
+    Counter,
+    OrderedDict
+)
+from concurrent.futures import ThreadPoolExecutor
+from decimal import Decimal
+from itertools import islice
+
+from django.contrib.auth.hashers import make_password
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+from django.db import (
+    connection,
+    connections
+)
+from django.test import Client
+from django.test.utils import (
+    setup_test_environment,
+    teardown_test_environment,
+    CaptureQueriesContext
+)
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.six import StringIO
+
+from rest_framework.authtoken.models import Token
+
+from msme_pos.db_pool.pool import close_pools
+
+from user_profile.models import UserProfile
+
+from menu_item.models import MenuItem
+
+from item_order.models import ItemOrder
+
+
+ENDPOINTS = ('profiles_detail', 'menu_items_detail', 'item_order_list', 'item_order_create')
+
+
+class Command(BaseCommand):
+    help = (
+        'Seeds a throwaway test database and reports throughput, latency '
+        'percentiles and query counts of the main endpoints as JSON'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--businesses', type=int, default=5, help='Number of user profiles to seed')
+        parser.add_argument('--menu-items', type=int, default=10, help='Menu items per business')
+        parser.add_argument('--orders', type=int, default=100, help='Orders per menu item')
+        parser.add_argument('--days', type=int, default=90, help='Spread the seeded orders over this many days')
+        parser.add_argument('--requests', type=int, default=200, help='Measured requests per endpoint')
+        parser.add_argument('--warmup', type=int, default=10, help='Unmeasured requests per endpoint')
+        parser.add_argument('--concurrency', type=int, default=4, help='Requests in flight at once')
+        parser.add_argument('--endpoint', action='append', choices=ENDPOINTS, help='Only run this endpoint, can be repeated')
+        parser.add_argument('--label', help='Stored with the results, such as a commit hash')
+        parser.add_argument('--output', help='Write the results to this file instead of stdout')
+
+    def handle(self, *args, **options):
+        setup_test_environment()
+        # create_test_db returns the test database's name, not this one
+        old_name = connection.settings_dict['NAME']
+        connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+
+        try:
+            businesses = self.seed(options)
+            results = self.benchmark(businesses, options)
+        finally:
+            # DROP DATABASE fails while a pool still holds a connection to it
+            connection.close()
+            close_pools()
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+
+        report = json.dumps(results, indent=2)
+
+        if options['output']:
+            with open(options['output'], 'w') as output:
+                output.write(report + '\n')
+        else:
+            self.stdout.write(report)
+
+    def seed(self, options):
+        """ Bulk inserts the data set, then rebuilds the derived tables the
+        signals would otherwise have kept up to date """
+
+        # Hashing is slow on purpose, so every seeded profile shares one hash
+        password = make_password('benchmark')
+
+        UserProfile.objects.bulk_create(
+            UserProfile(
+                email='owner{}@benchmark.test'.format(i),
+                business_name='benchmark',
+                identifier=str(i),
+                full_business_name='benchmark-{}'.format(i),
+                owner_surname='Owner',
+                owner_given_name=str(i),
+                password=password
+            )
+            for i in range(options['businesses'])
+        )
+
+        user_profiles = list(UserProfile.objects.order_by('id'))
+
+        bulk_insert(
+            MenuItem,
+            (
+                MenuItem(
+                    name='item {} {}'.format(user_profile.id, i),
+                    url_param_name='item-{}-{}'.format(user_profile.id, i),
+                    description='Seeded by benchmark_endpoints',
+                    price=Decimal('10.00') + i,
+                    user_profile=user_profile
+                )
+                for user_profile in user_profiles
+                for i in range(options['menu_items'])
+            )
+        )
+
+        now = timezone.now()
+        spread = datetime.timedelta(days=max(options['days'], 1))
+        per_menu_item = options['orders']
+
+        bulk_insert(
+            ItemOrder,
+            (
+                ItemOrder(
+                    quantity=1 + i % 5,
+                    ordered_on=now - spread * i / max(per_menu_item, 1),
+                    menu_item_id=menu_item_id,
+                    user_profile_id=user_profile_id,
+                    unit_price=price
+                )
+                for menu_item_id, user_profile_id, price in MenuItem.objects.order_by('id').values_list(
+                    'id', 'user_profile_id', 'price'
+                )
+                for i in range(per_menu_item)
+            )
+        )
+
+        call_command('rebuild_daily_sales', stdout=StringIO())
+        call_command('repair_menu_item_counters', stdout=StringIO())
+
+        menu_items = {}
+
+        for user_profile_id, url_param_name in MenuItem.objects.order_by('id').values_list('user_profile', 'url_param_name'):
+            menu_items.setdefault(user_profile_id, []).append(url_param_name)
+
+        return [
+            {
+                'full_business_name': user_profile.full_business_name,
+                'token': Token.objects.create(user=user_profile).key,
+                'menu_items': menu_items.get(user_profile.id, []),
+            }
+            for user_profile in user_profiles
+        ]
+
+    def benchmark(self, businesses, options):
+        results = OrderedDict([
+            ('label', options['label']),
+            ('database', connection.vendor),
+            ('businesses', options['businesses']),
+            ('menu_items', options['menu_items']),
+            ('orders', options['orders']),
+            ('requests', options['requests']),
+            ('concurrency', options['concurrency']),
+            ('endpoints', OrderedDict()),
+        ])
+
+        # Each endpoint cycles through the businesses that have menu items
+        businesses = [business for business in businesses if business['menu_items']]
+
+        if not businesses:
+            return results
+
+        clients = threading.local()
+
+        def send(endpoint, i):
+            if not hasattr(clients, 'client'):
+                clients.client = Client()
+
+            business = businesses[i % len(businesses)]
+            request = build_request(endpoint, business, i)
+
+            with CaptureQueriesContext(connection) as queries:
+                started = time.perf_counter()
+
+                # The test client re-raises a view's exceptions instead of
+                # returning a 500, such as SQLite's locking errors when
+                # concurrent requests write
+                try:
+                    status_code = request(clients.client).status_code
+                except Exception:
+                    status_code = 500
+
+                elapsed = time.perf_counter() - started
+
+            return elapsed, len(queries), status_code
+
+        workers = max(options['concurrency'], 1)
+
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            try:
+                for endpoint in options['endpoint'] or ENDPOINTS:
+                    list(executor.map(lambda i: send(endpoint, i), range(options['warmup'])))
+
+                    started = time.perf_counter()
+                    samples = list(executor.map(lambda i: send(endpoint, i), range(options['requests'])))
+                    elapsed = time.perf_counter() - started
+
+                    results['endpoints'][endpoint] = summarize(samples, elapsed)
+            finally:
+                close_worker_connections(executor, workers)
+
+        return results
+
+
+def close_worker_connections(executor, workers):
+    """ Closes the database connections of every worker thread. The test
+    client disconnects close_old_connections from request_finished, so
+    they would otherwise stay open and keep the test database from being
+    dropped. Each task waits for the others, so every worker runs one """
+
+    barrier = threading.Barrier(workers)
+
+    def close():
+        connections.close_all()
+        barrier.wait()
+
+    for future in [executor.submit(close) for _ in range(workers)]:
+        future.result()
+
+
+def bulk_insert(model, objects, chunk_size=1000):
+    """ Inserts objects a chunk at a time so the whole data set is never in
+    memory. bulk_create splits each chunk further where the backend limits
+    the size of an INSERT """
+
+    objects = iter(objects)
+
+    while True:
+        chunk = list(islice(objects, chunk_size))
+
+        if not chunk:
+            return
+
+        model.objects.bulk_create(chunk)
+
+
+def build_request(endpoint, business, i):
+    """ Returns a function that sends one request for endpoint with a test
+    client, authenticated as business """
+
+    full_business_name = business['full_business_name']
+    menu_item_name = business['menu_items'][i % len(business['menu_items'])]
+    headers = {'HTTP_AUTHORIZATION': 'Token {}'.format(business['token'])}
+
+    if endpoint == 'profiles_detail':
+        path = reverse('profiles:profiles_detail', kwargs={'full_business_name': full_business_name})
+    elif endpoint == 'menu_items_detail':
+        path = reverse('menu_items:menu_items_detail', kwargs={
+            'full_business_name': full_business_name,
+            'menu_item_name': menu_item_name
+        })
+    elif endpoint == 'item_order_list':
+        path = reverse('item_orders:item_order_list', kwargs={'full_business_name': full_business_name})
+    else:
+        path = reverse('item_orders:item_order_create', kwargs={
+            'full_business_name': full_business_name,
+            'menu_item_name': menu_item_name
+        })
+
+        return lambda client: client.post(path, {'quantity': 1}, **headers)
+
+    return lambda client: client.get(path, **headers)
+
+
+def percentile(ordered, fraction):
+    """ Nearest-rank percentile of an already sorted list """
+
+    index = max(int(round(fraction * len(ordered))) - 1, 0)
+
+    return ordered[min(index, len(ordered) - 1)]
+
+
+def summarize(samples, elapsed):
+    if not samples:
+        return OrderedDict([('requests', 0)])
+
+    latencies = sorted(sample[0] * 1000 for sample in samples)
+    query_counts = [sample[1] for sample in samples]
+    statuses = Counter(sample[2] for sample in samples)
+
+    return OrderedDict([
+        ('requests', len(samples)),
+        ('errors', sum(count for status, count in statuses.items() if status >= 400)),
+        ('statuses', OrderedDict((str(status), statuses[status]) for status in sorted(statuses))),
+        ('throughput', round(len(samples) / elapsed, 2)),
+        ('latency_ms', OrderedDict([
+            ('mean', round(sum(latencies) / len(latencies), 3)),
+            ('p50', round(percentile(latencies, 0.50), 3)),
+            ('p95', round(percentile(latencies, 0.95), 3)),
+            ('p99', round(percentile(latencies, 0.99), 3)),
+            ('max', round(latencies[-1], 3)),
+        ])),
+        ('queries', OrderedDict([
+            ('mean', round(sum(query_counts) / len(query_counts), 2)),
+            ('max', max(query_counts)),
+        ])),
+    ])
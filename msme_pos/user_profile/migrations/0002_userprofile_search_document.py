@@ -0,0 +1,92 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import (
+    DatabaseError,
+    migrations,
+    models,
+    transaction
+)
+
+
+SEARCH_FIELDS = (
+    'email', 'business_name', 'identifier', 'full_business_name',
+    'owner_surname', 'owner_given_name',
+    'address', 'city', 'state'
+)
+
+# Lets `LIKE '%term%'` on the search document use an index. pg_trgm is a
+# contrib module, so some servers don't have it, and before PostgreSQL 13
+# only a superuser can create it. Without it the migration skips the index
+# and user_profile.search falls back to its in-memory index. Run
+# `CREATE EXTENSION pg_trgm` as a superuser and migrate user_profile back
+# to 0001 and forward again to add the index later
+CREATE_EXTENSION = """
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+"""
+
+CREATE_INDEX = """
+CREATE INDEX user_profile_search_document_trgm
+    ON user_profile_userprofile USING gin (search_document gin_trgm_ops);
+"""
+
+DROP_INDEX = """
+DROP INDEX IF EXISTS user_profile_search_document_trgm;
+"""
+
+
+def fill_search_documents(apps, schema_editor):
+    UserProfile = apps.get_model('user_profile', 'UserProfile')
+
+    for profile in UserProfile.objects.using(schema_editor.connection.alias).only('id', *SEARCH_FIELDS).iterator():
+        UserProfile.objects.using(schema_editor.connection.alias).filter(id=profile.id).update(
+            search_document=' '.join(
+                str(value).lower() for value in (getattr(profile, field) for field in SEARCH_FIELDS) if value
+            )
+        )
+
+
+def create_index(apps, schema_editor):
+    connection = schema_editor.connection
+
+    if connection.vendor != 'postgresql':
+        return
+
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT installed_version FROM pg_available_extensions WHERE name = 'pg_trgm'")
+        row = cursor.fetchone()
+
+    if row is None:
+        return
+
+    if row[0] is None:
+        try:
+            # In a savepoint, so a refusal doesn't abort the migration
+            with transaction.atomic(using=connection.alias):
+                schema_editor.execute(CREATE_EXTENSION, params=None)
+        except DatabaseError:
+            return
+
+    schema_editor.execute(CREATE_INDEX, params=None)
+
+
+def drop_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute(DROP_INDEX, params=None)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('user_profile', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='userprofile',
+            name='search_document',
+            field=models.TextField(default='', editable=False),
+        ),
+        migrations.RunPython(fill_search_documents, migrations.RunPython.noop),
+        migrations.RunPython(create_index, drop_index),
+    ]
@@ -7,7 +7,6 @@ from django.contrib.auth.models import (
 )
 
 
-
 # Inherits and extends the Django base user manager 
 class UserProfileManager(BaseUserManager):
     """ Helps Django work with out custom user """
@@ -60,6 +59,20 @@ class UserProfileManager(BaseUserManager):
         return user
 
 
+# Fields a UserProfile can be searched by, see user_profile.search
+SEARCH_FIELDS = (
+    'email', 'business_name', 'identifier', 'full_business_name',
+    'owner_surname', 'owner_given_name',
+    'address', 'city', 'state'
+)
+
+
+def make_search_document(values):
+    """ The lowercased search fields in one string """
+
+    return ' '.join(str(value).lower() for value in values if value)
+
+
 # Inherits and extends the Django base user model
 class UserProfile(AbstractBaseUser, PermissionsMixin):
     """ Represent a user profile in the application. """
@@ -80,12 +93,25 @@ class UserProfile(AbstractBaseUser, PermissionsMixin):
     is_active = models.BooleanField(default=True)
     is_staff = models.BooleanField(default=False)
 
+    # Kept in step with SEARCH_FIELDS by save(). Trigram indexed on PostgreSQL
+    search_document = models.TextField(default='', editable=False)
+
     objects = UserProfileManager()
 
     USERNAME_FIELD = 'email'
     REQUIRED_FIELDS = ['business_name', 'identifier', 'owner_surname', 'owner_given_name']
 
 
+    def save(self, *args, **kwargs):
+        self.search_document = make_search_document(getattr(self, field) for field in SEARCH_FIELDS)
+
+        update_fields = kwargs.get('update_fields')
+
+        if update_fields is not None and set(update_fields) & set(SEARCH_FIELDS):
+            kwargs['update_fields'] = list(update_fields) + ['search_document']
+
+        super(UserProfile, self).save(*args, **kwargs)
+
     def get_full_name(self):
         """ Used to get a user's business name and identifier"""
 
@@ -1,4 +1,31 @@
 from rest_framework import permissions
+from rest_framework.exceptions import NotFound
+
+from user_profile.resolvers import resolve_business
+
+
+class OwnBusiness(permissions.BasePermission):
+    """ Allow users into the business named by the URL's
+    full_business_name only if it is theirs, or if they are a superuser.
+    The resolved business is left on request.business for the view """
+
+    def has_permission(self, request, view):
+        full_business_name = view.kwargs.get('full_business_name')
+
+        if full_business_name is None:
+            return True
+
+        if not request.user or not request.user.is_authenticated:
+            return False
+
+        business = resolve_business(full_business_name, request.user)
+
+        if business is None or not business.is_active:
+            raise NotFound()
+
+        request.business = business
+
+        return business.id == request.user.id or request.user.is_superuser
 
 
 class GetAndUpdateOwnProfile(permissions.BasePermission):
@@ -14,15 +41,13 @@ class GetAndUpdateOwnMenuItem(permissions.BasePermission):
     """ Allow user to update or delete their own menu item """
 
     def has_object_permission(self, request, view, menu_item):
-        return menu_item.user_profile == request.user or request.user.is_superuser
+        return menu_item.user_profile_id == request.business.id or request.user.is_superuser
 
 class GetOwnOrders(permissions.BasePermission):
     """ Only UserProfile can get own orders  """
 
     def has_object_permission(self, request, view, obj):
-        print('in GetOwnOrders')
-        # print(obj)
-        return 
+        return obj.user_profile_id == request.business.id
 
 
 class CreateOrderItem(permissions.BasePermission):
@@ -30,13 +55,13 @@ class CreateOrderItem(permissions.BasePermission):
 
     def has_object_permission(self, request, view, instance):        
         if instance.__class__.__name__ == 'MenuItem':
-            return instance.user_profile == request.user
+            return instance.user_profile_id == request.business.id
         elif instance.__class__.__name__ == 'ItemOrder':
-            return instance.menu_item.user_profile == request.user or request.user.is_superuser
+            return instance.user_profile_id == request.business.id or request.user.is_superuser
 
 
 class GetAndUpdateOwnOrderItem(permissions.BasePermission):
     """ Allow user to update or delete their own menu item orders"""
 
     def has_object_permission(self, request, view, order):
-        return order.menu_item.user_profile == request.user or request.user.is_superuser
\ No newline at end of file
+        return order.user_profile_id == request.business.id or request.user.is_superuser
\ No newline at end of file
@@ -0,0 +1,45 @@
+from collections import namedtuple
+
+from django.conf import settings
+
+from user_profile.models import UserProfile
+
+from msme_pos.cache import LRUCache
+
+
+Business = namedtuple('Business', ('id', 'is_active'))
+
+# Cached for names that don't belong to anyone, so probing them is cheap too
+UNKNOWN = Business(None, False)
+
+business_cache = LRUCache(
+    max_size=getattr(settings, 'BUSINESS_CACHE_MAX_SIZE', 4096),
+    ttl=getattr(settings, 'BUSINESS_CACHE_TTL', 300)
+)
+
+
+def resolve_business(full_business_name, user=None):
+    """ The id and active state of the UserProfile a URL's
+    full_business_name names, or None if there is none. A user asking for
+    their own business is answered from the user. Other names are kept in
+    memory so resolving costs no query after the first request;
+    user_profile.signals drops entries when a profile changes, other
+    worker processes find out when the entry's BUSINESS_CACHE_TTL runs out """
+
+    if user is not None and user.is_authenticated and user.full_business_name == full_business_name:
+        return Business(user.id, user.is_active)
+
+    business = business_cache.get(full_business_name)
+
+    if business is None:
+        row = UserProfile.objects.filter(full_business_name=full_business_name).values_list('id', 'is_active').first()
+        business = Business(*row) if row else UNKNOWN
+        business_cache.set(full_business_name, business)
+
+    return None if business is UNKNOWN else business
+
+
+def forget_business(full_business_name, user_id):
+    # By name for a profile that used to be unknown, by id for a renamed one
+    business_cache.pop(full_business_name)
+    business_cache.pop_where(lambda business: business.id == user_id)
@@ -0,0 +1,250 @@
+import threading
+import time
+from collections import (
+    defaultdict,
+    OrderedDict
+)
+
+from django.conf import settings
+from django.contrib.postgres.search import TrigramSimilarity
+from django.db import connections
+
+from rest_framework import filters
+
+from user_profile.models import UserProfile
+
+
+def trigrams(text):
+    return set(text[index:index + 3] for index in range(len(text) - 2))
+
+
+def similarity(query_trigrams, document_trigrams):
+    """ Shared trigrams over all trigrams, the way pg_trgm ranks """
+
+    if not query_trigrams:
+        return 0.0
+
+    return len(query_trigrams & document_trigrams) / len(query_trigrams | document_trigrams)
+
+
+class ProfileSearchIndex(object):
+    """ In-memory trigram index of every UserProfile's search_document, for
+    databases without pg_trgm. A term's candidates are the profiles that
+    have all of its trigrams, which are then checked for the whole term.
+    user_profile.signals keeps it up to date with this process's saves,
+    and it is rebuilt after ttl seconds to pick up other processes' """
+
+    def __init__(self, ttl=300):
+        self.ttl = ttl
+        self.lock = threading.Lock()
+        # Held through a rebuild, so only one thread reads the table
+        self.build_lock = threading.Lock()
+        self.built_at = None
+        # Updates that came in while a rebuild was reading the table, which
+        # may have read the rows from before them
+        self.pending = None
+
+        self.documents = {}
+        self.document_trigrams = {}
+        self.postings = defaultdict(set)
+
+    def is_fresh(self):
+        with self.lock:
+            return self.built_at is not None and time.monotonic() - self.built_at < self.ttl
+
+    def ensure_built(self):
+        if self.is_fresh():
+            return
+
+        with self.build_lock:
+            # Another thread may have rebuilt it while this one waited
+            if not self.is_fresh():
+                self.load()
+
+    def rebuild(self):
+        with self.build_lock:
+            self.load()
+
+    def load(self):
+        with self.lock:
+            self.pending = OrderedDict()
+
+        try:
+            # Read without the lock so searches can go on meanwhile
+            rows = list(UserProfile.objects.values_list('id', 'search_document'))
+        except Exception:
+            with self.lock:
+                self.pending = None
+            raise
+
+        with self.lock:
+            self.documents = {}
+            self.document_trigrams = {}
+            self.postings = defaultdict(set)
+
+            for profile_id, document in rows:
+                self.add(profile_id, document)
+
+            for profile_id, document in self.pending.items():
+                self.replace(profile_id, document)
+
+            self.pending = None
+            self.built_at = time.monotonic()
+
+    def add(self, profile_id, document):
+        self.documents[profile_id] = document
+        self.document_trigrams[profile_id] = trigrams(document)
+
+        for trigram in self.document_trigrams[profile_id]:
+            self.postings[trigram].add(profile_id)
+
+    def discard(self, profile_id):
+        self.documents.pop(profile_id, None)
+
+        for trigram in self.document_trigrams.pop(profile_id, ()):
+            self.postings[trigram].discard(profile_id)
+
+            if not self.postings[trigram]:
+                del self.postings[trigram]
+
+    def replace(self, profile_id, document):
+        self.discard(profile_id)
+
+        if document is not None:
+            self.add(profile_id, document)
+
+    def update(self, profile_id, document):
+        with self.lock:
+            if self.pending is not None:
+                self.pending[profile_id] = document
+
+            if self.built_at is not None:
+                self.replace(profile_id, document)
+
+    def matches(self, term):
+        term_trigrams = trigrams(term)
+
+        if not term_trigrams:
+            # Too short for trigrams, so every document is a candidate
+            candidates = self.documents.keys()
+        else:
+            postings = sorted((self.postings.get(trigram, set()) for trigram in term_trigrams), key=len)
+            candidates = set.intersection(*postings)
+
+        return set(profile_id for profile_id in candidates if term in self.documents[profile_id])
+
+    def search(self, terms):
+        """ Ids of the profiles whose document has every term, best first """
+
+        self.ensure_built()
+
+        with self.lock:
+            found = None
+
+            for term in sorted(terms, key=len, reverse=True):
+                found = self.matches(term) if found is None else found & self.matches(term)
+
+                if not found:
+                    return []
+
+            query_trigrams = trigrams(' '.join(terms))
+            ranks = dict(
+                (profile_id, similarity(query_trigrams, self.document_trigrams[profile_id]))
+                for profile_id in found
+            )
+
+        return sorted(found, key=lambda profile_id: (-ranks[profile_id], profile_id))
+
+
+class RankedResults(object):
+    """ Profiles in the order the index ranked them. Paginators slice it,
+    and only the profiles of the requested page are loaded, through
+    queryset so its prefetches apply """
+
+    def __init__(self, queryset, ids):
+        self.queryset = queryset
+        self.ids = ids
+
+    def count(self):
+        return len(self.ids)
+
+    def __len__(self):
+        return len(self.ids)
+
+    def __getitem__(self, index):
+        if not isinstance(index, slice):
+            return self[index:index + 1][0]
+
+        ids = self.ids[index]
+        profiles = self.queryset.in_bulk(ids)
+
+        # Skips profiles deleted since the index last saw them
+        return [profiles[profile_id] for profile_id in ids if profile_id in profiles]
+
+    def __iter__(self):
+        return iter(self[:])
+
+
+class ProfileSearchFilter(filters.SearchFilter):
+    """ ?search= over the search_document of each UserProfile. Every term
+    must appear in it, and the closest matches come first. PostgreSQL
+    with pg_trgm answers from the search_document trigram index, other
+    databases from the in-memory ProfileSearchIndex """
+
+    def filter_queryset(self, request, queryset, view):
+        terms = [term.lower() for term in self.get_search_terms(request)]
+
+        if not terms:
+            return queryset
+
+        if has_pg_trgm(queryset.db):
+            for term in terms:
+                queryset = queryset.filter(search_document__contains=term)
+
+            return queryset.annotate(
+                search_rank=TrigramSimilarity('search_document', ' '.join(terms))
+            ).order_by('-search_rank', 'id')
+
+        return RankedResults(queryset, get_index().search(terms))
+
+
+pg_trgm_installed = {}
+
+
+def has_pg_trgm(alias):
+    """ Whether the database has pg_trgm, which the search_document index
+    and TrigramSimilarity need. The migration skips them without it """
+
+    if alias not in pg_trgm_installed:
+        connection = connections[alias]
+        installed = False
+
+        if connection.vendor == 'postgresql':
+            with connection.cursor() as cursor:
+                cursor.execute("SELECT 1 FROM pg_extension WHERE extname = 'pg_trgm'")
+                installed = cursor.fetchone() is not None
+
+        pg_trgm_installed[alias] = installed
+
+    return pg_trgm_installed[alias]
+
+
+index = None
+index_lock = threading.Lock()
+
+
+def get_index():
+    global index
+
+    with index_lock:
+        if index is None:
+            index = ProfileSearchIndex(ttl=getattr(settings, 'PROFILE_SEARCH_INDEX_TTL', 300))
+
+        return index
+
+
+def index_profile(profile_id, document):
+    """ Updates the profile in this process's index, if it was built """
+
+    if index is not None:
+        index.update(profile_id, document)
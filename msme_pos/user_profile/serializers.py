@@ -1,9 +1,13 @@
+from django.utils.translation import ugettext_lazy as _
+
 from rest_framework import (
     serializers,
     pagination
 )
+from rest_framework.authtoken.serializers import AuthTokenSerializer
 
 from user_profile.models import UserProfile
+from user_profile.hashing import get_pool
 from menu_item.serializers import MenuItemSerializer
 
 
@@ -58,3 +62,25 @@ class UserProfileSerializer(serializers.ModelSerializer):
         user.save()
 
         return user
+
+
+class PooledAuthTokenSerializer(AuthTokenSerializer):
+    """ AuthTokenSerializer that checks the password on the password hash
+    pool instead of the request thread """
+
+    def validate(self, attrs):
+        username = attrs.get('username')
+        password = attrs.get('password')
+
+        if not (username and password):
+            msg = _('Must include "username" and "password".')
+            raise serializers.ValidationError(msg, code='authorization')
+
+        user = get_pool().authenticate(username, password)
+
+        if user is None:
+            msg = _('Unable to log in with provided credentials.')
+            raise serializers.ValidationError(msg, code='authorization')
+
+        attrs['user'] = user
+        return attrs
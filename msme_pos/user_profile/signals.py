@@ -0,0 +1,38 @@
+from django.db.models.signals import (
+    post_save,
+    post_delete
+)
+from django.dispatch import receiver
+
+from rest_framework.authtoken.models import Token
+
+from user_profile.models import UserProfile
+from user_profile.authentication import (
+    forget_token,
+    forget_user
+)
+from user_profile.search import index_profile
+from user_profile.resolvers import forget_business
+
+
+@receiver(post_save, sender=Token)
+@receiver(post_delete, sender=Token)
+def token_changed(sender, instance, **kwargs):
+    forget_token(instance.key)
+
+
+@receiver(post_save, sender=UserProfile)
+@receiver(post_delete, sender=UserProfile)
+def user_profile_changed(sender, instance, **kwargs):
+    forget_user(instance.pk)
+    forget_business(instance.full_business_name, instance.pk)
+
+
+@receiver(post_save, sender=UserProfile)
+def user_profile_saved(sender, instance, **kwargs):
+    index_profile(instance.pk, instance.search_document)
+
+
+@receiver(post_delete, sender=UserProfile)
+def user_profile_deleted(sender, instance, **kwargs):
+    index_profile(instance.pk, None)
@@ -0,0 +1,148 @@
+import asyncio
+import json
+from unittest import mock
+
+from django.test import TransactionTestCase
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.authtoken.models import Token
+
+from msme_pos import async_handlers
+from msme_pos.async_handlers import ASGIApplication
+from msme_pos.middleware import MetricsMiddleware
+
+from user_profile.models import UserProfile
+from menu_item.models import MenuItem
+from item_order.models import ItemOrder
+
+
+class ASGIApplicationTestCase(TransactionTestCase):
+    """ The views behind the event loop run their queries on other
+    threads, so the test data has to be committed """
+
+    def setUp(self):
+        self.user = UserProfile.objects.create_user(
+            email='business@email.com',
+            business_name='business',
+            identifier='street',
+            owner_surname='test',
+            owner_given_name='test',
+            password='password'
+        )
+
+        self.menu_item = MenuItem.objects.create(
+            name='menu item', description='description', price=80, user_profile=self.user
+        )
+
+        ItemOrder.objects.create(quantity=2, menu_item=self.menu_item)
+
+        self.token = Token.objects.create(user=self.user).key
+        self.application = ASGIApplication()
+
+    def request(self, method, url, body=b'', headers=None, authorized=True):
+        path, _, query_string = url.partition('?')
+        headers = [(b'host', b'testserver'), (b'content-length', str(len(body)).encode('ascii'))] + list(headers or [])
+
+        if authorized:
+            headers.append((b'authorization', 'Token {}'.format(self.token).encode('ascii')))
+
+        scope = {
+            'type': 'http',
+            'http_version': '1.1',
+            'method': method,
+            'path': path,
+            'query_string': query_string.encode('ascii'),
+            'headers': headers,
+        }
+
+        messages = [{'type': 'http.request', 'body': body, 'more_body': False}]
+        sent = []
+
+        async def receive():
+            return messages.pop(0) if messages else {'type': 'http.disconnect'}
+
+        async def send(message):
+            sent.append(message)
+
+        loop = asyncio.new_event_loop()
+
+        try:
+            loop.run_until_complete(self.application(scope, receive, send))
+        finally:
+            loop.close()
+
+        start = sent[0]
+        body = b''.join(message.get('body', b'') for message in sent[1:])
+
+        return start['status'], dict((name.lower(), value) for name, value in start['headers']), body
+
+    def test_menu_item_detail(self):
+        url = reverse('menu_items:menu_items_detail', kwargs={
+            'full_business_name': self.user.full_business_name,
+            'menu_item_name': self.menu_item.url_param_name
+        })
+
+        status_code, headers, body = self.request('GET', url)
+
+        self.assertEqual(status_code, status.HTTP_200_OK)
+        self.assertEqual(json.loads(body.decode('utf-8'))['name'], 'menu item')
+
+        # Conditional GETs work on the async path too
+        status_code, headers, body = self.request('GET', url, headers=[(b'if-none-match', headers[b'etag'])])
+
+        self.assertEqual(status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_order_list(self):
+        url = reverse('item_orders:item_order_list', kwargs={'full_business_name': self.user.full_business_name})
+
+        status_code, headers, body = self.request('GET', url + '?page_size=1')
+
+        self.assertEqual(status_code, status.HTTP_200_OK)
+        self.assertEqual(len(json.loads(body.decode('utf-8'))['results']), 1)
+
+    def test_profile_detail_requires_authentication(self):
+        url = reverse('profiles:profiles_detail', kwargs={'full_business_name': self.user.full_business_name})
+
+        status_code, headers, body = self.request('GET', url, authorized=False)
+
+        self.assertEqual(status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_other_requests_go_to_wsgi(self):
+        url = reverse('item_orders:item_order_create', kwargs={
+            'full_business_name': self.user.full_business_name,
+            'menu_item_name': self.menu_item.url_param_name
+        })
+
+        status_code, headers, body = self.request(
+            'POST', url, body=b'{"quantity": 3}', headers=[(b'content-type', b'application/json')]
+        )
+
+        self.assertEqual(status_code, status.HTTP_200_OK)
+        self.assertIn(b'x-query-count', headers)
+        self.assertTrue(ItemOrder.objects.filter(quantity=3).exists())
+
+    def test_hot_endpoints_go_through_the_middleware(self):
+        url = reverse('menu_items:menu_items_detail', kwargs={
+            'full_business_name': self.user.full_business_name,
+            'menu_item_name': self.menu_item.url_param_name
+        })
+
+        with mock.patch.object(self.application, 'wsgi_application') as wsgi:
+            status_code, headers, body = self.request('GET', url)
+
+        self.assertFalse(wsgi.called)
+        self.assertEqual(status_code, status.HTTP_200_OK)
+
+        # RequestTimingMiddleware, XFrameOptionsMiddleware and MetricsMiddleware
+        self.assertIn(b'db;dur=', headers[b'server-timing'])
+        self.assertIn(b'x-query-count', headers)
+        self.assertEqual(headers[b'x-frame-options'], b'SAMEORIGIN')
+
+        with mock.patch.object(MetricsMiddleware, 'observe') as observe:
+            self.request('GET', url)
+
+        self.assertEqual(observe.call_count, 1)
+
+    def test_async_views_are_routed(self):
+        self.assertIn('profiles:profiles_detail', async_handlers.ASYNC_VIEWS)
@@ -0,0 +1,60 @@
+from django.test import TestCase
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from user_profile.models import UserProfile
+from user_profile.authentication import token_cache
+
+
+class CachedTokenAuthenticationTestCase(TestCase):
+    def setUp(self):
+        token_cache.clear()
+
+        self.user = UserProfile.objects.create_user(
+            email='business@email.com',
+            business_name='business',
+            identifier='street',
+            owner_surname='test',
+            owner_given_name='test',
+            password='password'
+        )
+
+        self.token = Token.objects.create(user=self.user)
+
+        self.authorized_client = APIClient()
+        self.authorized_client.credentials(HTTP_AUTHORIZATION='Token ' + self.token.key)
+
+        self.list_url = reverse(
+            'item_orders:item_order_list',
+            kwargs={'full_business_name': self.user.full_business_name}
+        )
+
+    def test_token_is_only_looked_up_once(self):
+        # Token lookup, the list's ETag validators and the page of orders
+        with self.assertNumQueries(3):
+            self.authorized_client.get(self.list_url, format='json')
+
+        with self.assertNumQueries(2):
+            response = self.authorized_client.get(self.list_url, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_deleted_token_is_rejected(self):
+        self.authorized_client.get(self.list_url, format='json')
+
+        self.token.delete()
+
+        response = self.authorized_client.get(self.list_url, format='json')
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_deactivated_user_is_rejected(self):
+        self.authorized_client.get(self.list_url, format='json')
+
+        self.user.is_active = False
+        self.user.save()
+
+        response = self.authorized_client.get(self.list_url, format='json')
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
@@ -0,0 +1,41 @@
+import json
+from io import StringIO
+
+from django.core.management import call_command
+from django.db import connection
+from django.test import TransactionTestCase
+from django.test.utils import (
+    setup_test_environment,
+    teardown_test_environment
+)
+
+
+class BenchmarkEndpointsTestCase(TransactionTestCase):
+    def test_tiny_benchmark_writes_a_report(self):
+        database = connection.settings_dict['NAME']
+        out = StringIO()
+
+        # The command sets up the test environment itself. One worker, as
+        # SQLite refuses concurrent writes, still has a connection of its own
+        teardown_test_environment()
+
+        try:
+            call_command(
+                'benchmark_endpoints',
+                businesses=1, menu_items=2, orders=3, requests=4, warmup=1, concurrency=1,
+                label='smoke', stdout=out
+            )
+        finally:
+            setup_test_environment()
+
+        report = json.loads(out.getvalue())
+
+        self.assertEqual(report['label'], 'smoke')
+        self.assertEqual(list(report['endpoints']), ['profiles_detail', 'menu_items_detail', 'item_order_list', 'item_order_create'])
+
+        for endpoint, result in report['endpoints'].items():
+            self.assertEqual(result['requests'], 4, endpoint)
+            self.assertEqual(result['errors'], 0, endpoint)
+
+        # Back on this database once the benchmark's own was dropped
+        self.assertEqual(connection.settings_dict['NAME'], database)
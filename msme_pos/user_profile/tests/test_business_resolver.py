@@ -0,0 +1,114 @@
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from rest_framework.test import (
+    APIClient,
+    APIRequestFactory
+)
+
+from user_profile.models import UserProfile
+from user_profile.permissions import (
+    GetAndUpdateOwnMenuItem,
+    GetAndUpdateOwnOrderItem,
+    CreateOrderItem
+)
+from user_profile.resolvers import (
+    business_cache,
+    resolve_business
+)
+from menu_item.models import MenuItem
+from item_order.models import ItemOrder
+
+
+class BusinessResolverTestCase(TestCase):
+    def setUp(self):
+        business_cache.clear()
+
+        self.user = self.create_user('business')
+        self.other_user = self.create_user('other')
+        self.admin = UserProfile.objects.create_superuser(
+            email='admin@email.com', owner_surname='admin', owner_given_name='admin', password='password'
+        )
+
+        self.menu_item = MenuItem.objects.create(name='menu item', description='description', price=80, user_profile=self.user)
+        self.item_order = ItemOrder.objects.create(quantity=2, menu_item=self.menu_item)
+
+        self.client = APIClient()
+
+    def create_user(self, business_name):
+        return UserProfile.objects.create_user(
+            email=business_name + '@email.com',
+            business_name=business_name,
+            identifier='street',
+            owner_surname='test',
+            owner_given_name='test',
+            password='password'
+        )
+
+    def get_orders(self, user, full_business_name):
+        self.client.force_authenticate(user=user)
+
+        return self.client.get(reverse('item_orders:item_order_list', kwargs={'full_business_name': full_business_name}))
+
+    def test_names_are_resolved_once(self):
+        self.assertEqual(resolve_business('business-street').id, self.user.id)
+
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(resolve_business('business-street').id, self.user.id)
+            self.assertIsNone(resolve_business('nobody-here'))
+            self.assertIsNone(resolve_business('nobody-here'))
+
+        self.assertEqual(len(queries), 1)
+
+    def test_own_business_needs_no_query(self):
+        with CaptureQueriesContext(connection) as queries:
+            business = resolve_business('business-street', self.user)
+
+        self.assertEqual((business.id, business.is_active), (self.user.id, True))
+        self.assertEqual(len(queries), 0)
+
+    def test_superusers_see_the_business_in_the_url(self):
+        response = self.get_orders(self.admin, 'business-street')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([order['quantity'] for order in response.json()['results']], [2])
+
+    def test_other_businesses_are_forbidden(self):
+        self.assertEqual(self.get_orders(self.other_user, 'business-street').status_code, 403)
+        self.assertEqual(self.get_orders(self.other_user, 'nobody-here').status_code, 404)
+
+    def test_saves_invalidate_cached_names(self):
+        self.assertIsNone(resolve_business('late-street'))
+        self.create_user('late')
+        self.assertIsNotNone(resolve_business('late-street'))
+
+        self.assertTrue(resolve_business('business-street').is_active)
+        self.user.is_active = False
+        self.user.save()
+        self.assertFalse(resolve_business('business-street').is_active)
+        self.assertEqual(self.get_orders(self.admin, 'business-street').status_code, 404)
+
+        self.user.full_business_name = 'business-renamed'
+        self.user.save()
+        self.assertIsNone(resolve_business('business-street'))
+
+    def test_object_permissions_need_no_profile_query(self):
+        request = APIRequestFactory().get('/')
+        request.user = self.user
+        request.business = resolve_business('business-street', self.user)
+
+        menu_item = MenuItem.objects.get(pk=self.menu_item.pk)
+        item_order = ItemOrder.objects.get(pk=self.item_order.pk)
+
+        with self.assertNumQueries(0):
+            self.assertTrue(GetAndUpdateOwnMenuItem().has_object_permission(request, None, menu_item))
+            self.assertTrue(GetAndUpdateOwnOrderItem().has_object_permission(request, None, item_order))
+            self.assertTrue(CreateOrderItem().has_object_permission(request, None, menu_item))
+            self.assertTrue(CreateOrderItem().has_object_permission(request, None, item_order))
+
+        request.business = resolve_business('other-street', self.other_user)
+
+        self.assertFalse(GetAndUpdateOwnMenuItem().has_object_permission(request, None, menu_item))
+        self.assertFalse(GetAndUpdateOwnOrderItem().has_object_permission(request, None, item_order))
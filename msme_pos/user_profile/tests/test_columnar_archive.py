@@ -0,0 +1,248 @@
+import datetime
+import os
+import shutil
+import tempfile
+import uuid
+from io import StringIO
+from unittest import mock
+
+from django.core.management import call_command
+from django.db import transaction
+from django.test import (
+    TransactionTestCase,
+    override_settings
+)
+from django.urls import reverse
+from django.utils import timezone
+
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from user_profile.models import UserProfile
+from menu_item.models import MenuItem
+from item_order.models import (
+    ClientUUID,
+    ItemOrder,
+    DailySales
+)
+from item_order.ingest import insert_new_orders
+from item_order.partitions import (
+    check_partitioned,
+    create_partition,
+    monthly_partitions,
+    PartitioningUnavailable
+)
+from item_order import archive
+
+
+AUGUST = datetime.date(2017, 8, 1)
+
+
+def partitioned():
+    try:
+        check_partitioned()
+    except PartitioningUnavailable:
+        return False
+
+    return True
+
+
+class ColumnarArchiveTestCase(TransactionTestCase):
+    """ A TransactionTestCase, as archived files are swapped in once the
+    transaction commits """
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+
+        settings_override = override_settings(ITEM_ORDER_COLUMNAR_ARCHIVE_DIR=self.directory)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+        self.user = UserProfile.objects.create_user(
+            email='business@email.com',
+            business_name='business',
+            identifier='street',
+            owner_surname='test',
+            owner_given_name='test',
+            password='password'
+        )
+
+        self.menu_item_1 = MenuItem.objects.create(
+            name='menu item 1', description='description', price=80, user_profile=self.user
+        )
+        self.menu_item_2 = MenuItem.objects.create(
+            name='menu item 2', description='description', price=50, user_profile=self.user
+        )
+
+        # Two days of August and one of September
+        for menu_item, quantity, month, day, notes in (
+            (self.menu_item_1, 1, 8, 30, 'no ice'),
+            (self.menu_item_2, 2, 8, 30, None),
+            (self.menu_item_1, 3, 8, 31, None),
+            (self.menu_item_1, 1, 9, 4, None),
+        ):
+            self.create_order(menu_item, quantity, datetime.datetime(2017, month, day, 12, 30), notes)
+
+        # On PostgreSQL August gets a partition of its own, which archiving
+        # drops, and September stays in the default one
+        if partitioned():
+            create_partition(AUGUST)
+
+        self.authorized_client = APIClient()
+        self.authorized_client.credentials(HTTP_AUTHORIZATION='Token ' + Token.objects.create(user=self.user).key)
+
+        self.analytics_url = reverse(
+            'item_orders:item_order_analytics',
+            kwargs={'full_business_name': self.user.full_business_name}
+        )
+
+    def create_order(self, menu_item, quantity, ordered_on, notes=None):
+        item_order = ItemOrder.objects.create(quantity=quantity, menu_item=menu_item, additional_notes=notes)
+        item_order.ordered_on = timezone.make_aware(ordered_on)
+        item_order.save()
+
+        return item_order
+
+    def rollups(self):
+        # Moving ordered_on after creating an order leaves an empty row for today
+        return sorted(DailySales.objects.exclude(order_count=0).values_list('menu_item', 'day', 'order_count', 'total_quantity', 'revenue'))
+
+    def counters(self):
+        return sorted(MenuItem.objects.values_list('id', 'order_count', 'total_quantity'))
+
+    def get_buckets(self, query):
+        response = self.authorized_client.get(self.analytics_url + query, format='json')
+        self.assertEqual(response.status_code, 200)
+
+        return response.json()['buckets']
+
+    def test_archiving_moves_a_month_out_of_the_table(self):
+        rollups, counters = self.rollups(), self.counters()
+
+        self.assertEqual(archive.archive_month(AUGUST), 3)
+
+        self.assertEqual(ItemOrder.objects.count(), 1)
+        self.assertEqual(archive.archived_months(), [AUGUST])
+        self.assertEqual(archive.read_manifest(self.directory, AUGUST)['rows'], 3)
+
+        columns = archive.load_month(self.directory, AUGUST)
+        self.assertEqual(list(columns['quantity']), [1, 2, 3])
+        self.assertEqual(list(columns['menu_item_id']), [self.menu_item_1.id, self.menu_item_2.id, self.menu_item_1.id])
+        self.assertEqual(
+            archive.from_micros(columns['ordered_on'][0]),
+            timezone.make_aware(datetime.datetime(2017, 8, 30, 12, 30))
+        )
+        self.assertEqual(
+            list(archive.load_notes(self.directory, AUGUST).values()),
+            ['no ice']
+        )
+
+        # Archived orders still count
+        self.assertEqual(self.rollups(), rollups)
+        self.assertEqual(self.counters(), counters)
+
+    def test_reports_read_through_the_archive(self):
+        queries = ('?interval=day', '?interval=week', '?interval=month&group_by=menu_item', '?interval=hour&from=2017-08-31')
+        before = [self.get_buckets(query) for query in queries]
+
+        archive.archive_month(AUGUST)
+
+        self.assertEqual([self.get_buckets(query) for query in queries], before)
+        self.assertEqual(self.get_buckets('?interval=day&from=2017-09-01'), [
+            {'bucket': '2017-09-04T00:00:00+00:00', 'order_count': 1, 'total_quantity': 1, 'revenue': '80.00'},
+        ])
+
+    def test_late_orders_join_the_archived_month(self):
+        archive.archive_month(AUGUST)
+        self.create_order(self.menu_item_2, 4, datetime.datetime(2017, 8, 1, 8, 0))
+
+        self.assertEqual(archive.archive_month(AUGUST), 1)
+
+        columns = archive.load_month(self.directory, AUGUST)
+        self.assertEqual(list(columns['quantity']), [1, 2, 3, 4])
+        self.assertEqual(len(archive.load_notes(self.directory, AUGUST)), 1)
+
+    def test_rebuilding_rollups_and_counters_keeps_archived_orders(self):
+        archive.archive_month(AUGUST)
+        rollups, counters = self.rollups(), self.counters()
+
+        call_command('rebuild_daily_sales', stdout=StringIO())
+        call_command('repair_menu_item_counters', stdout=StringIO())
+
+        self.assertEqual(self.rollups(), rollups)
+        self.assertEqual(self.counters(), counters)
+
+    def test_command_archives_old_closed_months(self):
+        out = StringIO()
+        call_command('archive_cold_orders', older_than=1, stdout=out)
+
+        self.assertIn('Archived 3 orders of 2017-08', out.getvalue())
+        self.assertIn('Archived 1 orders of 2017-09', out.getvalue())
+        self.assertEqual(ItemOrder.objects.count(), 0)
+
+    def test_archiving_drops_the_month_partition(self):
+        if not partitioned():
+            self.skipTest('Orders are not partitioned on this database')
+
+        archive.archive_month(AUGUST)
+
+        self.assertNotIn(AUGUST, monthly_partitions())
+        self.assertEqual(ItemOrder.objects.count(), 1)
+
+    def test_files_are_swapped_in_when_the_transaction_commits(self):
+        with transaction.atomic():
+            archive.archive_month(AUGUST)
+            self.assertEqual(archive.archived_months(), [])
+
+        self.assertEqual(archive.archived_months(), [AUGUST])
+
+        # A rolled back archival leaves the orders and the archive alone
+        self.create_order(self.menu_item_2, 4, datetime.datetime(2017, 8, 1, 8, 0))
+
+        with self.assertRaises(RuntimeError), transaction.atomic():
+            archive.archive_month(AUGUST)
+            raise RuntimeError
+
+        self.assertEqual(ItemOrder.objects.filter(quantity=4).count(), 1)
+        self.assertEqual(archive.read_manifest(self.directory, AUGUST)['rows'], 3)
+
+        self.assertEqual(archive.archive_month(AUGUST), 1)
+        self.assertEqual(archive.read_manifest(self.directory, AUGUST)['rows'], 4)
+        self.assertEqual(sorted(os.listdir(self.directory)), ['2017-08', archive.LOCK_FILE])
+
+    def test_interrupted_swap_is_finished_by_the_next_run(self):
+        # The process stops after committing, before the files are swapped in
+        with mock.patch.object(transaction, 'on_commit'):
+            archive.archive_month(AUGUST)
+
+        self.assertEqual(ItemOrder.objects.count(), 1)
+        self.assertEqual(archive.archived_months(), [])
+
+        self.assertEqual(archive.archive_month(AUGUST), 0)
+        self.assertEqual(archive.read_manifest(self.directory, AUGUST)['rows'], 3)
+        self.assertEqual(sorted(os.listdir(self.directory)), ['2017-08', archive.LOCK_FILE])
+
+    def test_late_replays_of_archived_orders_are_skipped(self):
+        client_uuid = uuid.UUID('8d2c1a4e-5b1f-4c2a-9a55-0e6b7c1d2f3a')
+
+        def replay():
+            return insert_new_orders([ItemOrder(
+                client_uuid=client_uuid,
+                ordered_on=timezone.make_aware(datetime.datetime(2017, 8, 15, 9, 0)),
+                quantity=2,
+                menu_item=self.menu_item_1
+            )])
+
+        replay()
+        archive.archive_month(AUGUST)
+
+        columns = archive.load_month(self.directory, AUGUST)
+        self.assertIn(client_uuid.bytes, list(columns['client_uuid']))
+
+        # Even once the uuid is no longer known to ClientUUID
+        ClientUUID.objects.all().delete()
+        created, duplicates = replay()
+
+        self.assertEqual((len(created), len(duplicates)), (0, 1))
+        self.assertFalse(ItemOrder.objects.filter(ordered_on__month=8).exists())
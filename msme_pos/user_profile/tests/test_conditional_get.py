@@ -0,0 +1,129 @@
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from user_profile.models import UserProfile
+from menu_item.models import MenuItem
+from item_order.models import ItemOrder
+
+
+class ConditionalGetTestCase(TestCase):
+    def setUp(self):
+        self.user = UserProfile.objects.create_user(
+            email='business@email.com',
+            business_name='business',
+            identifier='street',
+            owner_surname='test',
+            owner_given_name='test',
+            password='password'
+        )
+
+        self.menu_item = MenuItem.objects.create(
+            name='menu item', description='description', price=80, user_profile=self.user
+        )
+
+        self.item_order = ItemOrder.objects.create(quantity=1, menu_item=self.menu_item)
+
+        self.authorized_client = APIClient()
+        self.authorized_client.credentials(HTTP_AUTHORIZATION='Token ' + Token.objects.create(user=self.user).key)
+
+        self.menu_item_url = reverse(
+            'menu_items:menu_items_detail',
+            kwargs={
+                'full_business_name': self.user.full_business_name,
+                'menu_item_name': self.menu_item.url_param_name
+            }
+        )
+
+        self.list_url = reverse(
+            'item_orders:item_order_list',
+            kwargs={'full_business_name': self.user.full_business_name}
+        )
+
+    def assert_revalidates(self, url, change):
+        response = self.authorized_client.get(url, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        etag = response['ETag']
+
+        response = self.authorized_client.get(url, format='json', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+        change()
+
+        response = self.authorized_client.get(url, format='json', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_menu_item_detail_changes_with_item(self):
+        def change():
+            self.menu_item.description = 'new description'
+            self.menu_item.save()
+
+        self.assert_revalidates(self.menu_item_url, change)
+
+    def test_menu_item_detail_changes_with_orders(self):
+        self.assert_revalidates(
+            self.menu_item_url,
+            lambda: ItemOrder.objects.create(quantity=1, menu_item=self.menu_item)
+        )
+
+    def test_order_list_changes_with_order_notes(self):
+        def change():
+            self.item_order.additional_notes = 'no onions'
+            self.item_order.save()
+
+        self.assert_revalidates(self.list_url, change)
+
+    def test_other_user_gets_no_etag(self):
+        other_user = UserProfile.objects.create_user(
+            email='other@email.com',
+            business_name='other',
+            identifier='street',
+            owner_surname='test',
+            owner_given_name='test',
+            password='password'
+        )
+
+        other_client = APIClient()
+        other_client.credentials(HTTP_AUTHORIZATION='Token ' + Token.objects.create(user=other_user).key)
+
+        response = other_client.get(self.menu_item_url, format='json', HTTP_IF_NONE_MATCH='*')
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+    def menu_item_updates(self, change):
+        with CaptureQueriesContext(connection) as queries:
+            change()
+
+        return [query['sql'] for query in queries if query['sql'].startswith('UPDATE "menu_item_menuitem"')]
+
+    def test_version_is_bumped_in_the_same_update_as_the_change(self):
+        def save():
+            self.menu_item.description = 'new description'
+            self.menu_item.save()
+
+        self.assertEqual(len(self.menu_item_updates(save)), 1)
+        self.assertEqual(self.menu_item.version, 2)
+
+        # Along with the order counters
+        self.assertEqual(
+            len(self.menu_item_updates(lambda: ItemOrder.objects.create(quantity=1, menu_item=self.menu_item))),
+            1
+        )
+        self.assertEqual(MenuItem.objects.get(pk=self.menu_item.pk).version, 3)
+
+    def test_changes_within_a_second_get_new_etags(self):
+        response = self.authorized_client.get(self.menu_item_url, format='json')
+        self.assertNotIn('Last-Modified', response)
+
+        etags = set([response['ETag']])
+
+        for quantity in range(3):
+            ItemOrder.objects.create(quantity=quantity + 1, menu_item=self.menu_item)
+            etags.add(self.authorized_client.get(self.menu_item_url, format='json')['ETag'])
+
+        self.assertEqual(len(etags), 4)
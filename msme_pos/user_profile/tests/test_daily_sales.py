@@ -0,0 +1,198 @@
+import datetime
+from io import StringIO
+from unittest import mock
+
+from django.core.management import call_command
+from django.db import (
+    DatabaseError,
+    transaction
+)
+from django.db.models.deletion import Collector
+from django.db.models.sql.subqueries import DeleteQuery
+from django.test import TestCase
+from django.utils import timezone
+
+from user_profile.models import UserProfile
+from menu_item.models import MenuItem
+from item_order.models import (
+    ItemOrder,
+    DailySales
+)
+from item_order.signals import orders_bulk_created
+
+
+class DailySalesTestCase(TestCase):
+    def setUp(self):
+        self.user = UserProfile.objects.create_user(
+            email='business@email.com',
+            business_name='business',
+            identifier='street',
+            owner_surname='test',
+            owner_given_name='test',
+            password='password'
+        )
+
+        self.menu_item = MenuItem.objects.create(
+            name='menu item', description='description', price=80, user_profile=self.user
+        )
+
+    def get_rollup(self):
+        return DailySales.objects.get(menu_item=self.menu_item)
+
+    def test_rollup_follows_order_create_update_and_delete(self):
+        first_order = ItemOrder.objects.create(quantity=2, menu_item=self.menu_item)
+        ItemOrder.objects.create(quantity=1, menu_item=self.menu_item)
+
+        rollup = self.get_rollup()
+        self.assertEqual((rollup.order_count, rollup.total_quantity, rollup.revenue), (2, 3, 240))
+
+        first_order.quantity = 5
+        first_order.save()
+
+        rollup = self.get_rollup()
+        self.assertEqual((rollup.order_count, rollup.total_quantity, rollup.revenue), (2, 6, 480))
+
+        first_order.delete()
+
+        rollup = self.get_rollup()
+        self.assertEqual((rollup.order_count, rollup.total_quantity, rollup.revenue), (1, 1, 80))
+
+    def test_orders_keep_the_price_they_were_placed_at(self):
+        first_order = ItemOrder.objects.create(quantity=2, menu_item=self.menu_item)
+
+        self.menu_item.price = 100
+        self.menu_item.save()
+        ItemOrder.objects.create(quantity=1, menu_item=self.menu_item)
+
+        rollup = self.get_rollup()
+        self.assertEqual((rollup.order_count, rollup.total_quantity, rollup.revenue), (2, 3, 260))
+
+        call_command('rebuild_daily_sales', stdout=StringIO())
+
+        rollup = self.get_rollup()
+        self.assertEqual((rollup.order_count, rollup.total_quantity, rollup.revenue), (2, 3, 260))
+
+        first_order.delete()
+
+        rollup = self.get_rollup()
+        self.assertEqual((rollup.order_count, rollup.total_quantity, rollup.revenue), (1, 1, 100))
+
+    def test_queryset_delete_subtracts_orders(self):
+        first_day = datetime.datetime(2017, 1, 1, 12, tzinfo=timezone.utc)
+
+        for day, quantity in ((0, 1), (0, 2), (1, 3), (1, 4)):
+            ItemOrder.objects.create(
+                quantity=quantity, menu_item=self.menu_item, ordered_on=first_day + datetime.timedelta(days=day)
+            )
+
+        ItemOrder.objects.filter(quantity__gte=2).delete()
+
+        rollups = DailySales.objects.order_by('day').values_list('order_count', 'total_quantity', 'revenue')
+        self.assertEqual(list(rollups), [(1, 1, 80), (0, 0, 0)])
+
+        self.menu_item.refresh_from_db()
+        self.assertEqual((self.menu_item.order_count, self.menu_item.total_quantity), (1, 1))
+
+    def test_orders_are_fast_deleted(self):
+        # Cascades from menu items and profiles delete the orders in one
+        # query instead of loading them to send per-order delete signals
+        self.assertTrue(Collector(using='default').can_fast_delete(ItemOrder.objects.all()))
+
+    def test_rollup_counts_bulk_created_orders(self):
+        orders = ItemOrder.objects.bulk_create([
+            ItemOrder(quantity=1, menu_item=self.menu_item, user_profile=self.user, unit_price=80),
+            ItemOrder(quantity=4, menu_item=self.menu_item, user_profile=self.user, unit_price=80),
+        ])
+        orders_bulk_created.send(sender=ItemOrder, orders=orders)
+
+        rollup = self.get_rollup()
+        self.assertEqual((rollup.order_count, rollup.total_quantity), (2, 5))
+
+    def test_rebuild_daily_sales(self):
+        ItemOrder.objects.create(quantity=2, menu_item=self.menu_item)
+        ItemOrder.objects.create(quantity=3, menu_item=self.menu_item)
+        DailySales.objects.all().update(order_count=0, total_quantity=0, revenue=0)
+
+        call_command('rebuild_daily_sales', stdout=StringIO())
+
+        rollup = self.get_rollup()
+        self.assertEqual((rollup.order_count, rollup.total_quantity, rollup.revenue), (2, 5, 400))
+
+    def test_rebuild_inserts_more_rows_than_one_sqlite_insert_holds(self):
+        # 7 columns per rollup row, so 5000 rows need 35000 parameters,
+        # more than SQLite allows in one statement (999, or 32766 since 3.32)
+        first_day = datetime.datetime(2017, 1, 1, 12, tzinfo=timezone.utc)
+        ItemOrder.objects.bulk_create([
+            ItemOrder(quantity=1, menu_item=self.menu_item, user_profile=self.user, unit_price=80, ordered_on=first_day + datetime.timedelta(days=day))
+            for day in range(5000)
+        ])
+
+        call_command('rebuild_daily_sales', stdout=StringIO())
+
+        self.assertEqual(DailySales.objects.filter(menu_item=self.menu_item).count(), 5000)
+
+    def test_deleting_menu_item_removes_rollup(self):
+        ItemOrder.objects.create(quantity=2, menu_item=self.menu_item)
+
+        self.menu_item.delete()
+
+        self.assertFalse(DailySales.objects.exists())
+        self.assertFalse(ItemOrder.objects.exists())
+
+    def test_failed_menu_item_delete_leaves_rollups_working(self):
+        item_order = ItemOrder.objects.create(quantity=2, menu_item=self.menu_item)
+
+        with mock.patch.object(DeleteQuery, 'delete_batch', side_effect=DatabaseError('lost the server')):
+            with self.assertRaises(DatabaseError), transaction.atomic():
+                self.menu_item.delete()
+
+        item_order.delete()
+
+        rollup = self.get_rollup()
+        self.assertEqual((rollup.order_count, rollup.total_quantity), (0, 0))
+
+    def test_deferred_orders_are_loaded_without_extra_queries(self):
+        for quantity in (1, 2, 3):
+            ItemOrder.objects.create(quantity=quantity, menu_item=self.menu_item)
+
+        with self.assertNumQueries(1):
+            item_orders = list(ItemOrder.objects.only('id').order_by('id'))
+
+        item_orders[0].quantity = 5
+        item_orders[0].save()
+        item_orders[1].delete()
+
+        rollup = self.get_rollup()
+        self.assertEqual((rollup.order_count, rollup.total_quantity), (2, 8))
+
+    def test_menu_item_counters_follow_orders(self):
+        first_order = ItemOrder.objects.create(quantity=2, menu_item=self.menu_item)
+        ItemOrder.objects.create(quantity=1, menu_item=self.menu_item)
+
+        first_order.quantity = 4
+        first_order.save()
+
+        # Saving a stale copy of the menu item must not reset its counters
+        self.menu_item.description = 'new description'
+        self.menu_item.save()
+
+        self.menu_item.refresh_from_db()
+        self.assertEqual((self.menu_item.order_count, self.menu_item.total_quantity), (2, 5))
+
+        first_order.delete()
+
+        self.menu_item.refresh_from_db()
+        self.assertEqual((self.menu_item.order_count, self.menu_item.total_quantity), (1, 1))
+
+    def test_repair_menu_item_counters(self):
+        ItemOrder.objects.create(quantity=3, menu_item=self.menu_item)
+        MenuItem.objects.filter(id=self.menu_item.id).update(order_count=7, total_quantity=0)
+        self.menu_item.refresh_from_db()
+        version = self.menu_item.version
+
+        call_command('repair_menu_item_counters', stdout=StringIO())
+
+        self.menu_item.refresh_from_db()
+        self.assertEqual((self.menu_item.order_count, self.menu_item.total_quantity), (1, 3))
+        # The counters are in the menu item's ETag, so a repair must change it
+        self.assertEqual(self.menu_item.version, version + 1)
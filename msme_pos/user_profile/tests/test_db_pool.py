@@ -0,0 +1,217 @@
+import threading
+from unittest import mock
+
+from django.test import SimpleTestCase
+
+from msme_pos.db_pool import pool as db_pool
+from msme_pos.db_pool.base import (
+    Database,
+    DatabaseWrapper
+)
+from msme_pos.db_pool.pool import (
+    ConnectionPool,
+    PoolTimeout
+)
+from msme_pos.metrics import Registry
+
+
+class FakeConnection(object):
+    def __init__(self):
+        self.closed = 0
+        self.broken = False
+        self.queries = 0
+
+    def cursor(self):
+        return FakeCursor(self)
+
+    def rollback(self):
+        pass
+
+    def close(self):
+        self.closed = 1
+
+
+class FakeCursor(object):
+    def __init__(self, connection):
+        self.connection = connection
+
+    def execute(self, sql):
+        if self.connection.broken:
+            raise Exception('server closed the connection unexpectedly')
+
+        self.connection.queries += 1
+
+    def close(self):
+        pass
+
+
+class ConnectionPoolTestCase(SimpleTestCase):
+    def setUp(self):
+        self.opened = []
+
+    def factory(self):
+        connection = FakeConnection()
+        self.opened.append(connection)
+
+        return connection
+
+    def test_reuses_connections(self):
+        pool = ConnectionPool(self.factory, max_size=2)
+
+        connection = pool.checkout()
+        pool.checkin(connection)
+
+        self.assertIs(pool.checkout(), connection)
+        self.assertEqual(len(self.opened), 1)
+        self.assertEqual(connection.queries, 1)
+
+    def test_health_check_replaces_broken_connections(self):
+        pool = ConnectionPool(self.factory, max_size=2)
+
+        connection = pool.checkout()
+        pool.checkin(connection)
+        connection.broken = True
+
+        replacement = pool.checkout()
+
+        self.assertIsNot(replacement, connection)
+        self.assertTrue(connection.closed)
+        self.assertEqual(pool.stats()['health_check_failures'], 1)
+        self.assertEqual(pool.stats()['size'], 1)
+
+    def test_health_check_can_be_turned_off(self):
+        pool = ConnectionPool(self.factory, health_check=False)
+
+        connection = pool.checkout()
+        pool.checkin(connection)
+
+        self.assertIs(pool.checkout(), connection)
+        self.assertEqual(connection.queries, 0)
+
+    def test_replaces_connections_after_max_lifetime(self):
+        pool = ConnectionPool(self.factory, max_lifetime=60)
+
+        with mock.patch('time.monotonic', return_value=1000):
+            connection = pool.checkout()
+            pool.checkin(connection)
+
+        with mock.patch('time.monotonic', return_value=1061):
+            self.assertIsNot(pool.checkout(), connection)
+
+        self.assertTrue(connection.closed)
+
+    def test_unusable_connections_are_closed_on_checkin(self):
+        pool = ConnectionPool(self.factory)
+
+        connection = pool.checkout()
+        pool.checkin(connection, reusable=False)
+
+        self.assertTrue(connection.closed)
+        self.assertEqual(pool.stats()['size'], 0)
+
+    def test_waits_for_a_free_connection(self):
+        pool = ConnectionPool(self.factory, max_size=1, timeout=5)
+        connection = pool.checkout()
+
+        timer = threading.Timer(0.1, pool.checkin, [connection])
+        timer.start()
+
+        self.assertIs(pool.checkout(), connection)
+        self.assertEqual(pool.stats()['waits'], 1)
+        timer.join()
+
+    def test_times_out_when_exhausted(self):
+        pool = ConnectionPool(self.factory, max_size=1, timeout=0.05)
+        pool.checkout()
+
+        with self.assertRaises(PoolTimeout):
+            pool.checkout()
+
+        self.assertEqual(pool.stats()['timeouts'], 1)
+
+    def test_failed_connect_frees_its_slot(self):
+        pool = ConnectionPool(mock.Mock(side_effect=Exception('could not connect')), max_size=1, timeout=0.05)
+
+        with self.assertRaises(Exception):
+            pool.checkout()
+
+        self.assertEqual(pool.stats()['size'], 0)
+
+    def test_never_opens_more_than_max_size(self):
+        pool = ConnectionPool(self.factory, max_size=3, timeout=5)
+
+        def work():
+            for i in range(50):
+                pool.checkin(pool.checkout())
+
+        threads = [threading.Thread(target=work) for i in range(8)]
+
+        for thread in threads:
+            thread.start()
+
+        for thread in threads:
+            thread.join()
+
+        self.assertLessEqual(len(self.opened), 3)
+        self.assertEqual(pool.stats()['in_use'], 0)
+        self.assertEqual(pool.stats()['checkouts'], 400)
+
+    def test_stats_are_in_the_metrics(self):
+        pools = {}
+
+        with mock.patch.object(db_pool, 'pools', pools):
+            pool = db_pool.get_pool('default', {'database': 'msme_pos_db'}, self.factory, {'MAX_SIZE': 4})
+            pool.checkout()
+
+            lines = Registry().exposition().splitlines()
+
+        self.assertTrue(any(
+            line == 'msme_pos_db_pool_in_use{alias="default",database="msme_pos_db"} 1' for line in lines
+        ))
+        self.assertTrue(any(line.startswith('msme_pos_db_pool_max_size{') and line.endswith(' 4') for line in lines))
+
+    def test_close_pools_closes_idle_connections(self):
+        pools = {}
+
+        with mock.patch.object(db_pool, 'pools', pools):
+            test_pool = db_pool.get_pool('default', {'database': 'test_msme_pos_db'}, self.factory, {})
+            other_pool = db_pool.get_pool('default', {'database': 'msme_pos_db'}, self.factory, {})
+
+            idle = test_pool.checkout()
+            in_use = test_pool.checkout()
+            test_pool.checkin(idle)
+            other_pool.checkin(other_pool.checkout())
+
+            db_pool.close_pools(database='test_msme_pos_db')
+
+        self.assertTrue(idle.closed)
+        self.assertFalse(in_use.closed)
+        self.assertEqual(test_pool.stats()['idle'], 0)
+        self.assertEqual(other_pool.stats()['idle'], 1)
+
+
+class PooledDatabaseWrapperTestCase(SimpleTestCase):
+    def close(self, connection):
+        wrapper = DatabaseWrapper({}, alias='default')
+        wrapper.connection = connection
+        wrapper.pool = mock.Mock()
+        # As after a query failed, for example on a unique constraint
+        wrapper.errors_occurred = True
+
+        wrapper._close()
+
+        return wrapper.pool.checkin.call_args
+
+    def test_connection_is_rolled_back_and_reused_after_a_query_error(self):
+        connection = mock.Mock()
+        connection.get_transaction_status.return_value = Database.extensions.TRANSACTION_STATUS_INERROR
+
+        self.assertEqual(self.close(connection), mock.call(connection, reusable=True))
+        connection.rollback.assert_called_once_with()
+
+    def test_broken_connection_is_discarded(self):
+        connection = mock.Mock()
+        connection.get_transaction_status.return_value = Database.extensions.TRANSACTION_STATUS_UNKNOWN
+        connection.rollback.side_effect = Database.InterfaceError('connection already closed')
+
+        self.assertEqual(self.close(connection), mock.call(connection, reusable=False))
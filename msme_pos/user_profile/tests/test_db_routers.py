@@ -0,0 +1,154 @@
+import multiprocessing
+import shutil
+import tempfile
+import time
+from unittest import mock
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.db import connections
+from django.http import HttpResponse
+from django.test import (
+    SimpleTestCase,
+    RequestFactory,
+    override_settings
+)
+
+from rest_framework.authtoken.models import Token
+
+from msme_pos import db_routers
+from msme_pos.db_routers import PrimaryReplicaRouter
+from msme_pos.middleware import ReplicaPinningMiddleware
+
+from user_profile.models import UserProfile
+from menu_item.models import MenuItem
+from item_order.models import ItemOrder
+
+
+@override_settings(DATABASE_REPLICAS=['replica'], REPLICA_PIN_SECONDS=30)
+class PrimaryReplicaRouterTestCase(SimpleTestCase):
+    def setUp(self):
+        # A cache that other processes can see, without the database
+        cache_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, cache_dir)
+
+        cache_settings = override_settings(CACHES=dict(settings.CACHES, replica_pins={
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+            'LOCATION': cache_dir,
+        }))
+        cache_settings.enable()
+        self.addCleanup(cache_settings.disable)
+
+        self.factory = RequestFactory()
+        self.router = PrimaryReplicaRouter()
+        self.middleware = ReplicaPinningMiddleware()
+
+        self.addCleanup(setattr, db_routers.state, 'use_replica', False)
+        self.addCleanup(db_routers.local_pins.clear)
+
+    def read_databases(self, request):
+        self.middleware.process_request(request)
+
+        return [self.router.db_for_read(model) for model in (UserProfile, MenuItem, ItemOrder)]
+
+    def test_gets_read_from_the_replica(self):
+        self.assertEqual(self.read_databases(self.factory.get('/')), ['replica'] * 3)
+        self.assertEqual(self.router.db_for_write(ItemOrder), 'default')
+
+    def test_writes_read_from_the_primary(self):
+        self.assertEqual(self.read_databases(self.factory.post('/')), ['default'] * 3)
+
+    def test_other_apps_read_from_the_primary(self):
+        self.middleware.process_request(self.factory.get('/'))
+
+        self.assertEqual(self.router.db_for_read(Token), 'default')
+
+    def test_outside_requests_read_from_the_primary(self):
+        self.assertEqual(self.router.db_for_read(ItemOrder), 'default')
+
+    def test_transactions_read_from_the_primary(self):
+        self.middleware.process_request(self.factory.get('/'))
+        connections['default'].in_atomic_block = True
+
+        try:
+            self.assertEqual(self.router.db_for_read(ItemOrder), 'default')
+        finally:
+            connections['default'].in_atomic_block = False
+
+    def test_response_ends_replica_reads(self):
+        request = self.factory.get('/')
+        self.middleware.process_request(request)
+        self.middleware.process_response(request, HttpResponse())
+
+        self.assertEqual(self.router.db_for_read(ItemOrder), 'default')
+
+    def write(self, **headers):
+        request = self.factory.post('/', **headers)
+        self.middleware.process_request(request)
+
+        return self.middleware.process_response(request, HttpResponse())
+
+    def test_write_pins_the_client_with_a_cookie(self):
+        pin = self.write().cookies[db_routers.PIN_COOKIE]
+        self.assertEqual(pin['max-age'], 30)
+
+        request = self.factory.get('/')
+        request.COOKIES[db_routers.PIN_COOKIE] = pin.value
+
+        self.assertEqual(self.read_databases(request), ['default'] * 3)
+
+    def test_forged_and_expired_cookies_read_from_the_replica(self):
+        request = self.factory.get('/')
+        request.COOKIES[db_routers.PIN_COOKIE] = '1'
+
+        self.assertEqual(self.read_databases(request), ['replica'] * 3)
+
+        with mock.patch('time.time', return_value=time.time() - 60):
+            pin = self.write().cookies[db_routers.PIN_COOKIE]
+
+        request = self.factory.get('/')
+        request.COOKIES[db_routers.PIN_COOKIE] = pin.value
+
+        self.assertEqual(self.read_databases(request), ['replica'] * 3)
+
+    def test_write_pins_the_client_by_token(self):
+        self.write(HTTP_AUTHORIZATION='Token abc')
+
+        with mock.patch.object(db_routers, 'pin_cache') as pin_cache:
+            # This worker remembers its own pins
+            self.assertEqual(self.read_databases(self.factory.get('/', HTTP_AUTHORIZATION='Token abc')), ['default'] * 3)
+            self.assertEqual(self.read_databases(self.factory.get('/', HTTP_AUTHORIZATION='Token xyz')), ['replica'] * 3)
+
+        self.assertFalse(pin_cache.called)
+
+    def test_pin_is_seen_by_other_processes(self):
+        # Another worker handles the write
+        worker = multiprocessing.get_context('fork').Process(target=self.write, kwargs={'HTTP_AUTHORIZATION': 'Token abc'})
+        worker.start()
+        worker.join()
+
+        self.assertEqual(worker.exitcode, 0)
+        self.assertEqual(
+            self.read_databases(self.factory.get('/', HTTP_AUTHORIZATION='Token abc', HTTP_X_REPLICA_PIN='1')),
+            ['default'] * 3
+        )
+
+        # Without the marker the shared cache isn't asked
+        with mock.patch.object(db_routers, 'pin_cache') as pin_cache:
+            self.assertEqual(self.read_databases(self.factory.get('/', HTTP_AUTHORIZATION='Token abc')), ['replica'] * 3)
+
+        self.assertFalse(pin_cache.called)
+
+    def test_per_process_cache_is_refused(self):
+        with override_settings(REPLICA_PIN_CACHE='default'):
+            with self.assertRaises(ImproperlyConfigured):
+                ReplicaPinningMiddleware()
+
+            with override_settings(DATABASE_REPLICAS=[]):
+                ReplicaPinningMiddleware()
+
+    @override_settings(DATABASE_REPLICAS=[])
+    def test_no_replicas(self):
+        self.assertEqual(self.read_databases(self.factory.get('/')), ['default'] * 3)
+
+        self.assertNotIn(db_routers.PIN_COOKIE, self.write().cookies)
@@ -0,0 +1,137 @@
+from django.core.cache import caches
+from django.core.exceptions import ImproperlyConfigured
+from django.test import (
+    TestCase,
+    override_settings
+)
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from msme_pos.middleware import IdempotencyKeyMiddleware
+
+from user_profile.models import UserProfile
+from menu_item.models import MenuItem
+from item_order.models import ItemOrder
+
+
+class IdempotencyKeyTestCase(TestCase):
+    def setUp(self):
+        caches['idempotency'].clear()
+
+        self.user = UserProfile.objects.create_user(
+            email='business@email.com',
+            business_name='business',
+            identifier='street',
+            owner_surname='test',
+            owner_given_name='test',
+            password='password'
+        )
+
+        self.menu_item = MenuItem.objects.create(
+            name='menu item', description='description', price=80, user_profile=self.user
+        )
+
+        self.authorized_client = APIClient()
+        self.authorized_client.credentials(HTTP_AUTHORIZATION='Token ' + Token.objects.create(user=self.user).key)
+
+        self.bulk_url = reverse(
+            'item_orders:item_order_bulk_create',
+            kwargs={'full_business_name': self.user.full_business_name}
+        )
+
+        self.orders = [{'menu_item': self.menu_item.url_param_name, 'quantity': 1}]
+
+    def test_retry_returns_stored_response(self):
+        first = self.authorized_client.post(self.bulk_url, self.orders, format='json', HTTP_IDEMPOTENCY_KEY='key-1')
+        retry = self.authorized_client.post(self.bulk_url, self.orders, format='json', HTTP_IDEMPOTENCY_KEY='key-1')
+
+        self.assertEqual(first.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(retry.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(retry.content, first.content)
+        self.assertEqual(retry['Idempotent-Replayed'], 'true')
+        self.assertEqual(ItemOrder.objects.count(), 1)
+
+    def test_new_key_runs_the_view(self):
+        self.authorized_client.post(self.bulk_url, self.orders, format='json', HTTP_IDEMPOTENCY_KEY='key-1')
+        self.authorized_client.post(self.bulk_url, self.orders, format='json', HTTP_IDEMPOTENCY_KEY='key-2')
+        self.authorized_client.post(self.bulk_url, self.orders, format='json')
+
+        self.assertEqual(ItemOrder.objects.count(), 3)
+
+    def test_reused_key_with_different_body_is_rejected(self):
+        self.authorized_client.post(self.bulk_url, self.orders, format='json', HTTP_IDEMPOTENCY_KEY='key-1')
+
+        response = self.authorized_client.post(
+            self.bulk_url,
+            [{'menu_item': self.menu_item.url_param_name, 'quantity': 2}],
+            format='json',
+            HTTP_IDEMPOTENCY_KEY='key-1'
+        )
+
+        self.assertEqual(response.status_code, 422)
+        self.assertEqual(ItemOrder.objects.count(), 1)
+
+    def test_anonymous_signup_retry_returns_stored_response(self):
+        signup = {
+            'email': 'new@email.com',
+            'password': 'password',
+            'business_name': 'new business',
+            'identifier': 'avenue',
+            'owner_surname': 'test',
+            'owner_given_name': 'test',
+        }
+        url = reverse('profiles:profiles_create')
+
+        first = APIClient().post(url, signup, format='json', HTTP_IDEMPOTENCY_KEY='key-1')
+        retry = APIClient().post(url, signup, format='json', HTTP_IDEMPOTENCY_KEY='key-1')
+
+        self.assertEqual(first.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(retry.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(retry.content, first.content)
+        self.assertEqual(retry['Idempotent-Replayed'], 'true')
+        self.assertEqual(UserProfile.objects.filter(email='new@email.com').count(), 1)
+
+        # Another address gets a key space of its own
+        response = APIClient().post(url, signup, format='json', HTTP_IDEMPOTENCY_KEY='key-1', REMOTE_ADDR='10.0.0.2')
+        self.assertNotIn('Idempotent-Replayed', response)
+
+    def test_anonymous_key_does_not_replay_authorized_response(self):
+        self.authorized_client.post(self.bulk_url, self.orders, format='json', HTTP_IDEMPOTENCY_KEY='key-1')
+
+        response = APIClient().post(self.bulk_url, self.orders, format='json', HTTP_IDEMPOTENCY_KEY='key-1')
+
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+        self.assertNotIn('Idempotent-Replayed', response)
+        self.assertEqual(ItemOrder.objects.count(), 1)
+
+    def test_client_errors_are_not_stored(self):
+        first = self.authorized_client.post(self.bulk_url, {'not': 'a list'}, format='json', HTTP_IDEMPOTENCY_KEY='key-1')
+        retry = self.authorized_client.post(self.bulk_url, {'not': 'a list'}, format='json', HTTP_IDEMPOTENCY_KEY='key-1')
+
+        self.assertEqual(first.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(retry.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertNotIn('Idempotent-Replayed', retry)
+
+        # A bad token is a 4xx too, and mustn't take the key from the real client
+        bad_token_client = APIClient()
+        bad_token_client.credentials(HTTP_AUTHORIZATION='Token not-a-token')
+        response = bad_token_client.post(self.bulk_url, self.orders, format='json', HTTP_IDEMPOTENCY_KEY='key-2')
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+        response = bad_token_client.post(self.bulk_url, self.orders, format='json', HTTP_IDEMPOTENCY_KEY='key-2')
+        self.assertNotIn('Idempotent-Replayed', response)
+
+    def test_retry_gets_the_stored_headers(self):
+        first = self.authorized_client.post(self.bulk_url, self.orders, format='json', HTTP_IDEMPOTENCY_KEY='key-1')
+        retry = self.authorized_client.post(self.bulk_url, self.orders, format='json', HTTP_IDEMPOTENCY_KEY='key-1')
+
+        for header in ('Content-Type', 'Allow', 'Vary', 'X-Frame-Options'):
+            self.assertEqual(retry[header], first[header], header)
+
+    @override_settings(IDEMPOTENCY_CACHE='default')
+    def test_per_process_cache_is_refused(self):
+        with self.assertRaises(ImproperlyConfigured):
+            IdempotencyKeyMiddleware()
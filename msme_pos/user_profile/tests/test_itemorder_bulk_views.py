@@ -0,0 +1,88 @@
+from django.test import TestCase
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from user_profile.models import UserProfile
+from menu_item.models import MenuItem
+from item_order.models import ItemOrder
+
+
+class ItemOrderBulkCreateTestCase(TestCase):
+    def setUp(self):
+        self.user_1 = UserProfile.objects.create_user(
+            email='business1@email.com',
+            business_name='business1',
+            identifier='street1',
+            owner_surname='test1',
+            owner_given_name='test1',
+            password='password'
+        )
+
+        self.user_2 = UserProfile.objects.create_user(
+            email='business2@email.com',
+            business_name='business2',
+            identifier='street2',
+            owner_surname='test2',
+            owner_given_name='test2',
+            password='password'
+        )
+
+        self.user_1_menu_item_1 = MenuItem.objects.create(
+            name='user 1 menu item 1', description='description', price=80, user_profile=self.user_1
+        )
+        self.user_1_menu_item_2 = MenuItem.objects.create(
+            name='user 1 menu item 2', description='description', price=80, user_profile=self.user_1
+        )
+        self.user_2_menu_item_1 = MenuItem.objects.create(
+            name='user 2 menu item 1', description='description', price=80, user_profile=self.user_2
+        )
+
+        self.authorized_client = APIClient()
+        self.authorized_client.credentials(HTTP_AUTHORIZATION='Token ' + Token.objects.create(user=self.user_1).key)
+
+        self.unauthorized_client = APIClient()
+
+        self.bulk_url = reverse(
+            'item_orders:item_order_bulk_create',
+            kwargs={'full_business_name': self.user_1.full_business_name}
+        )
+
+    def test_bulk_create_orders(self):
+        """ Test that every row of a valid batch is created """
+
+        response = self.authorized_client.post(self.bulk_url, [
+            {'menu_item': self.user_1_menu_item_1.url_param_name, 'quantity': 1, 'additional_notes': '111'},
+            {'menu_item': self.user_1_menu_item_1.url_param_name, 'quantity': 2},
+            {'menu_item': self.user_1_menu_item_2.url_param_name, 'quantity': 3},
+        ], format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.json().get('created'), 3)
+        self.assertEqual(ItemOrder.objects.filter(menu_item=self.user_1_menu_item_1).count(), 2)
+        self.assertEqual(ItemOrder.objects.filter(menu_item=self.user_1_menu_item_2).count(), 1)
+
+    def test_bulk_create_reports_invalid_rows(self):
+        """ Test that invalid rows and other users' menu items are reported per row """
+
+        response = self.authorized_client.post(self.bulk_url, [
+            {'menu_item': self.user_1_menu_item_1.url_param_name, 'quantity': 1},
+            {'menu_item': self.user_1_menu_item_1.url_param_name, 'quantity': 0},
+            {'menu_item': self.user_2_menu_item_1.url_param_name, 'quantity': 1},
+        ], format='json')
+
+        results = response.json().get('results')
+
+        self.assertEqual(response.status_code, status.HTTP_207_MULTI_STATUS)
+        self.assertEqual([result.get('status') for result in results], [201, 400, 400])
+        self.assertEqual(ItemOrder.objects.count(), 1)
+        self.assertFalse(ItemOrder.objects.filter(menu_item=self.user_2_menu_item_1).exists())
+
+    def test_bulk_create_requires_list_and_token(self):
+        response = self.authorized_client.post(self.bulk_url, {'quantity': 1}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+        response = self.unauthorized_client.post(self.bulk_url, [], format='json')
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
@@ -0,0 +1,147 @@
+import csv
+import datetime
+import io
+import json
+from unittest import mock
+
+from django.db.models.query import QuerySet
+from django.test import (
+    TestCase,
+    override_settings
+)
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from rest_framework import status
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from msme_pos import db_routers
+from msme_pos.db_routers import PrimaryReplicaRouter
+
+from user_profile.models import UserProfile
+from menu_item.models import MenuItem
+from item_order.models import ItemOrder
+from item_order import exports
+
+
+class ItemOrderExportTestCase(TestCase):
+    def setUp(self):
+        self.user_1 = UserProfile.objects.create_user(
+            email='business1@email.com',
+            business_name='business1',
+            identifier='street1',
+            owner_surname='test1',
+            owner_given_name='test1',
+            password='password'
+        )
+
+        self.user_2 = UserProfile.objects.create_user(
+            email='business2@email.com',
+            business_name='business2',
+            identifier='street2',
+            owner_surname='test2',
+            owner_given_name='test2',
+            password='password'
+        )
+
+        self.coffee = MenuItem.objects.create(
+            name='coffee', description='description', price=80, user_profile=self.user_1
+        )
+        self.tea = MenuItem.objects.create(
+            name='tea', description='description', price=60, user_profile=self.user_1
+        )
+        other_business_item = MenuItem.objects.create(
+            name='espresso', description='description', price=80, user_profile=self.user_2
+        )
+
+        for day, menu_item, quantity in ((27, self.coffee, 1), (28, self.tea, 2), (29, self.coffee, 3)):
+            ItemOrder.objects.create(quantity=quantity, menu_item=menu_item, additional_notes='day {}'.format(day))
+            ItemOrder.objects.filter(quantity=quantity).update(
+                ordered_on=timezone.make_aware(datetime.datetime(2017, 8, day, 12))
+            )
+
+        ItemOrder.objects.create(quantity=9, menu_item=other_business_item)
+
+        self.authorized_client = APIClient()
+        self.authorized_client.credentials(HTTP_AUTHORIZATION='Token ' + Token.objects.create(user=self.user_1).key)
+
+    def export_url(self, export_format):
+        return reverse(
+            'item_orders:item_order_export',
+            kwargs={'full_business_name': self.user_1.full_business_name, 'export_format': export_format}
+        )
+
+    def export(self, export_format, query=''):
+        response = self.authorized_client.get(self.export_url(export_format) + query)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response.streaming)
+
+        return response, b''.join(response.streaming_content).decode('utf-8')
+
+    def test_csv_export(self):
+        response, content = self.export('csv')
+
+        self.assertEqual(response['Content-Type'], 'text/csv')
+        self.assertIn('business1-street1-orders.csv', response['Content-Disposition'])
+
+        rows = list(csv.reader(io.StringIO(content)))
+
+        self.assertEqual(rows[0], list(exports.EXPORT_COLUMNS))
+        self.assertEqual(
+            [(row[2], row[3], row[4], row[6]) for row in rows[1:]],
+            [('coffee', '1', '80.00', 'day 27'), ('tea', '2', '60.00', 'day 28'), ('coffee', '3', '80.00', 'day 29')]
+        )
+
+    def test_ndjson_export(self):
+        response, content = self.export('ndjson')
+
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+
+        rows = [json.loads(line) for line in content.splitlines()]
+
+        self.assertEqual([row['quantity'] for row in rows], [1, 2, 3])
+        self.assertEqual(rows[0]['menu_item'], self.coffee.id)
+        self.assertEqual(rows[0]['menu_item_name'], 'coffee')
+        self.assertEqual(rows[0]['price'], '80.00')
+        self.assertEqual(parse_datetime(rows[0]['ordered_on']), timezone.make_aware(datetime.datetime(2017, 8, 27, 12)))
+
+    def test_export_is_narrowed_by_date_and_menu_item(self):
+        _, content = self.export('ndjson', '?from=2017-08-28&to=2017-08-29')
+        self.assertEqual([json.loads(line)['quantity'] for line in content.splitlines()], [2, 3])
+
+        _, content = self.export('ndjson', '?from=2017-08-28&menu_item=' + self.coffee.url_param_name)
+        self.assertEqual([json.loads(line)['quantity'] for line in content.splitlines()], [3])
+
+        response = self.authorized_client.get(self.export_url('csv') + '?from=28-08-2017')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_export_streams_rows_without_loading_the_queryset(self):
+        with mock.patch.object(exports, 'ROWS_PER_CHUNK', 1):
+            response = self.authorized_client.get(self.export_url('ndjson'))
+
+            # Loading the whole queryset goes through _fetch_all, iterator() doesn't
+            with mock.patch.object(QuerySet, '_fetch_all', side_effect=AssertionError('queryset was loaded')):
+                chunks = list(response.streaming_content)
+
+        self.assertEqual(len(chunks), 3)
+
+    @override_settings(DATABASE_REPLICAS=['replica'])
+    def test_export_reads_from_the_database_chosen_for_the_request(self):
+        exported = []
+
+        def capture(item_orders):
+            exported.append(item_orders)
+            return iter([])
+
+        def db_for_read(router, model, **hints):
+            return 'replica' if model is ItemOrder and getattr(db_routers.state, 'use_replica', False) else 'default'
+
+        with mock.patch.object(PrimaryReplicaRouter, 'db_for_read', db_for_read), \
+                mock.patch.dict(exports.EXPORT_FORMATS, {'csv': (capture, 'text/csv')}):
+            self.authorized_client.get(self.export_url('csv'))
+
+        # The middleware stopped routing to the replica once the view returned
+        self.assertFalse(db_routers.state.use_replica)
+        self.assertEqual(exported[0].db, 'replica')
@@ -0,0 +1,108 @@
+import datetime
+
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from rest_framework import status
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from user_profile.models import UserProfile
+from menu_item.models import MenuItem
+from item_order.models import ItemOrder
+from item_order.ingest import insert_orders
+
+
+class ItemOrderListPaginationTestCase(TestCase):
+    def setUp(self):
+        self.user = UserProfile.objects.create_user(
+            email='business@email.com',
+            business_name='business',
+            identifier='street',
+            owner_surname='test',
+            owner_given_name='test',
+            password='password'
+        )
+
+        self.menu_item = MenuItem.objects.create(
+            name='menu item', description='description', price=80, user_profile=self.user
+        )
+
+        self.orders = [
+            ItemOrder.objects.create(quantity=quantity, menu_item=self.menu_item)
+            for quantity in range(1, 9)
+        ]
+
+        self.authorized_client = APIClient()
+        self.authorized_client.credentials(HTTP_AUTHORIZATION='Token ' + Token.objects.create(user=self.user).key)
+
+        self.list_url = reverse(
+            'item_orders:item_order_list',
+            kwargs={'full_business_name': self.user.full_business_name}
+        )
+
+    def walk(self, url):
+        quantities = []
+
+        while url:
+            response = self.authorized_client.get(url, format='json')
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+            quantities.append([order['quantity'] for order in response.json()['results']])
+            url = response.json()['next']
+
+        return quantities, response
+
+    def test_walks_whole_history_newest_first(self):
+        pages, last_response = self.walk(self.list_url + '?page_size=3')
+
+        self.assertEqual(pages, [[8, 7, 6], [5, 4, 3], [2, 1]])
+
+        previous_page = self.authorized_client.get(last_response.json()['previous'], format='json').json()
+        self.assertEqual([order['quantity'] for order in previous_page['results']], [5, 4, 3])
+
+    def test_orders_with_same_timestamp_are_not_skipped(self):
+        ItemOrder.objects.all().update(ordered_on=timezone.now())
+
+        pages, _ = self.walk(self.list_url + '?page_size=3')
+
+        self.assertEqual(pages, [[8, 7, 6], [5, 4, 3], [2, 1]])
+
+    def test_invalid_cursor(self):
+        response = self.authorized_client.get(self.list_url + '?cursor=garbage', format='json')
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_filters_by_date_range(self):
+        ItemOrder.objects.filter(quantity__lte=3).update(ordered_on=timezone.make_aware(datetime.datetime(2017, 8, 27, 23, 59)))
+        ItemOrder.objects.filter(quantity__gt=3).update(ordered_on=timezone.make_aware(datetime.datetime(2017, 8, 28, 0, 0)))
+
+        pages, _ = self.walk(self.list_url + '?date=2017-08-28')
+        self.assertEqual(pages, [[8, 7, 6, 5, 4]])
+
+        pages, _ = self.walk(self.list_url + '?from=2017-08-01&to=2017-08-27')
+        self.assertEqual(pages, [[3, 2, 1]])
+
+        response = self.authorized_client.get(self.list_url + '?date=28-08-2017', format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_pages_are_read_off_the_business_without_a_join(self):
+        with CaptureQueriesContext(connection) as queries:
+            self.walk(self.list_url + '?page_size=3')
+
+        page_queries = [query['sql'] for query in queries if 'FROM "item_order_itemorder"' in query['sql']]
+
+        self.assertEqual(len(page_queries), 3)
+
+        for sql in page_queries:
+            self.assertIn('"item_order_itemorder"."user_profile_id" =', sql)
+            self.assertNotIn('JOIN', sql)
+
+    def test_bulk_inserted_orders_belong_to_their_menu_items_business(self):
+        insert_orders([ItemOrder(quantity=9, menu_item_id=self.menu_item.id)])
+
+        pages, _ = self.walk(self.list_url + '?page_size=3')
+
+        self.assertEqual(pages[0], [9, 8, 7])
@@ -0,0 +1,108 @@
+import uuid
+from unittest import mock
+
+from django.test import TestCase
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from user_profile.models import UserProfile
+from menu_item.models import MenuItem
+from item_order.models import (
+    ClientUUID,
+    ItemOrder
+)
+
+
+class ItemOrderSyncTestCase(TestCase):
+    def setUp(self):
+        self.user = UserProfile.objects.create_user(
+            email='business@email.com',
+            business_name='business',
+            identifier='street',
+            owner_surname='test',
+            owner_given_name='test',
+            password='password'
+        )
+
+        self.menu_item = MenuItem.objects.create(
+            name='menu item', description='description', price=80, user_profile=self.user
+        )
+
+        self.authorized_client = APIClient()
+        self.authorized_client.credentials(HTTP_AUTHORIZATION='Token ' + Token.objects.create(user=self.user).key)
+
+        self.sync_url = reverse(
+            'item_orders:item_order_sync',
+            kwargs={'full_business_name': self.user.full_business_name}
+        )
+
+    def make_row(self, **kwargs):
+        row = {
+            'client_uuid': str(uuid.uuid4()),
+            'ordered_on': '2017-09-04T12:30:00Z',
+            'menu_item': self.menu_item.url_param_name,
+            'quantity': 1,
+        }
+        row.update(kwargs)
+
+        return row
+
+    def test_sync_keeps_terminal_timestamps(self):
+        response = self.authorized_client.post(self.sync_url, [self.make_row()], format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.json()['created'], 1)
+        self.assertEqual(ItemOrder.objects.get().ordered_on.isoformat(), '2017-09-04T12:30:00+00:00')
+
+    def test_replayed_orders_are_not_duplicated(self):
+        rows = [self.make_row(), self.make_row(quantity=2)]
+
+        self.authorized_client.post(self.sync_url, rows[:1], format='json')
+        response = self.authorized_client.post(self.sync_url, rows + rows[1:], format='json')
+
+        self.assertEqual(response.json()['created'], 1)
+        self.assertEqual(response.json()['duplicates'], 2)
+        self.assertEqual(response.json()['rejected'], 0)
+        self.assertEqual(ItemOrder.objects.count(), 2)
+
+        self.menu_item.refresh_from_db()
+        self.assertEqual((self.menu_item.order_count, self.menu_item.total_quantity), (2, 3))
+
+    def test_racing_replay_with_another_ordered_on_is_a_duplicate(self):
+        row = self.make_row()
+        self.authorized_client.post(self.sync_url, [row], format='json')
+
+        lookups = []
+        lookup = ClientUUID.objects.filter
+
+        def stale_first_lookup(*args, **kwargs):
+            lookups.append(kwargs)
+            queryset = lookup(*args, **kwargs)
+
+            # As if the first replay committed right after this one looked
+            return queryset.none() if len(lookups) == 1 else queryset
+
+        with mock.patch.object(ClientUUID.objects, 'filter', side_effect=stale_first_lookup):
+            response = self.authorized_client.post(
+                self.sync_url, [dict(row, ordered_on='2017-09-04T12:31:00Z')], format='json'
+            )
+
+        self.assertEqual(len(lookups), 2)
+        self.assertEqual((response.json()['created'], response.json()['duplicates']), (0, 1))
+        self.assertEqual(ItemOrder.objects.count(), 1)
+
+    def test_invalid_rows_are_rejected(self):
+        response = self.authorized_client.post(self.sync_url, [
+            self.make_row(client_uuid='not-a-uuid'),
+            self.make_row(menu_item='unknown-item'),
+        ], format='json')
+
+        self.assertEqual(response.json()['rejected'], 2)
+        self.assertEqual(
+            [result['status'] for result in response.json()['results']],
+            ['rejected', 'rejected']
+        )
+        self.assertFalse(ItemOrder.objects.exists())
@@ -0,0 +1,116 @@
+import threading
+import time
+
+from django.contrib.auth.hashers import (
+    PBKDF2PasswordHasher,
+    check_password
+)
+from django.test import (
+    TestCase,
+    TransactionTestCase
+)
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from user_profile import hashing
+from user_profile.hashing import PasswordHashPool
+from user_profile.models import UserProfile
+
+
+def create_user(password='password'):
+    return UserProfile.objects.create_user(
+        email='business@email.com',
+        business_name='business',
+        identifier='street',
+        owner_surname='test',
+        owner_given_name='test',
+        password=password
+    )
+
+
+class LoginHashingTestCase(TestCase):
+    def setUp(self):
+        self.user = create_user()
+        self.client = APIClient()
+        self.login_url = reverse('profiles:login-list')
+
+    def tearDown(self):
+        hashing.pool = None
+
+    def test_login_returns_token(self):
+        response = self.client.post(self.login_url, {'username': 'business@email.com', 'password': 'password'})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data, {'token': Token.objects.get(user=self.user).key})
+
+    def test_wrong_password_and_unknown_email(self):
+        for username, password in [('business@email.com', 'wrong'), ('nobody@email.com', 'password')]:
+            response = self.client.post(self.login_url, {'username': username, 'password': password})
+
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+            self.assertEqual(response.data, {'non_field_errors': ['Unable to log in with provided credentials.']})
+
+    def test_inactive_user(self):
+        self.user.is_active = False
+        self.user.save()
+
+        response = self.client.post(self.login_url, {'username': 'business@email.com', 'password': 'password'})
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_missing_password(self):
+        response = self.client.post(self.login_url, {'username': 'business@email.com'})
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('password', response.data)
+
+    def test_overloaded_pool_turns_logins_away(self):
+        hashing.pool = PasswordHashPool(workers=1, max_queue=0, retry_after=3)
+        release = threading.Event()
+        hashing.pool.submit(release.wait)
+
+        try:
+            response = self.client.post(self.login_url, {'username': 'business@email.com', 'password': 'password'})
+        finally:
+            release.set()
+
+        self.assertEqual(response.status_code, status.HTTP_503_SERVICE_UNAVAILABLE)
+        self.assertEqual(response['Retry-After'], '3')
+
+    def test_slots_are_given_back(self):
+        hashing.pool = PasswordHashPool(workers=1, max_queue=0)
+
+        for i in range(3):
+            response = self.client.post(self.login_url, {'username': 'business@email.com', 'password': 'password'})
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+
+class RehashTestCase(TransactionTestCase):
+    def tearDown(self):
+        hashing.pool = None
+
+    def test_stale_hash_is_replaced_in_the_background(self):
+        user = create_user()
+        stale = PBKDF2PasswordHasher().encode('password', 'salt', iterations=1000)
+        UserProfile.objects.filter(pk=user.pk).update(password=stale)
+
+        response = APIClient().post(reverse('profiles:login-list'), {
+            'username': 'business@email.com', 'password': 'password'
+        })
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        for i in range(100):
+            user.refresh_from_db()
+
+            if user.password != stale:
+                break
+
+            time.sleep(0.05)
+
+        self.assertNotEqual(user.password, stale)
+        self.assertFalse(hashing.must_update(user.password))
+        self.assertTrue(check_password('password', user.password))
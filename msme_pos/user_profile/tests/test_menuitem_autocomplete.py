@@ -0,0 +1,127 @@
+from unittest import mock
+
+from django.test import TransactionTestCase
+from django.test.utils import CaptureQueriesContext
+from django.db import (
+    connection,
+    transaction
+)
+from django.urls import reverse
+
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from user_profile.models import UserProfile
+from menu_item.models import MenuItem
+from menu_item import autocomplete
+
+
+class MenuItemAutocompleteTestCase(TransactionTestCase):
+    """ A TransactionTestCase, as the indexes follow saves once they are
+    committed """
+
+    def setUp(self):
+        autocomplete.indexes.clear()
+
+        self.user = self.create_user('business')
+        self.other_user = self.create_user('other')
+
+        for name in ('Iced Coffee', 'Coffee Jelly', 'Cookie', 'Hot Chocolate'):
+            MenuItem.objects.create(name=name, description='description', price=80, user_profile=self.user)
+
+        MenuItem.objects.create(name='Coffee Float', description='description', price=90, user_profile=self.other_user)
+
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + Token.objects.create(user=self.user).key)
+
+        self.autocomplete_url = reverse(
+            'menu_items:menu_items_autocomplete',
+            kwargs={'full_business_name': self.user.full_business_name}
+        )
+
+    def create_user(self, business_name):
+        return UserProfile.objects.create_user(
+            email=business_name + '@email.com',
+            business_name=business_name,
+            identifier='street',
+            owner_surname='test',
+            owner_given_name='test',
+            password='password'
+        )
+
+    def names(self, query, **params):
+        params['q'] = query
+        response = self.client.get(self.autocomplete_url, params)
+        self.assertEqual(response.status_code, 200)
+
+        return [result['name'] for result in response.json()['results']]
+
+    def test_names_starting_with_the_prefix_come_first(self):
+        self.assertEqual(self.names('co'), ['Coffee Jelly', 'Cookie', 'Iced Coffee'])
+        self.assertEqual(self.names('choc'), ['Hot Chocolate'])
+        self.assertEqual(self.names('COFF'), ['Coffee Jelly', 'Iced Coffee'])
+        self.assertEqual(self.names('coffee j'), ['Coffee Jelly'])
+        self.assertEqual(self.names('tea'), [])
+
+    def test_limit(self):
+        self.assertEqual(self.names('co', limit=2), ['Coffee Jelly', 'Cookie'])
+
+        response = self.client.get(self.autocomplete_url, {'q': 'co', 'limit': 'many'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_lookups_skip_the_database_once_built(self):
+        self.names('co')
+
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(self.names('cook'), ['Cookie'])
+
+        self.assertEqual(len(queries), 0)
+
+    def test_index_follows_saves_and_deletes(self):
+        self.names('co')
+
+        cookie = MenuItem.objects.get(name='Cookie')
+        cookie.name = 'Brownie'
+        cookie.save()
+
+        MenuItem.objects.create(name='Cold Brew', description='description', price=120, user_profile=self.user)
+        MenuItem.objects.get(name='Hot Chocolate').delete()
+
+        self.assertEqual(self.names('co'), ['Coffee Jelly', 'Cold Brew', 'Iced Coffee'])
+        self.assertEqual(self.names('b'), ['Brownie', 'Cold Brew'])
+
+    def test_moved_menu_items_leave_their_old_index(self):
+        self.names('co')
+
+        coffee = MenuItem.objects.get(name='Iced Coffee')
+        coffee.user_profile = self.other_user
+        coffee.save()
+
+        self.assertEqual(self.names('coffee'), ['Coffee Jelly'])
+
+    def test_rolled_back_changes_stay_out_of_the_index(self):
+        self.names('co')
+
+        with self.assertRaises(RuntimeError), transaction.atomic():
+            MenuItem.objects.create(name='Cold Brew', description='description', price=120, user_profile=self.user)
+            MenuItem.objects.get(name='Cookie').delete()
+            raise RuntimeError
+
+        self.assertEqual(self.names('co'), ['Coffee Jelly', 'Cookie', 'Iced Coffee'])
+
+    def test_builds_that_missed_a_change_are_not_kept(self):
+        build = autocomplete.PrefixIndex
+
+        def build_then_change(user_profile_id, menu_items):
+            index = build(user_profile_id, menu_items)
+
+            # Committed after the build read the menu items
+            MenuItem.objects.create(name='Cold Brew', description='description', price=120, user_profile=self.user)
+
+            return index
+
+        with mock.patch.object(autocomplete, 'PrefixIndex', side_effect=build_then_change):
+            self.assertEqual(self.names('cold'), [])
+
+        self.assertEqual(self.names('cold'), ['Cold Brew'])
+        self.assertEqual(autocomplete.pending_builds, {})
@@ -0,0 +1,193 @@
+import json
+import os
+import shutil
+import tempfile
+from unittest import mock
+
+from django.test import (
+    TestCase,
+    override_settings
+)
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from msme_pos.metrics import (
+    MmapedValues,
+    get_registry
+)
+
+from user_profile.models import UserProfile
+from menu_item.models import MenuItem
+
+
+# A pid no process has, as far as the tests are concerned
+EXITED_PID = 99999999
+
+
+class MetricsTestCase(TestCase):
+    def setUp(self):
+        self.metrics_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.metrics_dir)
+
+        settings_override = override_settings(METRICS_DIR=self.metrics_dir, METRICS_TOKEN='scrape-token')
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+        self.user = UserProfile.objects.create_user(
+            email='business@email.com',
+            business_name='business',
+            identifier='street',
+            owner_surname='test',
+            owner_given_name='test',
+            password='password'
+        )
+
+        self.menu_item = MenuItem.objects.create(
+            name='menu item', description='description', price=80, user_profile=self.user
+        )
+
+        self.authorized_client = APIClient()
+        self.authorized_client.credentials(HTTP_AUTHORIZATION='Token ' + Token.objects.create(user=self.user).key)
+
+        self.detail_url = reverse('profiles:profiles_detail', kwargs={
+            'full_business_name': self.user.full_business_name
+        })
+
+    def scrape(self):
+        response = self.client.get(reverse('metrics'), HTTP_AUTHORIZATION='Bearer scrape-token')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response['Content-Type'].startswith('text/plain; version=0.0.4'))
+
+        return response.content.decode('utf-8').splitlines()
+
+    def test_requests_by_view(self):
+        self.authorized_client.get(self.detail_url)
+        self.authorized_client.get(self.detail_url)
+        self.client.get(self.detail_url)
+
+        lines = self.scrape()
+
+        self.assertIn(
+            'msme_pos_http_requests_total{method="GET",status="200",view="profiles:profiles_detail"} 2', lines
+        )
+        self.assertIn(
+            'msme_pos_http_requests_total{method="GET",status="401",view="profiles:profiles_detail"} 1', lines
+        )
+        self.assertIn(
+            'msme_pos_http_request_duration_seconds_bucket{view="profiles:profiles_detail",le="+Inf"} 3', lines
+        )
+        self.assertIn('msme_pos_http_request_duration_seconds_count{view="profiles:profiles_detail"} 3', lines)
+
+    def test_buckets_are_cumulative(self):
+        registry = get_registry()
+        registry.observe_request('menu_items:menu_items_detail', 'GET', 200, 0.003)
+        registry.observe_request('menu_items:menu_items_detail', 'GET', 200, 0.2)
+        registry.observe_request('menu_items:menu_items_detail', 'GET', 500, 20)
+
+        lines = self.scrape()
+
+        bucket = 'msme_pos_http_request_duration_seconds_bucket{{view="menu_items:menu_items_detail",le="{}"}} {}'
+        self.assertIn(bucket.format('0.005', 1), lines)
+        self.assertIn(bucket.format('0.1', 1), lines)
+        self.assertIn(bucket.format('0.25', 2), lines)
+        self.assertIn(bucket.format('10.0', 2), lines)
+        self.assertIn(bucket.format('+Inf', 3), lines)
+        self.assertIn('msme_pos_http_errors_total{view="menu_items:menu_items_detail"} 1', lines)
+
+    def test_adds_up_other_processes(self):
+        self.authorized_client.get(self.detail_url)
+
+        # Another worker's file
+        other = MmapedValues(self.metrics_dir + '/metrics-1.db')
+        other.inc(json.dumps(['msme_pos_http_requests_total', {
+            'method': 'GET', 'status': '200', 'view': 'profiles:profiles_detail'
+        }], sort_keys=True), 4)
+
+        self.assertIn(
+            'msme_pos_http_requests_total{method="GET",status="200",view="profiles:profiles_detail"} 5', self.scrape()
+        )
+
+    def test_values_survive_reopening_and_growing(self):
+        path = self.metrics_dir + '/values.db'
+
+        with mock.patch.object(MmapedValues, 'initial_size', 64):
+            values = MmapedValues(path)
+
+        for i in range(5000):
+            values.inc('key {}'.format(i % 2000))
+
+        reopened = MmapedValues(path)
+        reopened.inc('key 0', 0.5)
+
+        self.assertEqual(dict(reopened.items())['key 0'], 3.5)
+        self.assertEqual(dict(reopened.items())['key 1999'], 2)
+        self.assertEqual(len(reopened.items()), 2000)
+
+    def test_only_staff_and_token_holders_can_scrape(self):
+        url = reverse('metrics')
+
+        # Local addresses get nothing for free
+        self.assertEqual(self.client.get(url, REMOTE_ADDR='127.0.0.1').status_code, status.HTTP_403_FORBIDDEN)
+        self.assertEqual(
+            self.client.get(url, HTTP_AUTHORIZATION='Bearer wrong-token').status_code,
+            status.HTTP_403_FORBIDDEN
+        )
+        self.assertEqual(
+            self.client.get(url, REMOTE_ADDR='10.0.0.5', HTTP_AUTHORIZATION='Bearer scrape-token').status_code,
+            status.HTTP_200_OK
+        )
+
+        with override_settings(METRICS_ALLOWED_IPS=['10.0.0.5']):
+            self.assertEqual(
+                self.client.get(url, REMOTE_ADDR='10.0.0.6', HTTP_AUTHORIZATION='Bearer scrape-token').status_code,
+                status.HTTP_403_FORBIDDEN
+            )
+            self.assertEqual(self.client.get(url, REMOTE_ADDR='10.0.0.5').status_code, status.HTTP_403_FORBIDDEN)
+
+        with override_settings(METRICS_TOKEN=None):
+            self.assertEqual(
+                self.client.get(url, HTTP_AUTHORIZATION='Bearer scrape-token').status_code,
+                status.HTTP_403_FORBIDDEN
+            )
+
+        self.client.force_login(self.user)
+        self.assertEqual(self.client.get(url, REMOTE_ADDR='10.0.0.5').status_code, status.HTTP_403_FORBIDDEN)
+
+        self.user.is_staff = True
+        self.user.save()
+        self.assertEqual(self.client.get(url, REMOTE_ADDR='10.0.0.5').status_code, status.HTTP_200_OK)
+
+    def test_exited_workers_counters_are_merged_and_their_gauges_dropped(self):
+        exited_path = '{}/metrics-{}.db'.format(self.metrics_dir, EXITED_PID)
+        exited = MmapedValues(exited_path)
+        exited.inc(json.dumps(['msme_pos_http_requests_total', {
+            'method': 'GET', 'status': '200', 'view': 'profiles:profiles_detail'
+        }], sort_keys=True), 4)
+        exited.set(json.dumps(['msme_pos_db_pool_in_use', {'alias': 'default', 'database': 'exited_db'}], sort_keys=True), 7)
+        exited.close()
+
+        with mock.patch('msme_pos.metrics.process_is_alive', side_effect=lambda pid: pid != EXITED_PID):
+            for scrape in range(2):
+                lines = self.scrape()
+
+                self.assertIn(
+                    'msme_pos_http_requests_total{method="GET",status="200",view="profiles:profiles_detail"} 4', lines
+                )
+                self.assertFalse(any('exited_db' in line for line in lines))
+
+        self.assertFalse(os.path.exists(exited_path))
+
+    def test_pool_gauges_are_added_up_over_workers(self):
+        labels = {'alias': 'default', 'database': 'msme_pos_db'}
+
+        get_registry().set('msme_pos_db_pool_in_use', labels, 3)
+
+        # Another worker's file
+        other = MmapedValues(self.metrics_dir + '/metrics-1.db')
+        other.set(json.dumps(['msme_pos_db_pool_in_use', labels], sort_keys=True), 2)
+
+        self.assertIn('msme_pos_db_pool_in_use{alias="default",database="msme_pos_db"} 5', self.scrape())
@@ -0,0 +1,177 @@
+import os
+import shutil
+import tempfile
+import time
+from unittest import mock
+
+from django.db import connection
+from django.test import (
+    TestCase,
+    TransactionTestCase,
+    override_settings
+)
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from user_profile.models import UserProfile
+from menu_item.models import MenuItem
+from item_order.models import ItemOrder
+from item_order.buffer import OrderWriteBuffer
+from item_order.ingest import insert_new_orders
+
+
+class OrderWriteBufferMixin(object):
+    def setUp(self):
+        self.journal_dir = tempfile.mkdtemp()
+
+        self.user = UserProfile.objects.create_user(
+            email='business@email.com',
+            business_name='business',
+            identifier='street',
+            owner_surname='test',
+            owner_given_name='test',
+            password='password'
+        )
+
+        self.menu_item = MenuItem.objects.create(
+            name='menu item', description='description', price=80, user_profile=self.user
+        )
+
+    def tearDown(self):
+        shutil.rmtree(self.journal_dir)
+
+
+class OrderWriteBufferTestCase(OrderWriteBufferMixin, TestCase):
+    def test_flush_writes_pending_orders_and_clears_journal(self):
+        buffer = OrderWriteBuffer(self.journal_dir, fsync=False)
+
+        accepted = [buffer.add(self.menu_item, quantity) for quantity in (1, 2, 3)]
+
+        self.assertFalse(ItemOrder.objects.exists())
+        self.assertEqual(len(os.listdir(self.journal_dir)), 1)
+
+        buffer.flush()
+
+        self.assertEqual(
+            set(ItemOrder.objects.values_list('client_uuid', flat=True)),
+            set(item_order.client_uuid for item_order in accepted)
+        )
+        self.assertEqual(os.listdir(self.journal_dir), [])
+
+        self.menu_item.refresh_from_db()
+        self.assertEqual((self.menu_item.order_count, self.menu_item.total_quantity), (3, 6))
+
+    def test_journal_is_replayed_once(self):
+        crashed = OrderWriteBuffer(self.journal_dir, fsync=False)
+        crashed.add(self.menu_item, 1)
+        crashed.add(self.menu_item, 2)
+        crashed.segment.close()
+
+        # Pretend one order made it to the database before the crash
+        insert_new_orders([ItemOrder(
+            client_uuid=crashed.pending[0].client_uuid,
+            quantity=1,
+            menu_item=self.menu_item
+        )])
+
+        OrderWriteBuffer(self.journal_dir, fsync=False).replay_journal()
+
+        self.assertEqual(ItemOrder.objects.count(), 2)
+        self.assertEqual(os.listdir(self.journal_dir), [])
+
+    def test_orders_that_cant_be_stored_are_dropped_alone(self):
+        buffer = OrderWriteBuffer(self.journal_dir, fsync=False)
+
+        buffer.add(self.menu_item, 1)
+        buffer.add(self.menu_item, 'not a number')
+        buffer.add(self.menu_item, 3)
+
+        with self.assertLogs('item_order.buffer', 'ERROR'):
+            buffer.flush()
+
+        self.assertEqual(sorted(ItemOrder.objects.values_list('quantity', flat=True)), [1, 3])
+        self.assertEqual(buffer.pending, [])
+        self.assertEqual(os.listdir(self.journal_dir), [])
+
+    def test_replay_loads_menu_items_with_one_query(self):
+        crashed = OrderWriteBuffer(self.journal_dir, fsync=False)
+
+        for quantity in (1, 2, 3):
+            crashed.add(self.menu_item, quantity)
+
+        crashed.segment.close()
+
+        with CaptureQueriesContext(connection) as queries:
+            OrderWriteBuffer(self.journal_dir, fsync=False).replay_journal()
+
+        menu_item_reads = [query for query in queries if query['sql'].startswith('SELECT') and 'FROM "menu_item_menuitem"' in query['sql']]
+
+        self.assertEqual(len(menu_item_reads), 1)
+        self.assertEqual(ItemOrder.objects.count(), 3)
+
+    def test_segment_claimed_by_another_process_is_skipped(self):
+        crashed = OrderWriteBuffer(self.journal_dir, fsync=False)
+        crashed.add(self.menu_item, 1)
+        crashed.segment.close()
+
+        os.rename(crashed.segment.name, os.path.join(self.journal_dir, 'orders-99999999-1.jsonl'))
+
+        with mock.patch('item_order.buffer.os.rename', side_effect=FileNotFoundError):
+            OrderWriteBuffer(self.journal_dir, fsync=False).replay_journal()
+
+        self.assertFalse(ItemOrder.objects.exists())
+
+    def test_create_view_validates_before_accepting(self):
+        buffer = OrderWriteBuffer(self.journal_dir, fsync=False)
+
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION='Token ' + Token.objects.create(user=self.user).key)
+
+        url = reverse('item_orders:item_order_create', kwargs={
+            'full_business_name': self.user.full_business_name,
+            'menu_item_name': self.menu_item.url_param_name
+        })
+
+        with override_settings(ITEM_ORDER_WRITE_BEHIND=True), \
+                mock.patch('item_order.views.get_buffer', return_value=buffer):
+            invalid = client.post(url, {'quantity': 'two'}, format='json')
+            accepted = client.post(url, {'quantity': '2', 'additional_notes': 'no ice'}, format='json')
+
+        self.assertEqual(invalid.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(accepted.status_code, status.HTTP_202_ACCEPTED)
+        self.assertEqual(len(buffer.pending), 1)
+
+        buffer.flush()
+
+        item_order = ItemOrder.objects.get()
+        self.assertEqual(str(item_order.client_uuid), accepted.data['client_uuid'])
+        self.assertEqual((item_order.quantity, item_order.additional_notes), (2, 'no ice'))
+
+
+class OrderWriteBufferThreadTestCase(OrderWriteBufferMixin, TransactionTestCase):
+    def test_background_thread_flushes_batches(self):
+        buffer = OrderWriteBuffer(self.journal_dir, batch_size=2, flush_interval=0.05, fsync=False)
+        buffer.start()
+
+        try:
+            for quantity in (1, 2, 3):
+                buffer.add(self.menu_item, quantity)
+
+            deadline = time.monotonic() + 5
+
+            # A segment is removed once its orders are committed. Polling
+            # the table instead would race the thread's writes on SQLite
+            while os.listdir(self.journal_dir) and time.monotonic() < deadline:
+                time.sleep(0.05)
+
+            self.assertEqual(os.listdir(self.journal_dir), [])
+        finally:
+            buffer.stop()
+
+        self.assertEqual(sorted(ItemOrder.objects.values_list('quantity', flat=True)), [1, 2, 3])
+        self.assertEqual(os.listdir(self.journal_dir), [])
+        self.assertFalse(buffer.thread.is_alive())
@@ -0,0 +1,160 @@
+import datetime
+
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import (
+    connection,
+    IntegrityError,
+    transaction
+)
+from django.test import (
+    SimpleTestCase,
+    TestCase
+)
+from django.utils import timezone
+
+from user_profile.models import UserProfile
+from menu_item.models import MenuItem
+from item_order.models import ItemOrder
+from item_order.partitions import (
+    add_months,
+    bound,
+    check_partitioned,
+    create_partition,
+    drop_partition,
+    month_start,
+    monthly_partitions,
+    partition_month,
+    partition_name,
+    PartitioningUnavailable
+)
+
+
+class PartitionNamingTestCase(SimpleTestCase):
+    def test_month_arithmetic(self):
+        self.assertEqual(month_start(datetime.date(2017, 8, 31)), datetime.date(2017, 8, 1))
+        self.assertEqual(add_months(datetime.date(2017, 11, 1), 3), datetime.date(2018, 2, 1))
+        self.assertEqual(add_months(datetime.date(2018, 2, 1), -14), datetime.date(2016, 12, 1))
+        self.assertEqual(add_months(datetime.date(2018, 12, 1), 1), datetime.date(2019, 1, 1))
+
+    def test_names_round_trip(self):
+        month = datetime.date(2017, 9, 1)
+
+        self.assertEqual(partition_name(month), 'item_order_itemorder_y2017m09')
+        self.assertEqual(partition_month(partition_name(month)), month)
+
+    def test_other_tables_are_not_monthly_partitions(self):
+        self.assertIsNone(partition_month('item_order_itemorder_default'))
+        self.assertIsNone(partition_month('item_order_itemorder'))
+
+    def test_bounds_are_utc_midnight(self):
+        self.assertEqual(bound(datetime.date(2017, 9, 1)), '2017-09-01 00:00:00+00')
+
+
+class UnpartitionedDatabaseTestCase(TestCase):
+    """ Orders stay in one table on databases other than PostgreSQL 11 """
+
+    def setUp(self):
+        try:
+            check_partitioned()
+        except PartitioningUnavailable:
+            return
+
+        self.skipTest('Orders are partitioned on this database')
+
+    def test_check_partitioned_raises(self):
+        with self.assertRaises(PartitioningUnavailable):
+            check_partitioned()
+
+    def test_commands_refuse_to_run(self):
+        with self.assertRaises(CommandError):
+            call_command('create_order_partitions')
+
+
+class PartitionedDatabaseTestCase(TestCase):
+    """ Runs on PostgreSQL 11 or later, where migrate partitions the orders """
+
+    def setUp(self):
+        try:
+            check_partitioned()
+        except PartitioningUnavailable:
+            self.skipTest('Orders are not partitioned on this database')
+
+        self.user = UserProfile.objects.create_user(
+            email='business@email.com',
+            business_name='business',
+            identifier='street',
+            owner_surname='test',
+            owner_given_name='test',
+            password='password'
+        )
+        self.menu_item = MenuItem.objects.create(
+            name='menu item', description='description', price=80, user_profile=self.user
+        )
+
+        # Older than the partitions migrate creates, so in the default one
+        self.month = datetime.date(2000, 1, 1)
+        self.ordered_on = datetime.datetime(2000, 1, 15, 12, tzinfo=timezone.utc)
+
+    def create_order(self, **kwargs):
+        return ItemOrder.objects.create(
+            menu_item=self.menu_item, quantity=1, ordered_on=self.ordered_on, **kwargs
+        )
+
+    def query(self, sql, params):
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
+
+            return [row[0] for row in cursor.fetchall()]
+
+    def test_created_partition_gets_the_keys_and_indexes(self):
+        item_order = self.create_order(client_uuid='8d2c1a4e-5b1f-4c2a-9a55-0e6b7c1d2f3a')
+
+        self.assertTrue(create_partition(self.month))
+        self.assertFalse(create_partition(self.month))
+
+        name = partition_name(self.month)
+
+        self.assertEqual(
+            self.query('SELECT tableoid::regclass::text FROM item_order_itemorder WHERE id = %s', [item_order.id]),
+            [name]
+        )
+        self.assertEqual(
+            self.query('SELECT pg_get_constraintdef(oid) FROM pg_constraint WHERE conrelid = %s::regclass ORDER BY 1', [name]),
+            [
+                'FOREIGN KEY (menu_item_id) REFERENCES menu_item_menuitem(id) DEFERRABLE INITIALLY DEFERRED',
+                'FOREIGN KEY (user_profile_id) REFERENCES user_profile_userprofile(id) DEFERRABLE INITIALLY DEFERRED',
+                'PRIMARY KEY (id, ordered_on)',
+                'UNIQUE (client_uuid, ordered_on)',
+            ]
+        )
+        self.assertEqual(
+            self.query("SELECT regexp_replace(indexdef, '.* USING ', '') FROM pg_indexes WHERE tablename = %s ORDER BY 1", [name]),
+            [
+                'btree (client_uuid, ordered_on)',
+                'btree (id, ordered_on)',
+                'btree (menu_item_id)',
+                'btree (menu_item_id, ordered_on, id)',
+                'btree (ordered_on, id)',
+                'btree (user_profile_id)',
+                'btree (user_profile_id, ordered_on, id)',
+            ]
+        )
+
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            self.create_order(client_uuid=item_order.client_uuid)
+
+    def test_dropping_a_partition_removes_its_orders(self):
+        self.create_order()
+        create_partition(self.month)
+
+        with transaction.atomic():
+            drop_partition(self.month)
+
+        self.assertNotIn(self.month, monthly_partitions())
+        self.assertFalse(ItemOrder.objects.exists())
+        self.assertEqual(self.query('SELECT to_regclass(%s)::text', [partition_name(self.month)]), [None])
+
+        # Later orders of the month go to the default partition
+        self.create_order()
+        self.assertEqual(ItemOrder.objects.count(), 1)
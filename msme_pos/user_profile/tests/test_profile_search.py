@@ -0,0 +1,105 @@
+from unittest import mock
+
+from django.test import TestCase
+from django.urls import reverse
+
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from user_profile.models import UserProfile
+from user_profile import search
+
+
+class ProfileSearchTestCase(TestCase):
+    def setUp(self):
+        # Each test starts from an index built from its own profiles
+        search.index = None
+
+        self.admin = UserProfile.objects.create_superuser(
+            email='admin@email.com', owner_surname='admin', owner_given_name='admin', password='password'
+        )
+
+        for business_name, identifier, city in (
+            ('kape', 'main', 'makati'),
+            ('kapetolyo', 'annex', 'quezon'),
+            ('bakery', 'north', 'makati'),
+        ):
+            UserProfile.objects.create_user(
+                email=business_name + '@email.com',
+                business_name=business_name,
+                identifier=identifier,
+                owner_surname='owner',
+                owner_given_name='test',
+                password='password',
+                city=city
+            )
+
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + Token.objects.create(user=self.admin).key)
+
+    def search_names(self, query):
+        response = self.client.get(reverse('profiles:profiles_list'), {'search': query})
+        self.assertEqual(response.status_code, 200)
+
+        return [profile['full_business_name'] for profile in response.json()['results']], response.json()['count']
+
+    def test_search_document_follows_the_fields(self):
+        profile = UserProfile.objects.get(business_name='bakery')
+        self.assertEqual(profile.search_document, 'bakery@email.com bakery north bakery-north owner test makati')
+
+        profile.city = 'Pasig'
+        profile.save(update_fields=['city'])
+
+        profile.refresh_from_db()
+        self.assertIn('pasig', profile.search_document)
+
+    def test_closest_match_comes_first(self):
+        self.assertEqual(self.search_names('kape'), (['kape-main', 'kapetolyo-annex'], 2))
+
+    def test_every_term_must_match(self):
+        self.assertEqual(self.search_names('KAPE makati'), (['kape-main'], 1))
+        self.assertEqual(self.search_names('kape nowhere'), ([], 0))
+
+    def test_short_terms(self):
+        self.assertEqual(self.search_names('qu'), (['kapetolyo-annex'], 1))
+
+    def test_index_follows_saves_and_deletes(self):
+        self.assertEqual(self.search_names('bakery'), (['bakery-north'], 1))
+
+        UserProfile.objects.get(business_name='bakery').delete()
+        UserProfile.objects.create_user(
+            email='panaderia@email.com', business_name='panaderia', identifier='south',
+            owner_surname='owner', owner_given_name='test', password='password', city='makati'
+        )
+
+        self.assertEqual(self.search_names('bakery'), ([], 0))
+        self.assertEqual(self.search_names('panaderia'), (['panaderia-south'], 1))
+
+    def test_saves_during_a_rebuild_are_kept(self):
+        profile = UserProfile.objects.get(business_name='bakery')
+        read = UserProfile.objects.values_list
+
+        def read_then_save(*fields):
+            rows = list(read(*fields))
+
+            # Lands after the rebuild read the table
+            profile.city = 'pasig'
+            profile.save(update_fields=['city'])
+
+            return rows
+
+        with mock.patch.object(UserProfile.objects, 'values_list', side_effect=read_then_save):
+            search.get_index().rebuild()
+
+        self.assertEqual(self.search_names('pasig'), (['bakery-north'], 1))
+
+    def test_results_are_paginated(self):
+        names, count = self.search_names('owner')
+
+        self.assertEqual(count, 3)
+        self.assertEqual(sorted(names), ['bakery-north', 'kape-main', 'kapetolyo-annex'])
+
+    def test_without_search_lists_everyone(self):
+        names, count = self.search_names('')
+
+        self.assertEqual(count, 4)
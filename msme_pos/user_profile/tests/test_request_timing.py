@@ -0,0 +1,74 @@
+from django.db import connection
+from django.test import (
+    TestCase,
+    override_settings
+)
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from user_profile.models import UserProfile
+from menu_item.models import MenuItem
+from item_order.models import ItemOrder
+
+
+class RequestTimingTestCase(TestCase):
+    def setUp(self):
+        self.user = UserProfile.objects.create_user(
+            email='business@email.com',
+            business_name='business',
+            identifier='street',
+            owner_surname='test',
+            owner_given_name='test',
+            password='password'
+        )
+
+        self.menu_item = MenuItem.objects.create(
+            name='menu item', description='description', price=80, user_profile=self.user
+        )
+
+        ItemOrder.objects.create(quantity=1, menu_item=self.menu_item)
+
+        self.authorized_client = APIClient()
+        self.authorized_client.credentials(HTTP_AUTHORIZATION='Token ' + Token.objects.create(user=self.user).key)
+
+        self.detail_url = reverse('profiles:profiles_detail', kwargs={
+            'full_business_name': self.user.full_business_name
+        })
+
+    def test_counts_queries_without_debug(self):
+        response = self.authorized_client.get(self.detail_url)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertGreater(int(response['X-Query-Count']), 0)
+
+    def test_query_count_matches_executed_queries(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.authorized_client.get(self.detail_url)
+
+        self.assertEqual(response['X-Query-Count'], str(len(queries)))
+
+    def test_server_timing_header(self):
+        response = self.authorized_client.get(self.detail_url)
+        metrics = [metric.split(';')[0] for metric in response['Server-Timing'].split(', ')]
+
+        self.assertEqual(metrics, ['db', 'view', 'render', 'total'])
+        self.assertIn('queries"', response['Server-Timing'])
+
+    @override_settings(REQUEST_TIMING_LOG_SAMPLE_RATE=1)
+    def test_sampled_log(self):
+        with self.assertLogs('msme_pos.timing', level='INFO') as logs:
+            self.authorized_client.get(self.detail_url)
+
+        self.assertEqual(len(logs.output), 1)
+        self.assertIn(self.detail_url, logs.output[0])
+
+    @override_settings(REQUEST_TIMING_HEADERS=False)
+    def test_headers_can_be_turned_off(self):
+        response = self.authorized_client.get(self.detail_url)
+
+        self.assertNotIn('Server-Timing', response)
+        self.assertNotIn('X-Query-Count', response)
@@ -0,0 +1,83 @@
+import datetime
+
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from rest_framework import status
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from user_profile.models import UserProfile
+from menu_item.models import MenuItem
+from item_order.models import ItemOrder
+
+
+class SalesAnalyticsTestCase(TestCase):
+    def setUp(self):
+        self.user = UserProfile.objects.create_user(
+            email='business@email.com',
+            business_name='business',
+            identifier='street',
+            owner_surname='test',
+            owner_given_name='test',
+            password='password'
+        )
+
+        self.menu_item_1 = MenuItem.objects.create(
+            name='menu item 1', description='description', price=80, user_profile=self.user
+        )
+        self.menu_item_2 = MenuItem.objects.create(
+            name='menu item 2', description='description', price=50, user_profile=self.user
+        )
+
+        # Monday, Tuesday and the next Monday
+        for menu_item, quantity, day in (
+            (self.menu_item_1, 1, 4),
+            (self.menu_item_2, 2, 4),
+            (self.menu_item_1, 3, 5),
+            (self.menu_item_1, 1, 11),
+        ):
+            item_order = ItemOrder.objects.create(quantity=quantity, menu_item=menu_item)
+            item_order.ordered_on = timezone.make_aware(datetime.datetime(2017, 9, day, 12, 30))
+            item_order.save()
+
+        self.authorized_client = APIClient()
+        self.authorized_client.credentials(HTTP_AUTHORIZATION='Token ' + Token.objects.create(user=self.user).key)
+
+        self.analytics_url = reverse(
+            'item_orders:item_order_analytics',
+            kwargs={'full_business_name': self.user.full_business_name}
+        )
+
+    def get_buckets(self, query):
+        response = self.authorized_client.get(self.analytics_url + query, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        return [
+            (bucket['bucket'][:10], bucket['order_count'], bucket['total_quantity'], bucket['revenue'])
+            for bucket in response.json()['buckets']
+        ]
+
+    def test_daily_buckets(self):
+        self.assertEqual(self.get_buckets('?interval=day'), [
+            ('2017-09-04', 2, 3, '180.00'),
+            ('2017-09-05', 1, 3, '240.00'),
+            ('2017-09-11', 1, 1, '80.00'),
+        ])
+
+    def test_weekly_buckets(self):
+        self.assertEqual(self.get_buckets('?interval=week'), [
+            ('2017-09-04', 3, 6, '420.00'),
+            ('2017-09-11', 1, 1, '80.00'),
+        ])
+
+    def test_monthly_buckets_by_menu_item(self):
+        self.assertEqual(self.get_buckets('?interval=month&group_by=menu_item&to=2017-09-10'), [
+            ('2017-09-01', 2, 4, '320.00'),
+            ('2017-09-01', 1, 2, '100.00'),
+        ])
+
+    def test_invalid_interval(self):
+        response = self.authorized_client.get(self.analytics_url + '?interval=year', format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
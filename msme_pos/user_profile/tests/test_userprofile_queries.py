@@ -0,0 +1,160 @@
+import datetime
+
+from django.db import connection
+from django.test import (
+    SimpleTestCase,
+    TestCase
+)
+from django.test.utils import CaptureQueriesContext
+from django.urls import resolve
+from django.utils import timezone
+
+from rest_framework.test import (
+    APIRequestFactory,
+    force_authenticate
+)
+
+from user_profile.models import UserProfile
+from user_profile.views import (
+    UserProfileListAPIView,
+    UserProfileDetailAPIView
+)
+from menu_item.models import MenuItem
+from item_order.models import ItemOrder
+
+
+class UserProfileRoutingTestCase(SimpleTestCase):
+    def test_each_profile_route_reaches_its_view(self):
+        for path, url_name in (
+            ('/api/profiles/', 'profiles_list'),
+            ('/api/profiles/create/', 'profiles_create'),
+            ('/api/profiles/login/', 'login-list'),
+            ('/api/profiles/business-street/', 'profiles_detail'),
+        ):
+            self.assertEqual(resolve(path).url_name, url_name, path)
+
+
+class UserProfileQueryCountTestCase(TestCase):
+    def setUp(self):
+        self.factory = APIRequestFactory()
+
+        self.user = UserProfile.objects.create_user(
+            email='business@email.com',
+            business_name='business',
+            identifier='street',
+            owner_surname='test',
+            owner_given_name='test',
+            password='password'
+        )
+
+        self.admin = UserProfile.objects.create_superuser(
+            email='admin@email.com',
+            owner_surname='admin',
+            owner_given_name='admin',
+            password='password'
+        )
+
+    def add_menu_items(self, count, orders_per_item):
+        for index in range(count):
+            menu_item = MenuItem.objects.create(
+                name='menu item {}'.format(MenuItem.objects.count()),
+                description='description',
+                price=80,
+                user_profile=self.user
+            )
+
+            for quantity in range(1, orders_per_item + 1):
+                ItemOrder.objects.create(quantity=quantity, menu_item=menu_item)
+
+    def get_detail(self, query=None):
+        request = self.factory.get('/', query or {})
+        force_authenticate(request, user=self.user)
+
+        return UserProfileDetailAPIView.as_view()(request, full_business_name=self.user.full_business_name)
+
+    def test_detail_query_count_does_not_grow_with_menu(self):
+        self.add_menu_items(2, 3)
+
+        with self.assertNumQueries(3):
+            response = self.get_detail()
+
+        self.assertEqual(len(response.data['menu_items']), 2)
+
+        self.add_menu_items(5, 3)
+
+        with self.assertNumQueries(3):
+            response = self.get_detail()
+
+        self.assertEqual(len(response.data['menu_items']), 7)
+
+    def test_list_query_count_does_not_grow_with_menu(self):
+        self.add_menu_items(4, 2)
+
+        request = self.factory.get('/')
+        force_authenticate(request, user=self.admin)
+
+        # Count and page of profiles, their menu items, and the menu items' orders
+        with self.assertNumQueries(4):
+            response = UserProfileListAPIView.as_view()(request)
+
+        self.assertEqual(response.data['count'], 2)
+
+    def test_detail_shows_each_menu_items_page_of_orders(self):
+        self.add_menu_items(2, 12)
+
+        first_page = self.get_detail().data['menu_items']
+        second_page = self.get_detail({'page': 2}).data['menu_items']
+
+        for menu_item in first_page:
+            quantities = [item_order['quantity'] for item_order in menu_item['item_orders']]
+            self.assertEqual(quantities, list(range(12, 2, -1)))
+
+        for menu_item in second_page:
+            quantities = [item_order['quantity'] for item_order in menu_item['item_orders']]
+            self.assertEqual(quantities, [2, 1])
+
+    def test_page_past_the_end_of_the_orders_is_not_found(self):
+        self.add_menu_items(1, 12)
+        self.add_menu_items(1, 3)
+
+        self.assertEqual(self.get_detail({'page': 2}).status_code, 404)
+        self.assertEqual(self.get_detail({'page': 0}).status_code, 404)
+        self.assertEqual(self.get_detail({'page': 'next'}).status_code, 404)
+
+        # The first page is there even for an item without orders
+        self.add_menu_items(1, 0)
+        self.assertEqual(self.get_detail().status_code, 200)
+
+    def test_last_page_of_orders_is_each_items_own(self):
+        self.add_menu_items(1, 12)
+        self.add_menu_items(1, 3)
+
+        response = self.get_detail({'page': 'last'})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            [[item_order['quantity'] for item_order in menu_item['item_orders']] for menu_item in response.data['menu_items']],
+            [[2, 1], [3, 2, 1]]
+        )
+
+    def test_pages_of_orders_are_numbered_in_one_pass(self):
+        self.add_menu_items(3, 12)
+
+        with CaptureQueriesContext(connection) as queries:
+            self.get_detail({'page': 2})
+
+        order_queries = [query['sql'] for query in queries if 'item_order_itemorder' in query['sql']]
+
+        # One query over the menu items' orders, without a subquery per order
+        self.assertEqual(len(order_queries), 1)
+        self.assertIn('ROW_NUMBER() OVER (PARTITION BY menu_item_id', order_queries[0])
+        self.assertNotIn('U0', order_queries[0])
+
+    def test_page_of_orders_is_within_the_date_range(self):
+        self.add_menu_items(1, 3)
+        ItemOrder.objects.filter(quantity=3).update(ordered_on=timezone.now() - datetime.timedelta(days=3))
+
+        response = self.get_detail({'date': timezone.localdate().isoformat()})
+        quantities = [item_order['quantity'] for item_order in response.data['menu_items'][0]['item_orders']]
+
+        self.assertEqual(quantities, [2, 1])
@@ -17,10 +17,14 @@ router = DefaultRouter()
 # Set base_name if its not a ModelViewSet
 router.register('login', LoginViewSet, base_name='login') 
 
+# Anchored so that `$` alone doesn't swallow every other route. The list
+# comes before the router's API root and the router before the detail
+# pattern, which would otherwise match `login`
 urlpatterns = [
-    url(r'', include(router.urls)),
+    url(r'^$', UserProfileListAPIView.as_view(), name='profiles_list'),
+    url(r'^create/$', UserProfileCreateAPIView.as_view(), name='profiles_create'),
 
-    url(r'$', UserProfileListAPIView.as_view(), name='profiles_list'),
-    url(r'create/$', UserProfileCreateAPIView.as_view(), name='profiles_create'),
-    url(r'(?P<full_business_name>[\w\-]+)/$', UserProfileDetailAPIView.as_view(), name='profiles_detail'),
+    url(r'^', include(router.urls)),
+
+    url(r'^(?P<full_business_name>[\w\-]+)/$', UserProfileDetailAPIView.as_view(), name='profiles_detail'),
 ]
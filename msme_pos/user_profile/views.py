@@ -1,15 +1,14 @@
+from django.db.models import Prefetch
+
 from rest_framework import (
     viewsets,
-    filters,
     status,
     mixins,
     generics
 )
 
 from rest_framework.response import Response
-from rest_framework.authentication import TokenAuthentication
-from rest_framework.authtoken.serializers import AuthTokenSerializer
-from rest_framework.authtoken.views import ObtainAuthToken
+from rest_framework.authtoken.models import Token
 
 from rest_framework.permissions import (
     IsAdminUser,
@@ -17,10 +16,19 @@ from rest_framework.permissions import (
 )
 
 from user_profile.models import UserProfile
+from user_profile.authentication import CachedTokenAuthentication
+from user_profile.search import ProfileSearchFilter
+
+from user_profile.serializers import (
+    UserProfileSerializer,
+    PooledAuthTokenSerializer
+)
 
-from user_profile.serializers import UserProfileSerializer
+from menu_item.models import MenuItem
+from menu_item.serializers import MenuItemSerializer
 
 from user_profile.permissions import (
+    OwnBusiness,
     GetAndUpdateOwnProfile,
     GetAndUpdateOwnMenuItem,
     GetOwnOrders,
@@ -29,12 +37,43 @@ from user_profile.permissions import (
 )
 
 
+def prefetch_menu_items(queryset):
+    """ Fetches the menu items of every profile in queryset with one query """
+
+    return queryset.prefetch_related(Prefetch('menu_items', queryset=MenuItem.objects.order_by('id')))
+
+
+def attach_item_orders(profiles, request):
+    """ Fetches the page of orders of every menu item of profiles with one
+    query, no matter how many menu items there are """
+
+    MenuItemSerializer.attach_item_orders(
+        [menu_item for profile in profiles for menu_item in profile.menu_items.all()],
+        request
+    )
+
+
 class UserProfileListAPIView(generics.ListAPIView):
+    """ Lists every UserProfile for admins. ?search= narrows the list to
+    the best matches first, see user_profile.search """
+
     serializer_class = UserProfileSerializer
     queryset = UserProfile.objects.all()
-    authentication_classes = (TokenAuthentication,)
+    filter_backends = (ProfileSearchFilter,)
+    authentication_classes = (CachedTokenAuthentication,)
     permission_classes = (IsAdminUser,)
 
+    def get_queryset(self):
+        return prefetch_menu_items(UserProfile.objects.order_by('id'))
+
+    def paginate_queryset(self, queryset):
+        page = super(UserProfileListAPIView, self).paginate_queryset(queryset)
+
+        if page is not None:
+            attach_item_orders(page, self.request)
+
+        return page
+
 
 class UserProfileCreateAPIView(generics.CreateAPIView):
     serializer_class = UserProfileSerializer
@@ -47,22 +86,36 @@ class UserProfileDetailAPIView(generics.RetrieveUpdateDestroyAPIView):
     serializer_class = UserProfileSerializer
     queryset = UserProfile.objects.all()
     lookup_field = 'full_business_name'
-    filter_backends = (filters.SearchFilter,)
-    search_fields = (
-        'email', 'business_name', 'identifier', 'full_business_name',
-        'owner_surname', 'owner_given_name',
-        'address', 'city', 'state'
-    )
-    authentication_classes = (TokenAuthentication,)
-    permission_classes = (GetAndUpdateOwnProfile,)
+    authentication_classes = (CachedTokenAuthentication,)
+    permission_classes = (OwnBusiness, GetAndUpdateOwnProfile,)
+
+    def get_queryset(self):
+        if self.request.method == 'GET':
+            return prefetch_menu_items(UserProfile.objects.all())
+
+        return UserProfile.objects.all()
+
+    def get_object(self):
+        profile = super(UserProfileDetailAPIView, self).get_object()
+
+        if self.request.method == 'GET':
+            attach_item_orders([profile], self.request)
+
+        return profile
     
 
 class LoginViewSet(viewsets.ViewSet):
     """ Checks email and password and returns an authtoken """
 
-    serializer_class = AuthTokenSerializer
+    serializer_class = PooledAuthTokenSerializer
 
     def create(self, request):
-        """ Use the ObtainAuthToken APIView to validate and create a token """
+        """ Validates like ObtainAuthToken, but the password is checked on
+        the password hash pool so login bursts can't take over the workers """
+
+        serializer = self.serializer_class(data=request.data)
+        serializer.is_valid(raise_exception=True)
+
+        token, created = Token.objects.get_or_create(user=serializer.validated_data['user'])
 
-        return ObtainAuthToken().post(request)
+        return Response({'token': token.key})